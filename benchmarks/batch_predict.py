@@ -0,0 +1,88 @@
+# benchmarks/batch_predict.py
+
+# Throughput of per-document prediction vs heading_detector.detect_headings_batch
+# Generates (or reuses) a corpus of small synthetic PDFs, extracts every document's block
+# columns once, then times heading detection both ways on the same columns:
+#   per_document  detect_headings_from_columns: one model.predict per document
+#   batched       detect_headings_batch: one model.predict per batch of documents
+# Outlines must be identical; extraction time is reported separately
+# Run from the repo root: python -m benchmarks.batch_predict --count 1000 --pages 1
+
+import os
+import time
+import argparse
+from benchmarks.synthetic_corpus import generate_corpus
+from scripts.pdf_parser import extract_text_blocks
+from scripts.heading_detector import (block_columns, detect_headings_batch, detect_headings_from_columns, load_model,
+                                      load_preprocessing)
+
+MODEL_PATH = "models/heading_model.pkl"
+LABEL_ENCODER_PATH = "models/label_encoder.pkl"
+
+def load_corpus(corpus_dir, count, pages):
+    pdf_paths = sorted(os.path.join(corpus_dir, f) for f in os.listdir(corpus_dir)
+                       if f.lower().endswith(".pdf")) if os.path.isdir(corpus_dir) else []
+    if len(pdf_paths) < count:
+        print(f"[INFO] Generating {count} synthetic PDFs ({pages} page(s) each) in {corpus_dir}")
+        generate_corpus(corpus_dir, count=count, pages=pages)
+        pdf_paths = sorted(os.path.join(corpus_dir, f) for f in os.listdir(corpus_dir) if f.lower().endswith(".pdf"))
+    return pdf_paths[:count]
+
+def run_per_document(docs, model, label_encoder, preprocessing):
+    return [detect_headings_from_columns(columns, model, label_encoder, preprocessing=preprocessing) for columns in docs]
+
+def run_batched(docs, model, label_encoder, preprocessing, batch_size):
+    outlines = []
+    for i in range(0, len(docs), batch_size):
+        outlines.extend(detect_headings_batch(docs[i:i + batch_size], model, label_encoder, preprocessing))
+    return outlines
+
+def main(corpus_dir, count, pages, batch_sizes, repeat, model_path, label_encoder_path):
+    if not os.path.exists(model_path):
+        print(f"[ERROR] No trained model at {model_path} → run scripts.train_model first")
+        return
+    model, label_encoder = load_model(model_path, label_encoder_path)
+    preprocessing = load_preprocessing(model_path)
+    pdf_paths = load_corpus(corpus_dir, count, pages)
+
+    start = time.perf_counter()
+    docs = [block_columns(extract_text_blocks(path)["text_blocks"]) for path in pdf_paths]
+    docs = [columns for columns in docs if not columns.empty]
+    extract_s = time.perf_counter() - start
+    rows = sum(len(columns) for columns in docs)
+    print(f"[INFO] {len(docs)} documents, {rows} blocks extracted in {extract_s:.2f}s; best of {repeat} runs")
+
+    variants = [("per_document", lambda: run_per_document(docs, model, label_encoder, preprocessing))]
+    variants += [(f"batched/{size}", lambda size=size: run_batched(docs, model, label_encoder, preprocessing, size))
+                 for size in batch_sizes]
+
+    reference = None
+    print(f"  {'variant':<18}{'seconds':>10}{'docs/s':>10}{'blocks/s':>12}{'speedup':>10}")
+    baseline_s = None
+    for name, fn in variants:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outlines = fn()
+            best = min(best, time.perf_counter() - start)
+        baseline_s = baseline_s or best
+        if reference is None:
+            reference = outlines
+        elif outlines != reference:
+            print(f"[ERROR] {name} outlines differ from per_document")
+        print(f"  {name:<18}{best:>10.3f}{len(docs) / best:>10.1f}{rows / best:>12.0f}{baseline_s / best:>9.2f}x")
+
+    headings = sum(len(outline["outline"]) for outline in reference if outline)
+    print(f"[✓] {headings} headings detected across {len(docs)} documents")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-document vs batched heading prediction throughput")
+    parser.add_argument("--corpus-dir", default="bench_corpus/small")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=1, help="Pages per generated PDF")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[32, 256, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--label-encoder", default=LABEL_ENCODER_PATH)
+    args = parser.parse_args()
+    main(args.corpus_dir, args.count, args.pages, args.batch_sizes, args.repeat, args.model, args.label_encoder)
@@ -0,0 +1,58 @@
+# benchmarks/block_memory.py
+
+# Memory benchmark: one dict per block vs the slotted TextBlock
+# Builds N OCR-like word blocks both ways and reports the traced allocation per block
+# Run from the repo root: python -m benchmarks.block_memory --blocks 1000000
+
+import gc
+import random
+import argparse
+import tracemalloc
+from scripts.text_block import TextBlock
+
+WORDS = ["Introduction", "the", "of", "Business", "Plan", "Ontario", "Digital", "Library", "and", "to"]
+
+def _fields(i, rng):
+    x0, y0 = rng.randint(0, 2000), rng.randint(0, 3000)
+    return {
+        "text": rng.choice(WORDS) + str(i % 97),
+        "font_size": rng.randint(20, 60),
+        "font_name": "OCR",
+        "x0": x0,
+        "y0": y0,
+        "x1": x0 + 120,
+        "y1": y0 + 40,
+        "is_bold": False,
+        "is_italic": False,
+        "alignment": "left",
+        "line_spacing_before": round(rng.random() * 20, 2),
+        "line_spacing_after": round(rng.random() * 20, 2),
+        "page_number": i // 2000 + 1,
+        "block_id": i % 2000,
+    }
+
+def measure(n, build):
+    # Field values are created outside the traced region so only the containers are compared
+    rng = random.Random(0)
+    fields = [_fields(i, rng) for i in range(n)]
+    gc.collect()
+    tracemalloc.start()
+    blocks = [build(f) for f in fields]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del blocks
+    return current
+
+def main(n):
+    dict_bytes = measure(n, dict)
+    slot_bytes = measure(n, lambda f: TextBlock(**f))
+    print(f"[INFO] {n:,} blocks")
+    print(f"  dict per block        : {dict_bytes / n:8.1f} bytes/block ({dict_bytes / 2**20:8.1f} MiB)")
+    print(f"  TextBlock (__slots__) : {slot_bytes / n:8.1f} bytes/block ({slot_bytes / 2**20:8.1f} MiB)")
+    print(f"[✓] Reduction: {100 * (1 - slot_bytes / dict_bytes):.1f}%")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare memory of dict blocks vs TextBlock")
+    parser.add_argument("--blocks", type=int, default=200000)
+    args = parser.parse_args()
+    main(args.blocks)
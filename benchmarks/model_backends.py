@@ -0,0 +1,61 @@
+# benchmarks/model_backends.py
+
+# Model backend benchmark on training_data/v1
+# For every backend: train time, predict throughput (rows/sec) of the sklearn model and of
+# the exported NumPy predictor, test accuracy / macro F1, and whether both predictors agree
+# Run from the repo root: python -m benchmarks.model_backends --rows 100000
+
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+from scripts.train_model import INPUT_CSV, OUTPUT_CSV, load_training_set
+from scripts.model_backends import BACKENDS, make_model, export_predictor, load_predictor
+
+def rows_per_sec(predict, X, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict(X)
+        best = min(best, time.perf_counter() - start)
+    return len(X) / best
+
+def main(input_path, output_path, rows, repeat):
+    X, y, label_encoder = load_training_set(input_path, output_path)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Throughput is measured on the test rows tiled up to the requested size
+    X_bench = X_test.iloc[np.resize(np.arange(len(X_test)), rows)]
+    print(f"[INFO] {len(X_train)} train / {len(X_test)} test rows, throughput on {rows:,} rows")
+
+    print(f"  {'backend':<10}{'train':>9}{'sklearn rows/s':>17}{'numpy rows/s':>15}{'accuracy':>10}{'macro F1':>10}")
+    for backend in BACKENDS:
+        model = make_model(backend)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        train_time = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.npz")
+            export_predictor(model, label_encoder, path)
+            predictor, _ = load_predictor(path)
+
+        y_pred = model.predict(X_test)
+        agree = np.array_equal(predictor.predict(X_bench), model.predict(X_bench))
+        sklearn_rate = rows_per_sec(model.predict, X_bench, repeat)
+        numpy_rate = rows_per_sec(predictor.predict, X_bench, repeat)
+        print(f"  {backend:<10}{train_time:>8.2f}s{sklearn_rate:>17,.0f}{numpy_rate:>15,.0f}"
+              f"{accuracy_score(y_test, y_pred):>10.3f}{f1_score(y_test, y_pred, average='macro'):>10.3f}")
+        if not agree:
+            print(f"[!] {backend}: exported predictor disagrees with the sklearn model")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare model backends and the exported NumPy predictor")
+    parser.add_argument("--input", default=INPUT_CSV)
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--rows", type=int, default=100000, help="Rows used for the throughput measurement")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.input, args.output, args.rows, args.repeat)
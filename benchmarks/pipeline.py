@@ -0,0 +1,245 @@
+# benchmarks/pipeline.py
+
+# End-to-end stage benchmark over a PDF directory (e.g. a corpus from benchmarks.synthetic_corpus)
+# Times each stage separately: is_scanned_pdf, extract_text_blocks / ocr_extract_text_blocks,
+# generate_input_csv and detect_headings (when a trained model exists), and reports
+# pages/sec and blocks/sec per stage
+# Memory per stage: rss_high_water_mb is the process RSS high-water mark at the end of the stage
+# (cumulative: ru_maxrss never goes down, so it only shows the largest stage seen so far);
+# with --trace-memory each stage also gets alloc_peak_mb, its own peak of Python allocations
+# (tracemalloc: memory allocated inside MuPDF / tesseract is not counted, and timings slow down)
+# Results are written as JSON (tagged with the git commit) so runs can be compared
+# Run from the repo root:
+#   python -m benchmarks.pipeline run --input-dir bench_corpus
+#   python -m benchmarks.pipeline compare benchmarks/results/old.json benchmarks/results/new.json
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import subprocess
+from datetime import datetime, timezone
+import fitz  # PyMuPDF
+from scripts.auto_detector import is_scanned_pdf
+from scripts.pdf_parser import extract_text_blocks
+from scripts.ocr_pdf_parser import ocr_extract_text_blocks
+from scripts.block_store import save_extracted
+from scripts.generate_csv import generate_input_csv
+from scripts.heading_detector import detect_headings, load_model, load_preprocessing
+
+RESULTS_DIR = "benchmarks/results"
+MODEL_PATH = "models/heading_model.pkl"
+LABEL_ENCODER_PATH = "models/label_encoder.pkl"
+STAGES = ["is_scanned_pdf", "extract_text_blocks", "ocr_extract_text_blocks", "generate_input_csv", "detect_headings"]
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS; children cover tesseract / poppler subprocesses
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return max(own, children) / 2**20
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+class StageTimer:
+    """
+    Accumulates wall time, pages and blocks per stage.
+    With trace_memory, also the peak of Python allocations made between start() and record().
+    """
+    def __init__(self, trace_memory=False):
+        self.stages = {}
+        self.trace_memory = trace_memory
+        self._traced_start = 0
+
+    def start(self):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            self._traced_start = tracemalloc.get_traced_memory()[0]
+        return time.perf_counter()
+
+    def record(self, stage, seconds, pages=0, blocks=0):
+        entry = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0, "pages": 0, "blocks": 0})
+        entry["seconds"] += seconds
+        entry["calls"] += 1
+        entry["pages"] += pages
+        entry["blocks"] += blocks
+        entry["rss_high_water_mb"] = round(peak_rss_mb(), 1)
+        if self.trace_memory:
+            alloc_peak = (tracemalloc.get_traced_memory()[1] - self._traced_start) / 2**20
+            entry["alloc_peak_mb"] = round(max(entry.get("alloc_peak_mb", 0.0), alloc_peak), 1)
+
+    def summary(self):
+        result = {}
+        for stage in STAGES:
+            if stage not in self.stages:
+                continue
+            entry = dict(self.stages[stage])
+            seconds = entry["seconds"] or float("nan")
+            entry["pages_per_s"] = round(entry["pages"] / seconds, 2)
+            entry["blocks_per_s"] = round(entry["blocks"] / seconds, 2)
+            entry["seconds"] = round(entry["seconds"], 4)
+            result[stage] = entry
+        return result
+
+def run(input_dir, ocr_dpi=300, results_dir=RESULTS_DIR, trace_memory=False):
+    pdf_paths = sorted(os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.lower().endswith(".pdf"))
+    if not pdf_paths:
+        print(f"[ERROR] No PDFs found in {input_dir}")
+        return None
+
+    timer = StageTimer(trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+    work_dir = tempfile.mkdtemp(prefix="pipeline_bench_")
+    json_dir = os.path.join(work_dir, "input_json")
+    os.makedirs(json_dir)
+    model = label_encoder = preprocessing = None
+    if os.path.exists(MODEL_PATH) and os.path.exists(LABEL_ENCODER_PATH):
+        model, label_encoder = load_model(MODEL_PATH, LABEL_ENCODER_PATH)
+        preprocessing = load_preprocessing(MODEL_PATH)
+    else:
+        print("[!] No trained model in models/ → detect_headings stage skipped")
+
+    total_start = time.perf_counter()
+    try:
+        for pdf_path in pdf_paths:
+            name = os.path.splitext(os.path.basename(pdf_path))[0]
+            # Detection and structured extraction share one open document, as in auto_detector
+            with fitz.open(pdf_path) as doc:
+                pages = len(doc)
+
+                start = timer.start()
+                scanned = is_scanned_pdf(pdf_path, doc=doc)
+                timer.record("is_scanned_pdf", time.perf_counter() - start, pages)
+
+                stage = "ocr_extract_text_blocks" if scanned else "extract_text_blocks"
+                start = timer.start()
+                if scanned:
+                    result = ocr_extract_text_blocks(pdf_path, dpi=ocr_dpi)
+                else:
+                    result = extract_text_blocks(pdf_path, doc=doc)
+                blocks = len(result["text_blocks"])
+                timer.record(stage, time.perf_counter() - start, pages, blocks)
+
+            json_path = os.path.join(json_dir, f"{name}.json")
+            save_extracted(result, json_path)
+            print(f"[INFO] {name}: {pages} pages, {blocks} blocks ({'ocr' if scanned else 'structured'})")
+
+            if model is not None:
+                start = timer.start()
+                detect_headings(json_path, MODEL_PATH, LABEL_ENCODER_PATH, os.path.join(work_dir, "output", f"{name}.json"),
+                                model=model, label_encoder=label_encoder, preprocessing=preprocessing)
+                timer.record("detect_headings", time.perf_counter() - start, pages, blocks)
+
+        total_pages = timer.stages["is_scanned_pdf"]["pages"]
+        total_blocks = sum(timer.stages.get(stage, {}).get("blocks", 0)
+                           for stage in ("extract_text_blocks", "ocr_extract_text_blocks"))
+        start = timer.start()
+        generate_input_csv(json_dir, os.path.join(work_dir, "input.csv"))
+        timer.record("generate_input_csv", time.perf_counter() - start, total_pages, total_blocks)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if trace_memory:
+            tracemalloc.stop()
+    total_time = time.perf_counter() - total_start
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "input_dir": input_dir,
+        "documents": len(pdf_paths),
+        "pages": total_pages,
+        "blocks": total_blocks,
+        "total_seconds": round(total_time, 4),
+        "trace_memory": trace_memory,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "stages": timer.summary(),
+    }
+
+    os.makedirs(results_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    output_path = os.path.join(results_dir, f"{stamp}_{results['commit']}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print_results(results)
+    print(f"[✓] Results saved to: {output_path}")
+    return results
+
+def print_results(results):
+    print(f"[INFO] {results['documents']} documents, {results['pages']} pages, {results['blocks']} blocks "
+          f"in {results['total_seconds']:.2f}s (peak RSS {results['peak_rss_mb']:.0f} MiB)")
+    # "RSS so far" is cumulative across stages; "alloc MiB" is the stage's own Python allocation peak
+    traced = results.get("trace_memory", False)
+    print(f"  {'stage':<26}{'seconds':>10}{'pages/s':>12}{'blocks/s':>12}{'RSS so far':>12}"
+          + (f"{'alloc MiB':>11}" if traced else ""))
+    for stage, entry in results["stages"].items():
+        print(f"  {stage:<26}{entry['seconds']:>10.3f}{entry['pages_per_s']:>12.1f}{entry['blocks_per_s']:>12.1f}"
+              f"{entry['rss_high_water_mb']:>12.0f}" + (f"{entry['alloc_peak_mb']:>11.1f}" if traced else ""))
+
+def compare(baseline_path, candidate_path, threshold=0.10):
+    """
+    Prints per-stage throughput changes between two result files; returns the stages that
+    regressed by more than threshold (relative drop in pages/sec).
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(candidate_path, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    print(f"[INFO] {baseline['commit']} → {candidate['commit']}")
+    print(f"  {'stage':<26}{'pages/s before':>16}{'pages/s after':>15}{'change':>10}")
+    regressions = []
+    for stage in STAGES:
+        if stage not in baseline["stages"] or stage not in candidate["stages"]:
+            continue
+        before = baseline["stages"][stage]["pages_per_s"]
+        after = candidate["stages"][stage]["pages_per_s"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change < -threshold:
+            regressions.append(stage)
+            flag = "  [!] regression"
+        print(f"  {stage:<26}{before:>16.1f}{after:>15.1f}{change:>+10.1%}{flag}")
+
+    rss_change = candidate["peak_rss_mb"] - baseline["peak_rss_mb"]
+    print(f"  peak RSS: {baseline['peak_rss_mb']:.0f} → {candidate['peak_rss_mb']:.0f} MiB ({rss_change:+.0f})")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Benchmark every stage on a PDF directory")
+    run_parser.add_argument("--input-dir", default="bench_corpus")
+    run_parser.add_argument("--ocr-dpi", type=int, default=300)
+    run_parser.add_argument("--results-dir", default=RESULTS_DIR)
+    run_parser.add_argument("--trace-memory", action="store_true",
+                            help="Also measure each stage's own peak of Python allocations with tracemalloc "
+                                 "(slower; timings are not comparable with untraced runs)")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="Relative pages/sec drop reported as a regression")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args.input_dir, args.ocr_dpi, args.results_dir, args.trace_memory)
+    else:
+        regressions = compare(args.baseline, args.candidate, args.threshold)
+        sys.exit(1 if regressions else 0)
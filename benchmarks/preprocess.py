@@ -0,0 +1,104 @@
+# benchmarks/preprocess.py
+
+# Microbenchmark of the pre-processing stage (noise filter, page-1 title, title removal)
+# on one large synthetic document, comparing:
+#   per_block    the original per-block loop: any() over IGNORE_TEXTS, a separate page-1 pass
+#                and a strip() comparison against the title for every block
+#   vectorized   flat keyword regex, page-1 sub-frame and a second strip pass
+#   single_pass  heading_detector.preprocess_columns: trie-factored regex, title chosen in the same
+#                scan, normalized text computed once and reused
+# All three must agree on the kept rows and the title
+# Run from the repo root: python -m benchmarks.preprocess --blocks 100000
+
+import re
+import time
+import random
+import argparse
+import numpy as np
+import pandas as pd
+from scripts.feature_pipeline import IGNORE_TEXTS
+from scripts.heading_detector import preprocess_columns
+
+WORDS = ("proposal library digital business plan ontario service network access partner funding "
+         "content member strategy budget evaluation community research public support").split()
+NOISE = ["Page 3", "Author: J. Smith", "www.example.org", "contact@example.org", "12", "ab", "Copyright 2024"]
+
+def make_columns(n, blocks_per_page=40, noise_ratio=0.1, seed=0):
+    rng = random.Random(seed)
+    texts, sizes = [], []
+    for _ in range(n):
+        if rng.random() < noise_ratio:
+            texts.append(rng.choice(NOISE))
+        else:
+            texts.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 14))).capitalize() + " ")
+        sizes.append(rng.choice([10.0, 10.0, 10.0, 11.0, 13.0, 15.0, 18.0]))
+    return pd.DataFrame({
+        "text": texts,
+        "font_size": sizes,
+        "page_number": np.arange(n) // blocks_per_page + 1,
+    })
+
+def per_block(columns):
+    def is_noise(text):
+        text_lower = text.lower()
+        return any(keyword in text_lower for keyword in IGNORE_TEXTS) or text.strip().isdigit() or len(text.strip()) < 3
+
+    blocks = columns.to_dict("records")
+    page1 = [b for b in blocks if b["page_number"] == 1 and not is_noise(b["text"])]
+    title_block = max(page1, key=lambda b: b["font_size"], default=None)
+    title_text = title_block["text"] if title_block else None
+    kept = [i for i, b in enumerate(blocks)
+            if not is_noise(b["text"]) and not (title_text and b["text"].strip() == title_text.strip())]
+    return title_text, np.asarray(kept)
+
+FLAT_PATTERN = re.compile("|".join(re.escape(keyword) for keyword in IGNORE_TEXTS))
+
+def vectorized(columns):
+    stripped = columns["text"].str.strip()
+    noise = columns["text"].str.lower().str.contains(FLAT_PATTERN) | stripped.str.isdigit() | (stripped.str.len() < 3)
+    page1 = columns[(columns["page_number"] == 1) & ~noise]
+    title_text = page1["text"].iloc[page1["font_size"].to_numpy().argmax()] if len(page1) else None
+    keep = ~noise
+    if title_text:
+        keep &= columns["text"].str.strip() != title_text.strip()
+    return title_text, np.flatnonzero(keep.to_numpy())
+
+def single_pass(columns):
+    normalized, noise, title_position = preprocess_columns(columns)
+    title_text = None if title_position is None else columns["text"].iat[title_position]
+    keep = ~noise
+    if title_text:
+        keep &= (normalized != normalized.iat[title_position]).to_numpy()
+    return title_text, np.flatnonzero(keep)
+
+VARIANTS = {"per_block": per_block, "vectorized": vectorized, "single_pass": single_pass}
+
+def main(n_blocks, repeat):
+    columns = make_columns(n_blocks)
+    print(f"[INFO] {n_blocks} blocks on {columns['page_number'].max()} pages, best of {repeat} runs")
+
+    reference = None
+    timings = {}
+    for name, fn in VARIANTS.items():
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn(columns)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+        if reference is None:
+            reference = result
+        elif result[0] != reference[0] or not np.array_equal(result[1], reference[1]):
+            print(f"[ERROR] {name} disagrees with per_block (title or kept rows differ)")
+
+    print(f"  {'variant':<14}{'seconds':>10}{'blocks/s':>14}{'speedup':>10}")
+    for name, seconds in timings.items():
+        print(f"  {name:<14}{seconds:>10.4f}{n_blocks / seconds:>14.0f}{timings['per_block'] / seconds:>9.1f}x")
+    print(f"[✓] Kept {len(reference[1])} of {n_blocks} blocks, title: {reference[0]!r}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Noise / title pre-processing microbenchmark")
+    parser.add_argument("--blocks", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.blocks, args.repeat)
@@ -0,0 +1,74 @@
+# benchmarks/span_merge.py
+
+# Row-count and latency benchmark for pdf_parser granularities (span / line / block)
+# For every PDF in the corpus: extraction time, rows emitted, feature preparation time
+# and, when a trained model exists, prediction time
+# Run from the repo root: python -m benchmarks.span_merge --input-dir input_pdfs
+
+import os
+import time
+import argparse
+from scripts.pdf_parser import extract_text_blocks
+from scripts.heading_detector import load_model, prepare_document, predict_outline
+
+GRANULARITIES = ["span", "line", "block"]
+MODEL_PATH = "models/heading_model.pkl"
+LABEL_ENCODER_PATH = "models/label_encoder.pkl"
+
+def run(pdf_paths, granularity, model=None, label_encoder=None, repeat=3):
+    """
+    Returns the best-of-repeat totals over the corpus for one granularity.
+    """
+    best = None
+    for _ in range(repeat):
+        totals = {"rows": 0, "extract_s": 0.0, "features_s": 0.0, "predict_s": 0.0}
+        for pdf_path in pdf_paths:
+            start = time.perf_counter()
+            data = extract_text_blocks(pdf_path, granularity=granularity)
+            totals["extract_s"] += time.perf_counter() - start
+            totals["rows"] += len(data["text_blocks"])
+
+            start = time.perf_counter()
+            title, blocks_filtered, X = prepare_document(data["text_blocks"])
+            totals["features_s"] += time.perf_counter() - start
+
+            if model is not None and X is not None:
+                start = time.perf_counter()
+                predict_outline(title, blocks_filtered, X, model, label_encoder)
+                totals["predict_s"] += time.perf_counter() - start
+
+        totals["total_s"] = totals["extract_s"] + totals["features_s"] + totals["predict_s"]
+        if best is None or totals["total_s"] < best["total_s"]:
+            best = totals
+    return best
+
+def main(input_dir, repeat):
+    pdf_paths = sorted(os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.lower().endswith(".pdf"))
+    if not pdf_paths:
+        print(f"[ERROR] No PDFs found in {input_dir}")
+        return
+
+    model = label_encoder = None
+    if os.path.exists(MODEL_PATH) and os.path.exists(LABEL_ENCODER_PATH):
+        model, label_encoder = load_model(MODEL_PATH, LABEL_ENCODER_PATH)
+    else:
+        print("[!] No trained model in models/ → prediction time not measured")
+
+    print(f"[INFO] {len(pdf_paths)} PDFs, best of {repeat} runs")
+    print(f"  {'granularity':<12}{'rows':>8}{'extract':>10}{'features':>10}{'predict':>10}{'total':>10}")
+    baseline = None
+    for granularity in GRANULARITIES:
+        r = run(pdf_paths, granularity, model, label_encoder, repeat)
+        baseline = baseline or r
+        print(f"  {granularity:<12}{r['rows']:>8}{r['extract_s']:>9.3f}s{r['features_s']:>9.3f}s"
+              f"{r['predict_s']:>9.3f}s{r['total_s']:>9.3f}s")
+        if granularity != "span":
+            print(f"[✓] {granularity}: {100 * (1 - r['rows'] / max(baseline['rows'], 1)):.1f}% fewer rows, "
+                  f"{100 * (1 - r['total_s'] / baseline['total_s']):.1f}% less time than span")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare span / line / block extraction granularity")
+    parser.add_argument("--input-dir", default="input_pdfs")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.input_dir, args.repeat)
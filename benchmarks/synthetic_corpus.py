@@ -0,0 +1,123 @@
+# benchmarks/synthetic_corpus.py
+
+# Synthetic PDF corpus generator for the benchmarks
+# Writes structured PDFs with PyMuPDF: a title on page 1, H1/H2/H3 headings at a configurable
+# density between body paragraphs, in a configurable set of base-14 fonts
+# "Scanned" variants rasterize every page and keep only the image (no text layer)
+# Next to every PDF a <name>.truth.json holds the expected {"title", "outline"}
+# Run from the repo root: python -m benchmarks.synthetic_corpus --out bench_corpus --count 20 --pages 10
+
+import os
+import json
+import random
+import argparse
+import fitz  # PyMuPDF
+
+# Base-14 font pairs (regular, bold) by family
+FONT_FAMILIES = {
+    "helvetica": ("helv", "hebo"),
+    "times": ("tiro", "tibo"),
+    "courier": ("cour", "cobo"),
+}
+HEADING_SIZES = {"H1": 18, "H2": 15, "H3": 13}
+TITLE_SIZE = 24
+BODY_SIZE = 10
+WORDS = ("proposal library digital business plan ontario service network access partner funding "
+         "content member strategy budget evaluation community research public support").split()
+
+def _sentence(rng, n_words):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize()
+
+def make_structured_pdf(path, pages=5, heading_density=0.15, fonts=("helvetica",), seed=0):
+    """
+    Writes a text PDF and returns its ground-truth outline. heading_density is the
+    probability that a line on the page is a heading instead of body text.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    outline = []
+    title = _sentence(rng, 5)
+
+    for page_num in range(1, pages + 1):
+        page = doc.new_page(width=595, height=842)  # A4
+        regular, bold = FONT_FAMILIES[rng.choice(fonts)]
+        y = 72
+        if page_num == 1:
+            page.insert_text((72, y), title, fontname=bold, fontsize=TITLE_SIZE)
+            y += TITLE_SIZE * 2
+
+        while y < 842 - 72:
+            if rng.random() < heading_density:
+                level = rng.choice(list(HEADING_SIZES))
+                text = f"{rng.randint(1, 9)}. {_sentence(rng, rng.randint(2, 5))}"
+                y += HEADING_SIZES[level] * 0.8
+                page.insert_text((72, y), text, fontname=bold, fontsize=HEADING_SIZES[level])
+                outline.append({"level": level, "text": text, "page": page_num})
+                y += HEADING_SIZES[level] * 1.6
+            else:
+                page.insert_text((72, y), _sentence(rng, rng.randint(8, 12)), fontname=regular, fontsize=BODY_SIZE)
+                y += BODY_SIZE * 1.5
+
+    doc.save(path)
+    doc.close()
+    return {"title": title, "outline": outline}
+
+def rasterize_pdf(src_path, dst_path, dpi=150):
+    """
+    Writes a "scanned" copy of src_path: every page becomes a single image, with no text layer.
+    """
+    src = fitz.open(src_path)
+    dst = fitz.open()
+    for page in src:
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        out = dst.new_page(width=page.rect.width, height=page.rect.height)
+        out.insert_image(out.rect, stream=pix.tobytes("png"))
+    dst.save(dst_path, deflate=True)
+    dst.close()
+    src.close()
+
+def generate_corpus(out_dir, count=10, pages=5, heading_density=0.15, fonts=("helvetica",), scanned_ratio=0.0,
+                    dpi=150, seed=0):
+    """
+    Generates count PDFs in out_dir; a scanned_ratio share of them are rasterized variants.
+    Returns the list of {"path", "pages", "scanned"} entries, also written to out_dir/corpus.json.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    n_scanned = round(count * scanned_ratio)
+    entries = []
+
+    for i in range(count):
+        scanned = i < n_scanned
+        name = f"synthetic_{i:04d}{'_scanned' if scanned else ''}"
+        path = os.path.join(out_dir, f"{name}.pdf")
+        truth = make_structured_pdf(path, pages, heading_density, fonts, seed=rng.randrange(2**31))
+        if scanned:
+            rasterize_pdf(path, path + ".tmp", dpi=dpi)
+            os.replace(path + ".tmp", path)
+        with open(os.path.join(out_dir, f"{name}.truth.json"), "w", encoding="utf-8") as f:
+            json.dump(truth, f, indent=2)
+        entries.append({"path": path, "pages": pages, "scanned": scanned})
+
+    with open(os.path.join(out_dir, "corpus.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "count": count, "pages": pages, "heading_density": heading_density, "fonts": list(fonts),
+            "scanned_ratio": scanned_ratio, "dpi": dpi, "seed": seed, "files": entries,
+        }, f, indent=2)
+    return entries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic PDF corpus for benchmarking")
+    parser.add_argument("--out", default="bench_corpus")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--heading-density", type=float, default=0.15)
+    parser.add_argument("--fonts", nargs="+", choices=sorted(FONT_FAMILIES), default=["helvetica"])
+    parser.add_argument("--scanned-ratio", type=float, default=0.0, help="Share of rasterized (scanned) PDFs")
+    parser.add_argument("--dpi", type=int, default=150, help="Rasterization DPI of scanned variants")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    entries = generate_corpus(args.out, args.count, args.pages, args.heading_density, args.fonts,
+                              args.scanned_ratio, args.dpi, args.seed)
+    print(f"[✓] Generated {len(entries)} PDFs in {args.out}")
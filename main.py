@@ -1,20 +1,80 @@
 # main.py
-import sys
 import os
-from scripts.auto_detector import detect_pdf_type_and_extract
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from scripts.auto_detector import detect_pdf_type_and_extract, iter_extracted_pages
 from scripts.generate_csv import generate_input_csv
-from scripts.heading_detector import detect_headings
+from scripts.heading_detector import (detect_headings, detect_headings_from_pages, load_model, load_preprocessing,
+                                      save_output)
+from scripts import instrumentation
 
 INPUT_PDF_DIR = "input_pdfs"
 OUTPUT_JSON_DIR = "parsed_csv/output_json"  # ✅ output JSON moved inside parsed_csv
 PARSED_CSV_DIR = "parsed_csv/input_json"    # ✅ input JSON moved inside parsed_csv
+INPUT_CSV_PATH = "parsed_csv/input.csv"
 MODEL_PATH = "models/heading_model.pkl"
 LABEL_ENCODER_PATH = "models/label_encoder.pkl"
 
+# Model and label encoder loaded once per batch worker process
+_worker_model = None
+_worker_label_encoder = None
+_worker_preprocessing = None
+
 def get_pdf_name(pdf_path):
     return os.path.splitext(os.path.basename(pdf_path))[0]
 
-def main(pdf_path):
+def process_pdf(pdf_path, model=None, label_encoder=None, keep_artifacts=False, artifact_format="npz",
+                preprocessing=None, **extract_options):
+    """
+    Extracts text blocks from one PDF and runs heading detection on them.
+    By default pages are streamed straight into feature extraction; with keep_artifacts
+    the extracted blocks are written to parsed_csv/input_json first (as .npz or .json).
+    extract_options (page_workers, ocr_dpi, ocr_workers, ocr_granularity, granularity, use_cache) are passed to auto_detector.
+    Returns (input_json_path or None, output_json_path).
+    """
+    pdf_name = get_pdf_name(pdf_path)
+    with instrumentation.document(pdf_name), instrumentation.profile_document(pdf_name):
+        with instrumentation.span("process_pdf"):
+            return _process_pdf(pdf_path, model, label_encoder, keep_artifacts, artifact_format, preprocessing,
+                                **extract_options)
+
+def _process_pdf(pdf_path, model, label_encoder, keep_artifacts, artifact_format, preprocessing, **extract_options):
+    pdf_name = get_pdf_name(pdf_path)
+    output_json_path = os.path.join(OUTPUT_JSON_DIR, f"{pdf_name}.json")
+    os.makedirs(OUTPUT_JSON_DIR, exist_ok=True)
+
+    if not keep_artifacts:
+        if model is None or label_encoder is None:
+            model, label_encoder = load_model(MODEL_PATH, LABEL_ENCODER_PATH)
+        if preprocessing is None:
+            preprocessing = load_preprocessing(MODEL_PATH)
+        pages = iter_extracted_pages(pdf_path, **extract_options)
+        output_data = detect_headings_from_pages(pages, model, label_encoder, os.path.basename(pdf_path), preprocessing)
+        if output_data is not None:
+            save_output(output_data, output_json_path)
+        return None, output_json_path
+
+    # Step 1: Extract blocks using auto-detector
+    input_json_path = detect_pdf_type_and_extract(pdf_path, artifact_format, **extract_options)
+
+    # Move input_json to parsed_csv/input_json, dropping a stale copy in the other format
+    os.makedirs(PARSED_CSV_DIR, exist_ok=True)
+    input_json_target = os.path.join(PARSED_CSV_DIR, f"{pdf_name}.{artifact_format}")
+    os.replace(input_json_path, input_json_target)
+    for ext in ("json", "npz"):
+        stale_path = os.path.join(PARSED_CSV_DIR, f"{pdf_name}.{ext}")
+        if ext != artifact_format and os.path.exists(stale_path):
+            os.remove(stale_path)
+
+    # Step 2: Run heading detection
+    detect_headings(input_json_target, MODEL_PATH, LABEL_ENCODER_PATH, output_json_path,
+                    model=model, label_encoder=label_encoder, preprocessing=preprocessing)
+
+    return input_json_target, output_json_path
+
+def main(pdf_path, keep_artifacts=False, artifact_format="npz", **extract_options):
     if not os.path.exists(pdf_path):
         print(f"[ERROR] File not found: {pdf_path}")
         return
@@ -22,28 +82,159 @@ def main(pdf_path):
     pdf_name = get_pdf_name(pdf_path)
     print(f"[INFO] Processing PDF: {pdf_name}")
 
-    # Step 1: Extract JSON using auto-detector
-    input_json_path = detect_pdf_type_and_extract(pdf_path)
+    input_json_target, output_json_path = process_pdf(pdf_path, keep_artifacts=keep_artifacts,
+                                                      artifact_format=artifact_format, **extract_options)
 
-    # Move input_json to parsed_csv/input_json
-    os.makedirs(PARSED_CSV_DIR, exist_ok=True)
-    input_json_target = os.path.join(PARSED_CSV_DIR, f"{pdf_name}.json")
-    os.rename(input_json_path, input_json_target)
+    if keep_artifacts:
+        # Generate input.csv from input_json
+        with instrumentation.span("generate_input_csv"):
+            generate_input_csv(PARSED_CSV_DIR, INPUT_CSV_PATH, incremental=True)
+        print(f"[✓] Processing complete.\nInput blocks → {input_json_target}\nOutput JSON → {output_json_path}")
+    else:
+        print(f"[✓] Processing complete.\nOutput JSON → {output_json_path}")
 
-    # Step 2: Generate input.csv from input_json
-    input_csv_path = "parsed_csv/input.csv"
-    generate_input_csv(PARSED_CSV_DIR, input_csv_path)
+def _init_worker(model_path, label_encoder_path, instrumentation_settings):
+    global _worker_model, _worker_label_encoder, _worker_preprocessing
+    _worker_model, _worker_label_encoder = load_model(model_path, label_encoder_path)
+    _worker_preprocessing = load_preprocessing(model_path)
+    if instrumentation_settings["sink"] or instrumentation_settings["profile"]:
+        # Spans are buffered and shipped back with each result; the parent writes the sink
+        instrumentation.configure("buffer" if instrumentation_settings["sink"] else None,
+                                  profile=instrumentation_settings["profile"],
+                                  profile_dir=instrumentation_settings["profile_dir"])
 
-    # Step 3: Run heading detection
-    output_json_path = os.path.join(OUTPUT_JSON_DIR, f"{pdf_name}.json")
-    os.makedirs(OUTPUT_JSON_DIR, exist_ok=True)
-    detect_headings(input_json_target, MODEL_PATH, LABEL_ENCODER_PATH, output_json_path)
+def _process_pdf_in_worker(pdf_path, keep_artifacts, artifact_format, extract_options):
+    start = time.perf_counter()
+    try:
+        process_pdf(pdf_path, _worker_model, _worker_label_encoder, keep_artifacts, artifact_format,
+                    _worker_preprocessing, **extract_options)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return pdf_path, error, time.perf_counter() - start, instrumentation.drain()
+
+def run_batch(input_dir, workers=None, keep_artifacts=False, artifact_format="npz", **extract_options):
+    """
+    Processes every PDF in input_dir over a process pool.
+    Each worker loads the model once; with keep_artifacts input.csv is regenerated once at the end.
+    The model is checked in the parent first, so an unloadable model is reported once instead of per worker.
+    """
+    pdf_paths = sorted(
+        os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.lower().endswith(".pdf")
+    )
+    if not pdf_paths:
+        print(f"[!] No PDF files found in: {input_dir}")
+        return []
+
+    # Workers load the model in their initializer, where a failure would only surface as a broken pool
+    try:
+        load_model(MODEL_PATH, LABEL_ENCODER_PATH)
+        load_preprocessing(MODEL_PATH)
+    except Exception as e:
+        print(f"[ERROR] Cannot load model {MODEL_PATH}: {type(e).__name__}: {e}")
+        return []
+
+    workers = workers or os.cpu_count() or 1
+    if not extract_options.get("ocr_workers"):
+        # Each worker would otherwise start one tesseract per core: workers x cores OCR processes
+        extract_options["ocr_workers"] = max(1, (os.cpu_count() or 1) // workers)
+    print(f"[INFO] Processing {len(pdf_paths)} PDFs from {input_dir} with {workers} workers "
+          f"({extract_options['ocr_workers']} OCR threads each)")
+
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(MODEL_PATH, LABEL_ENCODER_PATH, instrumentation.settings())) as executor:
+        futures = {
+            executor.submit(_process_pdf_in_worker, pdf_path, keep_artifacts, artifact_format, extract_options): pdf_path
+            for pdf_path in pdf_paths
+        }
+        pool_error = None
+        for future in as_completed(futures):
+            try:
+                pdf_path, error, elapsed, spans = future.result()
+            except BrokenProcessPool as e:
+                # A worker died (initializer failure, out of memory, ...): every pending document fails with it
+                if pool_error is None:
+                    pool_error = f"{type(e).__name__}: {e}"
+                    print(f"[ERROR] Worker pool stopped: {pool_error}")
+                results.append((futures[future], pool_error, 0.0))
+                continue
+            instrumentation.ingest(spans)
+            results.append((pdf_path, error, elapsed))
+            if error:
+                print(f"[ERROR] {get_pdf_name(pdf_path)} failed after {elapsed:.2f}s: {error}")
+            else:
+                print(f"[✓] {get_pdf_name(pdf_path)} done in {elapsed:.2f}s")
+    total_time = time.perf_counter() - start
 
-    print(f"[✓] Processing complete.\nInput JSON → {input_json_target}\nOutput JSON → {output_json_path}")
+    if keep_artifacts:
+        with instrumentation.span("generate_input_csv"):
+            generate_input_csv(PARSED_CSV_DIR, INPUT_CSV_PATH, incremental=True)
+    instrumentation.flush()
+
+    succeeded = [r for r in results if r[1] is None]
+    failed = [r for r in results if r[1] is not None]
+    print("\n[INFO] Batch summary")
+    for pdf_path, error, elapsed in sorted(results):
+        status = "OK" if error is None else f"FAILED ({error})"
+        print(f"  {os.path.basename(pdf_path)}: {status} [{elapsed:.2f}s]")
+    print(f"[✓] {len(succeeded)} succeeded, {len(failed)} failed in {total_time:.2f}s "
+          f"({len(results) / total_time:.2f} docs/sec)")
+    return results
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python main.py input_pdfs/yourfile.pdf")
+    parser = argparse.ArgumentParser(description="Detect title and headings in PDF files")
+    parser.add_argument("pdf_path", nargs="?", help="Path to a single PDF file")
+    parser.add_argument("--input-dir", default=None, help="Process every PDF in this directory")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: all cores)")
+    parser.add_argument("--page-workers", type=int, default=1,
+                        help="Split the pages of a single large PDF across this many processes (0 = all cores)")
+    parser.add_argument("--ocr-dpi", type=int, default=300, help="Rasterization DPI for scanned PDFs")
+    parser.add_argument("--ocr-workers", type=int, default=None,
+                        help="Concurrent tesseract calls per scanned PDF "
+                             "(default: all cores, or cores / --workers with --input-dir)")
+    parser.add_argument("--ocr-granularity", choices=["line", "word"], default="line",
+                        help="OCR blocks per text line (default) or per word")
+    parser.add_argument("--granularity", choices=["span", "line", "block"], default="span",
+                        help="Structured PDFs: one block per span (default), or spans merged per line / layout block")
+    parser.add_argument("--model", default=MODEL_PATH,
+                        help="Model file: joblib .pkl, or a NumPy-only .npz exported by train_model --export")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always re-extract instead of reading blocks from the extraction cache")
+    parser.add_argument("--keep-artifacts", action="store_true",
+                        help="Also write the extracted blocks and parsed_csv/input.csv")
+    parser.add_argument("--artifact-format", choices=["npz", "json"], default="npz",
+                        help="Format of kept extracted blocks: compact columnar npz or legacy JSON")
+    parser.add_argument("--metrics", choices=instrumentation.SINKS, default=None,
+                        help="Record per-stage spans (wall/CPU time, pages, blocks, RSS high-water mark) as JSON lines or "
+                             "a Prometheus text file")
+    parser.add_argument("--metrics-path", default=None,
+                        help="Metrics file (default: metrics/spans.jsonl or metrics/pipeline.prom)")
+    parser.add_argument("--profile", choices=instrumentation.PROFILERS, default=None,
+                        help="Profile every document with cProfile (.prof) or pyinstrument (.html)")
+    parser.add_argument("--profile-dir", default="profiles", help="Where per-document profiles are written")
+    args = parser.parse_args()
+    MODEL_PATH = args.model
+
+    if args.metrics or args.profile:
+        default_path = "metrics/spans.jsonl" if args.metrics == "jsonl" else "metrics/pipeline.prom"
+        instrumentation.configure(args.metrics, args.metrics_path or default_path, args.profile, args.profile_dir)
+
+    extract_options = {
+        "page_workers": args.page_workers,
+        "ocr_dpi": args.ocr_dpi,
+        "ocr_workers": args.ocr_workers,
+        "ocr_granularity": args.ocr_granularity,
+        "granularity": args.granularity,
+        "use_cache": not args.no_cache,
+    }
+
+    os.makedirs(INPUT_PDF_DIR, exist_ok=True)
+    if args.input_dir:
+        run_batch(args.input_dir, args.workers, args.keep_artifacts, args.artifact_format, **extract_options)
+    elif args.pdf_path:
+        main(args.pdf_path, args.keep_artifacts, args.artifact_format, **extract_options)
     else:
-        os.makedirs(INPUT_PDF_DIR, exist_ok=True)
-        main(sys.argv[1])
+        print("Usage: python main.py input_pdfs/yourfile.pdf")
+        print("       python main.py --input-dir input_pdfs --workers N")
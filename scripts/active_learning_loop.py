@@ -5,12 +5,17 @@
 # This is useful for active learning scenarios where user corrections are incorporated
 
 import os
+import numpy as np
 import pandas as pd
 import joblib
-from sklearn.ensemble import GradientBoostingClassifier
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
+from scripts.train_model import load_input_table
+from scripts.model_backends import BACKENDS, DEFAULT_BACKEND, make_model
+from scripts.training_store import append_rows
+from scripts.feature_pipeline import FeaturePipeline, MERGE_KEYS, labelled_features, pipeline_path
+from scripts.candidate_filter import fit_candidate_filter, prefilter_path, split_documents
 
 # Paths
 PARSED_INPUT = "parsed_csv/input.csv"
@@ -20,80 +25,134 @@ TRAIN_OUTPUT = "training_data/v1/output.csv"
 MODEL_PATH = "models/heading_model.pkl"
 ENCODER_PATH = "models/label_encoder.pkl"
 
+# Trees added per warm-start retrain
+ADD_ESTIMATORS = 50
+# Fewer new rows than this are all used for fitting; no held-out score is reported
+MIN_HOLDOUT_ROWS = 10
+
 def promote_corrected_rows():
     print("[INFO] Promoting corrected rows from parsed_csv to training_data...")
     
-    parsed_input_df = pd.read_csv(PARSED_INPUT)
+    parsed_input_df = load_input_table(PARSED_INPUT)
     parsed_output_df = pd.read_csv(PARSED_OUTPUT)
 
     merged_df = pd.merge(parsed_input_df, parsed_output_df, on=["file_name", "page_number", "text"], how="inner")
 
-    os.makedirs(os.path.dirname(TRAIN_INPUT), exist_ok=True)
-
-    if os.path.exists(TRAIN_INPUT):
-        input_train_df = pd.read_csv(TRAIN_INPUT)
-        output_train_df = pd.read_csv(TRAIN_OUTPUT)
-
-        input_combined = pd.concat([input_train_df, merged_df[parsed_input_df.columns]], ignore_index=True)
-        output_combined = pd.concat([output_train_df, merged_df[parsed_output_df.columns]], ignore_index=True)
+    # Upsert: rows already in the training store with the same level are skipped,
+    # a corrected level replaces the stored label
+    added = append_rows(merged_df[parsed_input_df.columns], merged_df[parsed_output_df.columns], TRAIN_INPUT, TRAIN_OUTPUT)
+
+    print(f"[✓] Promoted {len(added)} new or relabelled rows ({len(merged_df) - len(added)} already present) "
+          f"to training_data/v1/")
+    return added
+
+def warm_start_model(X, y_levels, add_estimators=ADD_ESTIMATORS):
+    """
+    Loads the saved model and prepares it to grow add_estimators more trees on the new data.
+    Returns (model, label_encoder), or None when a warm start is impossible
+    (no saved model, different label set or feature columns): the caller then retrains from scratch.
+    """
+    if not os.path.exists(MODEL_PATH) or not os.path.exists(ENCODER_PATH):
+        return None
+    model = joblib.load(MODEL_PATH)
+    label_encoder = joblib.load(ENCODER_PATH)
+
+    if set(y_levels) != set(label_encoder.classes_):
+        print("[!] Label set changed → full retrain")
+        return None
+    if list(getattr(model, "feature_names_in_", [])) != list(X.columns):
+        print("[!] Feature columns changed → full retrain")
+        return None
+
+    # Boosting stages already fitted are kept; fit() only adds the new ones
+    if hasattr(model, "max_iter"):
+        model.set_params(warm_start=True, max_iter=model.max_iter + add_estimators)
     else:
-        input_combined = merged_df[parsed_input_df.columns]
-        output_combined = merged_df[parsed_output_df.columns]
-
-    input_combined.to_csv(TRAIN_INPUT, index=False)
-    output_combined.to_csv(TRAIN_OUTPUT, index=False)
-
-    print("[✓] Promoted corrected data to training_data/v1/")
-
-def prepare_features(df):
-    df["alignment"] = df["alignment"].fillna("left")
-    df = pd.get_dummies(df, columns=["alignment"], drop_first=True)
-
-    df["relative_to_max"] = df["font_size"] / df["font_size"].max()
-    df["relative_to_mean"] = df["font_size"] / df["font_size"].mean()
-    df["above_std"] = (df["font_size"] - df["font_size"].mean()) / df["font_size"].std()
-    df["text_len"] = df["text"].apply(len)
-
-    le = LabelEncoder()
-    df["label"] = le.fit_transform(df["level"])
-
-    features = [
-        "font_size", "relative_to_max", "relative_to_mean", "above_std",
-        "is_bold", "is_italic", "line_spacing_before", "line_spacing_after", 
-        "text_len", "y0", "page_number"
-    ] + [col for col in df.columns if col.startswith("alignment_")]
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + add_estimators)
+    return model, label_encoder
+
+def warm_start_split(df, new_rows, classes):
+    """
+    Row positions (fit, test) for a warm start. The added trees are fitted on the newly promoted
+    rows and scored on a held-out share of them, which the saved model has never seen either.
+    Falls back to fitting on the whole store (minus the held-out rows) when the new rows do not
+    cover every label, since boosting re-encodes the labels it is fitted on.
+    """
+    new_keys = pd.MultiIndex.from_frame(new_rows[MERGE_KEYS].astype({"page_number": int}))
+    new_idx = np.flatnonzero(pd.MultiIndex.from_frame(df[MERGE_KEYS]).isin(new_keys))
+    if len(new_idx) >= MIN_HOLDOUT_ROWS:
+        fit_idx, test_idx = train_test_split(new_idx, test_size=0.2, random_state=42)
+    else:
+        fit_idx, test_idx = new_idx, new_idx[:0]
 
-    return df[features], df["label"], le
+    if set(df["level"].iloc[fit_idx]) != set(classes):
+        print("[!] New rows do not cover every label → warm start fits the whole store (held-out rows excluded)")
+        fit_idx = np.setdiff1d(np.arange(len(df)), test_idx)
+    return fit_idx, test_idx
 
-def retrain_model():
+def retrain_model(backend=DEFAULT_BACKEND, full=False, add_estimators=ADD_ESTIMATORS, new_rows=None):
     print("[INFO] Retraining model with updated training data...")
     
     df_input = pd.read_csv(TRAIN_INPUT)
     df_output = pd.read_csv(TRAIN_OUTPUT)
 
-    df = pd.merge(df_input, df_output, on=["file_name", "page_number", "text"], how="inner")
-
-    X, y, label_encoder = prepare_features(df)
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    model = GradientBoostingClassifier(n_estimators=200, learning_rate=0.1, max_depth=5, random_state=42)
+    pipeline = FeaturePipeline()
+    df, X = labelled_features(df_input, df_output, pipeline)
+    label_encoder = LabelEncoder()
+    y = pd.Series(label_encoder.fit_transform(df["level"]), index=X.index)
+
+    warm = None if full or new_rows is None or not len(new_rows) else warm_start_model(X, df["level"], add_estimators)
+    if warm is not None:
+        model, label_encoder = warm
+        # Keep the label ids the saved trees were trained with
+        y = pd.Series(label_encoder.transform(df["level"]), index=X.index)
+        fit_idx, test_idx = warm_start_split(df, new_rows, label_encoder.classes_)
+        X_train, X_test, y_train, y_test = X.iloc[fit_idx], X.iloc[test_idx], y.iloc[fit_idx], y.iloc[test_idx]
+        print(f"[INFO] Warm start: adding {add_estimators} estimators fitted on {len(fit_idx)} rows")
+    else:
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        model = make_model(backend)
     model.fit(X_train, y_train)
 
-    print("[INFO] Evaluating model on test set...")
-    y_pred = model.predict(X_test)
-    print(classification_report(y_test, y_pred, target_names=label_encoder.classes_))
+    if len(X_test):
+        print(f"[INFO] Evaluating model on {len(X_test)} held-out {'new ' if warm is not None else ''}rows...")
+        y_pred = model.predict(X_test)
+        print(classification_report(y_test, y_pred, labels=np.arange(len(label_encoder.classes_)),
+                                    target_names=label_encoder.classes_, zero_division=0))
+    else:
+        print(f"[!] Fewer than {MIN_HOLDOUT_ROWS} new rows → no held-out rows, evaluation skipped")
 
     os.makedirs("models", exist_ok=True)
     joblib.dump(model, MODEL_PATH)
     joblib.dump(label_encoder, ENCODER_PATH)
+    pipeline.save(pipeline_path(MODEL_PATH))
+    # Thresholds follow the grown training set; held-out documents stay out of fitting
+    fit_input, fit_output, _, _ = split_documents(df_input, df_output)
+    try:
+        candidate_filter, _ = fit_candidate_filter(fit_input, fit_output, pipeline=pipeline)
+    except ValueError as e:
+        print(f"[!] Candidate filter not refitted ({e}) → skipped")
+    else:
+        candidate_filter.save(prefilter_path(MODEL_PATH))
 
     print(f"[✓] Model saved to: {MODEL_PATH}")
     print(f"[✓] Label encoder saved to: {ENCODER_PATH}")
 
-def main():
-    promote_corrected_rows()
-    retrain_model()
+def main(backend=DEFAULT_BACKEND, full=False, add_estimators=ADD_ESTIMATORS):
+    added = promote_corrected_rows()
+    if not len(added) and not full:
+        print("[✓] No new training rows → model unchanged")
+        return
+    retrain_model(backend, full, add_estimators, added)
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Promote corrected rows and retrain the heading model")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="hist_gb: HistGradientBoostingClassifier (default), gb: GradientBoostingClassifier (full retrains)")
+    parser.add_argument("--full", action="store_true",
+                        help="Retrain from scratch instead of warm-starting the saved model")
+    parser.add_argument("--add-estimators", type=int, default=ADD_ESTIMATORS,
+                        help="Trees added to the saved model by a warm-start retrain")
+    args = parser.parse_args()
+    main(args.backend, args.full, args.add_estimators)
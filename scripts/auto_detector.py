@@ -1,49 +1,190 @@
 # scripts/auto_detector.py
 
-# Detects whether a pdf file is scanned or structured
+# Detects whether a pdf file is scanned or structured (page by page)
 # and extracts text blocks accordingly
 import os
 import fitz  # PyMuPDF
-import json
-from scripts.pdf_parser import extract_text_blocks
-from scripts.ocr_pdf_parser import ocr_extract_text_blocks
+from scripts.block_store import save_extracted
+from scripts.pdf_parser import iter_text_blocks, PARSER_VERSION
+from scripts.ocr_pdf_parser import iter_ocr_text_blocks, OCR_PARSER_VERSION
+from scripts.extraction_cache import cache_key, load_cached_pages, store_cached_pages
+from scripts import instrumentation
 
-def is_scanned_pdf(pdf_path: str, max_pages_to_check: int = 3, threshold_empty_ratio: float = 0.9) -> bool:
+def _image_coverage(page) -> float:
+    # Share of the page rect covered by placed images (overlaps counted once per image, capped at 1)
+    page_area = abs(page.rect) or 1.0
+    covered = 0.0
+    for info in page.get_image_info():
+        covered += abs(fitz.Rect(info["bbox"]) & page.rect)
+    return min(covered / page_area, 1.0)
+
+def _visible_chars(page) -> int:
+    chars = 0
+    for block in page.get_text("rawdict")["blocks"]:
+        for line in block.get("lines", ()):
+            for span in line["spans"]:
+                chars += sum(1 for char in span["chars"] if not char["c"].isspace())
+    return chars
+
+def page_needs_ocr(page, min_chars: int = 10, min_image_coverage: float = 0.5) -> bool:
+    """
+    Decides from cheap page metadata whether a page lacks a usable text layer:
+    - no font resources: nothing to extract, OCR it if it carries images
+    - fonts but no page-sized image: born-digital, no text extraction needed
+    - fonts and a page-sized image (scan with a possible OCR layer): count characters with rawdict
+    """
+    has_fonts = bool(page.get_fonts())
+    has_images = bool(page.get_images())
+    if not has_fonts:
+        return has_images
+    if not has_images or _image_coverage(page) < min_image_coverage:
+        return False
+    return _visible_chars(page) < min_chars
+
+def is_scanned_pdf(pdf_path: str, max_pages_to_check: int = 3, threshold_empty_ratio: float = 0.9,
+                   doc=None) -> bool:
+    """
+    Checks if a PDF is scanned from the text-layer / image metadata of the first few pages.
+    Pass an open doc to avoid opening the file again.
+    """
+    owns_doc = doc is None
+    if owns_doc:
+        doc = fitz.open(pdf_path)
+    try:
+        pages_to_check = min(len(doc), max_pages_to_check)
+        if not pages_to_check:
+            return False
+        empty_pages = sum(page_needs_ocr(doc[page_num]) for page_num in range(pages_to_check))
+        return empty_pages / pages_to_check >= threshold_empty_ratio
+    finally:
+        if owns_doc:
+            doc.close()
+
+
+def classify_pages(pdf_path: str, min_chars: int = 10, doc=None) -> list:
     """
-    Checks if a PDF is scanned by analyzing text presence on the first few pages.
+    Per-page check: returns True for every page without a usable text layer (see page_needs_ocr).
+    Pass an open doc to share it with the extractor.
     """
+    owns_doc = doc is None
+    if owns_doc:
+        doc = fitz.open(pdf_path)
+    try:
+        return [page_needs_ocr(page, min_chars) for page in doc]
+    finally:
+        if owns_doc:
+            doc.close()
+
+
+def _merge_pages(scanned_pages, structured_iter, ocr_iter):
+    # Both iterators yield their own pages in ascending order; interleave them back into page order
+    for scanned in scanned_pages:
+        yield next(ocr_iter) if scanned else next(structured_iter)
+
+
+def _closing(doc, pages):
+    # Keeps the shared document open until the page stream is exhausted (or abandoned)
+    try:
+        yield from pages
+    finally:
+        doc.close()
+
+
+def _route_pages(pdf_path: str, structured_options: dict, ocr_options: dict):
+    # One open document serves both page classification and structured extraction
+    filename = os.path.splitext(os.path.basename(pdf_path))[0]
     doc = fitz.open(pdf_path)
-    empty_pages = 0
+    with instrumentation.span("classify_pages") as span:
+        scanned_pages = classify_pages(pdf_path, doc=doc)
+        span.add(pages=len(scanned_pages))
+    ocr_pages = [i + 1 for i, scanned in enumerate(scanned_pages) if scanned]
+
+    if ocr_pages and len(ocr_pages) == len(scanned_pages):
+        doc.close()
+        print(f"🔍 Detected scanned PDF → using OCR for: {filename}.pdf")
+        return "ocr", iter_ocr_text_blocks(pdf_path, **ocr_options)
+
+    if not ocr_pages:
+        print(f"🧾 Detected structured PDF → using direct extraction for: {filename}.pdf")
+        return "structured", _closing(doc, iter_text_blocks(pdf_path, doc=doc, **structured_options))
+
+    text_pages = [i + 1 for i, scanned in enumerate(scanned_pages) if not scanned]
+    print(f"🧩 Detected mixed PDF → OCR for {len(ocr_pages)}/{len(scanned_pages)} pages of: {filename}.pdf")
+    structured_iter = iter_text_blocks(pdf_path, pages=text_pages, doc=doc, **structured_options)
+    ocr_iter = iter_ocr_text_blocks(pdf_path, pages=ocr_pages, **ocr_options)
+    return "mixed", _closing(doc, _merge_pages(scanned_pages, structured_iter, ocr_iter))
+
+
+def extract_pages(pdf_path: str, page_workers: int = 1, ocr_dpi: int = 300, ocr_workers: int = None,
+                  ocr_granularity: str = "line", use_cache: bool = False, granularity: str = "span",
+                  ocr_page_timeout: int = 0):
+    """
+    Classifies every page as scanned or structured and returns (kind, pages), where kind is
+    "ocr", "structured" or "mixed" and pages yields the text blocks one page at a time, in page order.
+    Only pages without a text layer are sent to OCR.
+    page_workers > 1 splits structured extraction of large documents across processes;
+    OCR rasterizes at ocr_dpi, runs up to ocr_workers tesseract calls at once and emits
+    one block per line (ocr_granularity="line") or per word.
+    Structured pages yield one block per span (granularity="span"), or spans merged per line / layout block.
+    ocr_page_timeout (seconds, 0 = none) kills pdftoppm / tesseract on a stuck page and skips it;
+    such runs are never cached, since the skipped pages would be cached as empty.
+    With use_cache, documents already extracted with the same settings are read from the extraction cache.
+    """
+    structured_options = {"workers": page_workers, "granularity": granularity}
+    ocr_options = {"dpi": ocr_dpi, "workers": ocr_workers, "granularity": ocr_granularity,
+                   "page_timeout": ocr_page_timeout}
+    if not use_cache or ocr_page_timeout:
+        kind, pages = _route_pages(pdf_path, structured_options, ocr_options)
+        return kind, instrumentation.iter_span(f"extract_{kind}", pages)
+
+    key = cache_key(pdf_path, pdf_parser=PARSER_VERSION, ocr_parser=OCR_PARSER_VERSION, ocr_dpi=ocr_dpi,
+                    ocr_granularity=ocr_granularity, granularity=granularity, routing="page_metadata")
+    cached = load_cached_pages(key)
+    if cached is not None:
+        print(f"[✓] Using cached extraction for: {os.path.basename(pdf_path)}")
+        kind, pages = cached
+        return kind, instrumentation.iter_span("extract_cached", pages)
+
+    kind, pages = _route_pages(pdf_path, structured_options, ocr_options)
+    return kind, instrumentation.iter_span(f"extract_{kind}", store_cached_pages(key, kind, pages))
 
-    for page_num in range(min(len(doc), max_pages_to_check)):
-        page = doc[page_num]
-        text = page.get_text().strip()
-        if len(text) < 10:
-            empty_pages += 1
 
-    ratio = empty_pages / min(len(doc), max_pages_to_check)
-    return ratio >= threshold_empty_ratio
+def iter_extracted_pages(pdf_path: str, **options):
+    """
+    Streaming variant of extract_blocks: yields the text blocks one page at a time.
+    """
+    return extract_pages(pdf_path, **options)[1]
 
 
-def detect_pdf_type_and_extract(pdf_path: str) -> str:
+def extract_blocks(pdf_path: str, **options) -> dict:
+    """
+    Detects whether the PDF is scanned or structured and returns the extracted text blocks
+    without writing anything to disk.
+    """
+    _, pages = extract_pages(pdf_path, **options)
+    text_blocks = [block for page_blocks in pages for block in page_blocks]
+    return {
+        "pdf_name": os.path.basename(pdf_path),
+        "text_blocks": text_blocks
+    }
+
+
+def detect_pdf_type_and_extract(pdf_path: str, artifact_format: str = "json", **options) -> str:
     """
     Detects whether the PDF is scanned or structured and extracts content accordingly.
-    Saves the extracted text blocks as JSON and returns the output file path.
+    Saves the extracted text blocks as JSON (or the columnar "npz" block format)
+    and returns the output file path. Accepts the same options as extract_pages.
     """
     filename = os.path.splitext(os.path.basename(pdf_path))[0]
     os.makedirs("extracted_json", exist_ok=True)
 
-    if is_scanned_pdf(pdf_path):
-        print(f"🔍 Detected scanned PDF → using OCR for: {filename}.pdf")
-        result = ocr_extract_text_blocks(pdf_path)
-        output_file = f"extracted_json/{filename}_ocr.json"
-    else:
-        print(f"🧾 Detected structured PDF → using direct extraction for: {filename}.pdf")
-        result = extract_text_blocks(pdf_path)
-        output_file = f"extracted_json/{filename}_structured.json"
-
-    with open(output_file, "w") as f:
-        json.dump(result, f, indent=2)
+    kind, pages = extract_pages(pdf_path, **options)
+    result = {
+        "pdf_name": os.path.basename(pdf_path),
+        "text_blocks": [block for page_blocks in pages for block in page_blocks]
+    }
+    output_file = f"extracted_json/{filename}_{kind}.{artifact_format}"
+    save_extracted(result, output_file)
 
-    print(f"[✓] Saved extracted JSON to: {output_file}")
+    print(f"[✓] Saved extracted blocks to: {output_file}")
     return output_file
@@ -0,0 +1,156 @@
+# scripts/block_store.py
+
+# Compact columnar on-disk format for extracted text blocks (.npz)
+# Replaces the indented JSON dumps: one array per field instead of one dict per span,
+# dictionary-encoded font names and alignments, float64 coordinates and font sizes
+# (stored losslessly, so an .npz round trip equals a JSON round trip), float32 spacings and fractions
+# (rounded back to the parsers' precision on load), and all texts in a single UTF-8 buffer with offsets
+# JSON export stays available through load_blocks / export_json
+
+import os
+import json
+import numpy as np
+from scripts.text_block import json_default
+
+# 2: FLOAT_FIELDS stored as float64 (version 1 files, float32, still load)
+BLOCK_STORE_VERSION = 2
+
+FLOAT_FIELDS = ["font_size", "x0", "y0", "x1", "y1"]
+SPACING_FIELDS = ["line_spacing_before", "line_spacing_after"]
+# Optional: only present when the parser merged spans into lines/blocks
+FRACTION_FIELDS = ["bold_fraction", "italic_fraction"]
+
+def _encode_strings(values):
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def _decode_strings(buffer, offsets):
+    data = buffer.tobytes()
+    return [data[start:stop].decode("utf-8") for start, stop in zip(offsets[:-1], offsets[1:])]
+
+def _dictionary_encode(values, dtype):
+    table = {}
+    codes = np.fromiter((table.setdefault(value, len(table)) for value in values), dtype=dtype, count=len(values))
+    return codes, np.array(list(table), dtype=str)
+
+def save_blocks(result: dict, path: str):
+    """
+    Writes an extractor result ({"pdf_name", "text_blocks"}) in the columnar .npz format.
+    """
+    blocks = result.get("text_blocks", [])
+    text_data, text_offsets = _encode_strings([b["text"] for b in blocks])
+    font_codes, font_table = _dictionary_encode([b.get("font_name", "") for b in blocks], np.int32)
+    alignment_codes, alignment_table = _dictionary_encode([b.get("alignment") or "left" for b in blocks], np.uint8)
+
+    arrays = {
+        "version": np.array(BLOCK_STORE_VERSION),
+        "pdf_name": np.array(result.get("pdf_name", "")),
+        "text_data": text_data,
+        "text_offsets": text_offsets,
+        "font_codes": font_codes,
+        "font_table": font_table,
+        "alignment_codes": alignment_codes,
+        "alignment_table": alignment_table,
+        "is_bold": np.array([bool(b.get("is_bold")) for b in blocks], dtype=bool),
+        "is_italic": np.array([bool(b.get("is_italic")) for b in blocks], dtype=bool),
+        "page_number": np.array([b["page_number"] for b in blocks], dtype=np.int32),
+        "block_id": np.array([b.get("block_id", 0) for b in blocks], dtype=np.int32),
+    }
+    for field in FLOAT_FIELDS:
+        arrays[field] = np.array([b[field] for b in blocks], dtype=np.float64)
+    for field in SPACING_FIELDS:
+        arrays[field] = np.array([np.nan if b.get(field) is None else b[field] for b in blocks], dtype=np.float32)
+    for field in FRACTION_FIELDS:
+        if any(b.get(field) is not None for b in blocks):
+            arrays[field] = np.array([np.nan if b.get(field) is None else b[field] for b in blocks], dtype=np.float32)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+def load_block_columns(path: str) -> dict:
+    """
+    Reads a .npz block file into plain columns (lists / float64 arrays) without building per-block dicts.
+    Line spacings are rounded back to the 2 decimals the parsers produce; missing values are NaN.
+    Fraction fields are only present when the file stores them.
+    """
+    with np.load(path) as store:
+        columns = {
+            "pdf_name": str(store["pdf_name"]),
+            "text": _decode_strings(store["text_data"], store["text_offsets"]),
+            "font_name": store["font_table"][store["font_codes"]].tolist(),
+            "alignment": store["alignment_table"][store["alignment_codes"]].tolist(),
+            "is_bold": store["is_bold"],
+            "is_italic": store["is_italic"],
+            "page_number": store["page_number"].astype(np.int64),
+            "block_id": store["block_id"].astype(np.int64),
+        }
+        for field in FLOAT_FIELDS:
+            columns[field] = store[field].astype(np.float64)
+        for field in SPACING_FIELDS:
+            columns[field] = np.round(store[field].astype(np.float64), 2)
+        for field in FRACTION_FIELDS:
+            if field in store.files:
+                columns[field] = np.round(store[field].astype(np.float64), 3)
+    return columns
+
+def load_blocks(path: str) -> dict:
+    """
+    Reads a .npz block file back into the extractor result format ({"pdf_name", "text_blocks"}).
+    """
+    columns = load_block_columns(path)
+    text_blocks = []
+    for i, text in enumerate(columns["text"]):
+        block = {"text": text}
+        for field in ["font_size", "font_name", "x0", "y0", "x1", "y1", "is_bold", "is_italic", "alignment"]:
+            block[field] = columns[field][i]
+        for field in SPACING_FIELDS:
+            value = columns[field][i]
+            block[field] = None if np.isnan(value) else value
+        block["page_number"] = columns["page_number"][i]
+        block["block_id"] = columns["block_id"][i]
+        for field in FRACTION_FIELDS:
+            # Always present, as in TextBlock.to_dict (None unless spans were merged)
+            value = columns[field][i] if field in columns else np.nan
+            block[field] = None if np.isnan(value) else value
+        text_blocks.append({key: value.item() if isinstance(value, np.generic) else value
+                            for key, value in block.items()})
+
+    return {
+        "pdf_name": columns["pdf_name"],
+        "text_blocks": text_blocks
+    }
+
+def load_extracted(path: str) -> dict:
+    """
+    Reads extracted blocks from either a .npz block file or a legacy JSON file.
+    """
+    if path.endswith(".npz"):
+        return load_blocks(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_extracted(result: dict, path: str):
+    """
+    Writes extracted blocks as .npz or indented JSON depending on the file extension.
+    """
+    if path.endswith(".npz"):
+        save_blocks(result, path)
+        return
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2, default=json_default)
+
+def export_json(npz_path: str, json_path: str):
+    save_extracted(load_blocks(npz_path), json_path)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert extracted blocks between .npz and JSON")
+    parser.add_argument("input_path", help="Extracted blocks (.npz or .json)")
+    parser.add_argument("output_path", help="Destination (.npz or .json)")
+    args = parser.parse_args()
+
+    save_extracted(load_extracted(args.input_path), args.output_path)
+    print(f"[✓] Converted {args.input_path} → {args.output_path}")
@@ -0,0 +1,320 @@
+# scripts/candidate_filter.py
+
+# Cheap pre-filter that drops obvious body text before the model sees it
+# Three rules, each dropping a block that:
+#   long_text     is longer than any plausible heading
+#   body_size     is not bold and set at (or below) the document's body font size
+#   sentence_end  ends like a sentence (".", ",", ";", ...)
+# Thresholds are learned from the labelled training data: every rule, and the rules combined,
+# must keep at least recall_target of the heading rows, otherwise the rule is disabled
+# The fitted filter is saved next to the model as <model>.prefilter.json; heading_detector.load_preprocessing
+# picks it up and callers pass it to detection explicitly. Dropped blocks are reported as non-headings
+# Thresholds are fitted on 80% of the documents (split by file_name); the filter records them, and
+# measure only evaluates documents it was not fitted on
+# Run from the repo root:
+#   python -m scripts.candidate_filter fit
+#   python -m scripts.candidate_filter measure
+#   python -m scripts.candidate_filter measure --input parsed_csv/input.csv --output parsed_csv/output.csv
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from scripts.feature_pipeline import FeaturePipeline, MERGE_KEYS, noise_mask, style_flags
+
+# 2: records fitted_documents (version 1 files load without them)
+FILTER_VERSION = 2
+RULES = ["long_text", "body_size", "sentence_end"]
+SENTENCE_END = [".", ",", ";", "!", "?"]
+NON_HEADING_LEVELS = ["None", "Title"]
+# Share of documents held out from fitting, for measure
+HOLDOUT_SHARE = 0.2
+
+INPUT_CSV = "training_data/v1/input.csv"
+OUTPUT_CSV = "training_data/v1/output.csv"
+MODEL_PATH = "models/heading_model.pkl"
+LABEL_ENCODER_PATH = "models/label_encoder.pkl"
+
+def prefilter_path(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + ".prefilter.json"
+
+def candidate_features(df: pd.DataFrame, stats: pd.DataFrame, normalized: pd.Series = None) -> pd.DataFrame:
+    """
+    Per-row inputs of the rules; stats is FeaturePipeline.document_stats over the whole document,
+    normalized the already stripped text, if the caller has it.
+    """
+    docs = df["file_name"] if "file_name" in df.columns else pd.Series("", index=df.index)
+    body_font = stats["body_font"].reindex(docs.to_numpy()).to_numpy(dtype=float)
+    text = df["text"].fillna("").str.strip() if normalized is None else normalized
+    is_bold, _ = style_flags(df)
+    return pd.DataFrame({
+        "text_len": text.str.len().to_numpy(),
+        "size_ratio": df["font_size"].astype(float).to_numpy() / body_font,
+        "is_bold": is_bold.astype(bool),
+        "last_char": text.str[-1:].to_numpy(),
+    }, index=df.index)
+
+class CandidateFilter:
+    """
+    Keeps blocks that could be headings. A threshold of None disables its rule.
+    fitted_documents lists the file_names the thresholds were learned from (None if unknown).
+    """
+    def __init__(self, max_text_len=None, max_body_ratio=None, sentence_end=None, recall_target=None,
+                 fitted_documents=None):
+        self.max_text_len = max_text_len
+        self.max_body_ratio = max_body_ratio
+        self.sentence_end = list(sentence_end) if sentence_end else None
+        self.recall_target = recall_target
+        self.fitted_documents = None if fitted_documents is None else sorted(fitted_documents)
+
+    def drop_masks(self, features: pd.DataFrame) -> dict:
+        # One boolean "drop" array per enabled rule
+        masks = {}
+        if self.max_text_len is not None:
+            masks["long_text"] = features["text_len"].to_numpy() > self.max_text_len
+        if self.max_body_ratio is not None:
+            # NaN ratios (no body size) compare False and are kept
+            masks["body_size"] = ~features["is_bold"].to_numpy() & (features["size_ratio"].to_numpy() <= self.max_body_ratio)
+        if self.sentence_end:
+            masks["sentence_end"] = features["last_char"].isin(self.sentence_end).to_numpy()
+        return masks
+
+    def keep_mask(self, df: pd.DataFrame, stats: pd.DataFrame, normalized: pd.Series = None) -> np.ndarray:
+        keep = np.ones(len(df), dtype=bool)
+        for drop in self.drop_masks(candidate_features(df, stats, normalized)).values():
+            keep &= ~drop
+        return keep
+
+    def to_dict(self) -> dict:
+        return {"version": FILTER_VERSION, "max_text_len": self.max_text_len, "max_body_ratio": self.max_body_ratio,
+                "sentence_end": self.sentence_end, "recall_target": self.recall_target,
+                "fitted_documents": self.fitted_documents}
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            params = json.load(f)
+        if params.pop("version", None) not in (1, FILTER_VERSION):
+            raise ValueError(f"Unsupported candidate filter version in {path}")
+        return cls(**params)
+
+def load_candidate_filter(model_path: str):
+    """
+    The filter saved next to model_path, or None (every block goes to the model).
+    """
+    path = prefilter_path(model_path)
+    return CandidateFilter.load(path) if os.path.exists(path) else None
+
+def split_documents(input_df: pd.DataFrame, output_df: pd.DataFrame, holdout: float = HOLDOUT_SHARE,
+                    random_state: int = 42):
+    """
+    Splits labelled data by file_name into (fit_input, fit_output, holdout_input, holdout_output).
+    Whole documents are held out, since the rules compare blocks with their document's body size.
+    With fewer than 2 documents (or holdout=0) nothing is held out.
+    """
+    documents = input_df["file_name"].drop_duplicates()
+    if len(documents) < 2 or not holdout:
+        return input_df, output_df, input_df.iloc[:0], output_df.iloc[:0]
+    _, holdout_documents = train_test_split(documents, test_size=holdout, random_state=random_state)
+    held_input = input_df["file_name"].isin(holdout_documents)
+    held_output = output_df["file_name"].isin(holdout_documents)
+    return input_df[~held_input], output_df[~held_output], input_df[held_input], output_df[held_output]
+
+def labelled_candidates(input_df: pd.DataFrame, output_df: pd.DataFrame, pipeline: FeaturePipeline = None):
+    """
+    Non-noise input rows with their rule features and an is_heading flag (title rows excluded,
+    as detection removes the title before filtering). Returns (rows, features, stats).
+    """
+    pipeline = pipeline or FeaturePipeline()
+    input_df = input_df.copy()
+    input_df["page_number"] = input_df["page_number"].astype(int)
+    noise = noise_mask(input_df["text"].fillna(""))
+    stats = pipeline.document_stats(input_df, noise)
+
+    headings = output_df[~output_df["level"].isin(NON_HEADING_LEVELS)][MERGE_KEYS + ["level"]].copy()
+    headings["page_number"] = headings["page_number"].astype(int)
+    rows = input_df[~noise.to_numpy()].reset_index(drop=True)
+    rows = rows.merge(headings.drop_duplicates(MERGE_KEYS), on=MERGE_KEYS, how="left")
+    rows["is_heading"] = rows["level"].notna()
+    return rows, candidate_features(rows, stats), stats
+
+def fit_candidate_filter(input_df: pd.DataFrame, output_df: pd.DataFrame, recall_target: float = 0.99,
+                         pipeline: FeaturePipeline = None):
+    """
+    Learns the rule thresholds from labelled rows, then enables rules greedily (most body text
+    dropped per heading lost first) while the combined heading recall stays >= recall_target.
+    Pass the fitting documents only (see split_documents); they are recorded in the filter.
+    Returns (CandidateFilter, report dict).
+    """
+    rows, features, _ = labelled_candidates(input_df, output_df, pipeline)
+    positive = rows["is_heading"].to_numpy()
+    n_pos = int(positive.sum())
+    if n_pos == 0:
+        raise ValueError("No heading rows match the input rows; cannot fit the candidate filter")
+    pos = features[positive]
+    miss_share = 1.0 - recall_target
+
+    # long_text: the recall_target quantile of heading lengths
+    max_text_len = int(np.ceil(np.quantile(pos["text_len"], recall_target)))
+
+    # body_size: non-bold headings are (almost) never set at or below the body size
+    ratios = pos.loc[~pos["is_bold"], "size_ratio"].dropna()
+    max_body_ratio = 1.0
+    if len(ratios):
+        # Stay just below the smallest non-bold heading sizes we must keep
+        max_body_ratio = min(1.0, float(np.nextafter(np.quantile(ratios, miss_share), 0)))
+
+    # sentence_end: only punctuation that (almost) no heading ends with
+    sentence_end = [char for char in SENTENCE_END if (pos["last_char"] == char).mean() <= miss_share]
+
+    candidate = CandidateFilter(max_text_len, max_body_ratio, sentence_end or None, recall_target)
+    masks = candidate.drop_masks(features)
+    order = sorted(masks, key=lambda rule: -(masks[rule] & ~positive).sum() / (1 + (masks[rule] & positive).sum()))
+
+    drop = np.zeros(len(rows), dtype=bool)
+    enabled = []
+    for rule in order:
+        combined = drop | masks[rule]
+        if 1.0 - (combined & positive).sum() / n_pos >= recall_target:
+            drop = combined
+            enabled.append(rule)
+        else:
+            print(f"[!] Rule {rule} would drop too many headings → disabled")
+
+    fitted = CandidateFilter(
+        max_text_len if "long_text" in enabled else None,
+        max_body_ratio if "body_size" in enabled else None,
+        sentence_end if "sentence_end" in enabled else None,
+        recall_target,
+        input_df["file_name"].unique().tolist(),
+    )
+    report = {
+        "documents": len(fitted.fitted_documents),
+        "rows": len(rows),
+        "headings": n_pos,
+        "kept_rows": int((~drop).sum()),
+        "reduction": float(drop.mean()) if len(rows) else 0.0,
+        "recall": 1.0 - float((drop & positive).sum()) / n_pos,
+        "rules": {rule: {"drops": int(masks[rule].sum()), "headings_dropped": int((masks[rule] & positive).sum()),
+                         "enabled": rule in enabled} for rule in RULES if rule in masks},
+    }
+    return fitted, report
+
+def print_report(report: dict):
+    print(f"[INFO] {report['rows']} candidate rows, {report['headings']} headings in {report['documents']} documents")
+    for rule, entry in report["rules"].items():
+        state = "on " if entry["enabled"] else "off"
+        print(f"  [{state}] {rule:<14} drops {entry['drops']:>6} rows ({entry['headings_dropped']} headings)")
+    print(f"[✓] Rows reaching the model: {report['kept_rows']}/{report['rows']} "
+          f"({report['reduction']:.1%} pruned), heading recall {report['recall']:.3f}")
+
+def fit(input_path=INPUT_CSV, output_path=OUTPUT_CSV, model_path=MODEL_PATH, recall_target=0.99,
+        holdout=HOLDOUT_SHARE):
+    from scripts.train_model import load_input_table
+    fit_input, fit_output, holdout_input, _ = split_documents(load_input_table(input_path), pd.read_csv(output_path),
+                                                              holdout)
+    if not len(holdout_input):
+        print("[!] No documents held out → `measure` needs labelled documents from elsewhere")
+    candidate, report = fit_candidate_filter(fit_input, fit_output, recall_target)
+    print_report(report)
+    candidate.save(prefilter_path(model_path))
+    print(f"[✓] Candidate filter saved to: {prefilter_path(model_path)}")
+    return candidate
+
+def _heading_recall(outline, expected):
+    found = {(item["page"], item["text"].strip()) for item in outline}
+    return sum(key in found for key in expected), len(expected)
+
+def measure(input_path=INPUT_CSV, output_path=OUTPUT_CSV, model_path=MODEL_PATH, label_encoder_path=LABEL_ENCODER_PATH,
+            repeat=5):
+    """
+    Runs detection per document with and without the saved filter and reports rows reaching
+    the model, feature + predict throughput and heading recall of the final outline.
+    Only documents the filter was not fitted on are measured: by default the held-out share
+    of the training data, or any other labelled data passed in.
+    """
+    from scripts.train_model import load_input_table
+    from scripts import heading_detector
+
+    model, label_encoder = heading_detector.load_model(model_path, label_encoder_path)
+    preprocessing = heading_detector.load_preprocessing(model_path)
+    if preprocessing.candidate_filter is None:
+        print(f"[ERROR] No candidate filter at {prefilter_path(model_path)} → run `fit` first")
+        return None
+    fitted_documents = preprocessing.candidate_filter.fitted_documents
+    if fitted_documents is None:
+        print(f"[ERROR] {prefilter_path(model_path)} does not record its fitting documents → refit it with `fit`")
+        return None
+    unfiltered = heading_detector.Preprocessing(preprocessing.pipeline)
+
+    input_df = load_input_table(input_path)
+    output_df = pd.read_csv(output_path)
+    fitted = input_df["file_name"].isin(fitted_documents)
+    if fitted.all():
+        print(f"[ERROR] Every document in {input_path} was used to fit the filter → pass held-out labelled data")
+        return None
+    input_df = input_df[~fitted]
+    print(f"[INFO] Measuring on {input_df['file_name'].nunique()} held-out documents "
+          f"({fitted.sum()} rows of fitting documents skipped)")
+    results = {}
+    for label, settings in (("all rows", unfiltered), ("candidates", preprocessing)):
+        rows = found = expected = 0
+        elapsed = 0.0
+        for file_name, doc_rows in input_df.groupby("file_name", sort=False):
+            columns = pd.DataFrame({field: doc_rows[field].to_numpy() for field in heading_detector.BLOCK_FIELDS})
+            # read_csv turns a "None" level into NaN: neither is a heading
+            labels = output_df[(output_df["file_name"] == file_name) & output_df["level"].notna()
+                               & ~output_df["level"].isin(NON_HEADING_LEVELS)]
+            keys = [(int(page), str(text).strip()) for page, text in zip(labels["page_number"], labels["text"])]
+            for _ in range(repeat):
+                start = time.perf_counter()
+                title, kept_positions, X = heading_detector.prepare_columns(columns, settings)
+                outline = []
+                if X is not None:
+                    blocks = columns.iloc[kept_positions][["text", "page_number"]].to_dict("records")
+                    outline = heading_detector.predict_outline(title, blocks, X, model, label_encoder)["outline"]
+                elapsed += time.perf_counter() - start
+            rows += len(kept_positions)
+            doc_found, doc_expected = _heading_recall(outline, keys)
+            found += doc_found
+            expected += doc_expected
+        results[label] = {"rows": rows, "seconds": elapsed / repeat, "recall": found / expected if expected else float("nan")}
+
+    base, filtered = results["all rows"], results["candidates"]
+    n_blocks = len(input_df)
+    print(f"  {'':<12}{'model rows':>12}{'blocks/s':>12}{'recall':>9}")
+    for label, entry in results.items():
+        print(f"  {label:<12}{entry['rows']:>12}{n_blocks / entry['seconds']:>12.0f}{entry['recall']:>9.3f}")
+    print(f"[✓] {1 - filtered['rows'] / max(base['rows'], 1):.1%} fewer rows reach the model, "
+          f"{base['seconds'] / filtered['seconds']:.2f}x throughput, recall change {filtered['recall'] - base['recall']:+.3f}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Learn and measure the candidate pre-filter")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("fit", "Learn thresholds from labelled data and save them next to the model"),
+                            ("measure", "Compare throughput and recall with and without the filter")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--input", default=INPUT_CSV, help="Input features: CSV, or .npz/.json block files")
+        sub.add_argument("--output", default=OUTPUT_CSV, help="Heading labels CSV")
+        sub.add_argument("--model", default=MODEL_PATH)
+    subparsers.choices["fit"].add_argument("--recall-target", type=float, default=0.99,
+                                           help="Minimum share of heading rows the filter must keep")
+    subparsers.choices["fit"].add_argument("--holdout", type=float, default=HOLDOUT_SHARE,
+                                           help="Share of documents left out of fitting, for `measure`")
+    subparsers.choices["measure"].add_argument("--label-encoder", default=LABEL_ENCODER_PATH)
+    subparsers.choices["measure"].add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "fit":
+        fit(args.input, args.output, args.model, args.recall_target, args.holdout)
+    else:
+        measure(args.input, args.output, args.model, args.label_encoder, args.repeat)
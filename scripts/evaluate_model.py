@@ -9,31 +9,16 @@ import os
 from sklearn.metrics import classification_report, confusion_matrix
 import matplotlib.pyplot as plt
 import seaborn as sns
+from scripts.train_model import load_input_table
+from scripts.feature_pipeline import labelled_features, load_pipeline
 
-def load_data(input_csv, output_csv):
-    input_df = pd.read_csv(input_csv)
+def load_data(input_csv, output_csv, pipeline):
+    """
+    Returns (merged rows, X) built with the feature pipeline the model was trained with.
+    """
+    input_df = load_input_table(input_csv)
     output_df = pd.read_csv(output_csv)
-
-    df = pd.merge(input_df, output_df, on=["file_name", "page_number", "text"], how="inner")
-    return df
-
-def prepare_features(df, label_encoder):
-    df["relative_to_max"] = df["font_size"] / df["font_size"].max()
-    df["relative_to_mean"] = df["font_size"] / df["font_size"].mean()
-    df["above_std"] = (df["font_size"] - df["font_size"].mean()) / df["font_size"].std()
-    df["text_len"] = df["text"].apply(len)
-    df["alignment"] = df["alignment"].fillna("left")
-    df = pd.get_dummies(df, columns=["alignment"], drop_first=True)
-
-    features = [
-        "font_size", "relative_to_max", "relative_to_mean", "above_std",
-        "is_bold", "is_italic", "line_spacing_before", "line_spacing_after", 
-        "text_len", "y0", "page_number"
-    ] + [col for col in df.columns if col.startswith("alignment_")]
-
-    X = df[features]
-    y_true = label_encoder.transform(df["level"])
-    return X, y_true
+    return labelled_features(input_df, output_df, pipeline)
 
 def plot_confusion_matrix(y_true, y_pred, labels, title="Confusion Matrix"):
     cm = confusion_matrix(y_true, y_pred)
@@ -65,8 +50,8 @@ def main():
     print("[INFO] Loading model and data...")
     model = joblib.load(MODEL_PATH)
     label_encoder = joblib.load(LABEL_ENCODER_PATH)
-    df = load_data(INPUT_CSV, OUTPUT_CSV)
-    X, y_true = prepare_features(df, label_encoder)
+    df, X = load_data(INPUT_CSV, OUTPUT_CSV, load_pipeline(MODEL_PATH))
+    y_true = label_encoder.transform(df["level"])
 
     print("[INFO] Predicting...")
     y_pred = model.predict(X)
@@ -0,0 +1,145 @@
+# scripts/extraction_cache.py
+
+# On-disk cache of extracted text blocks
+# Entries are keyed by a hash of the PDF bytes plus the extractor settings,
+# so re-running heading detection on a known PDF skips PyMuPDF/OCR entirely
+# Each entry is a sequence of zlib-compressed pickle frames (one per page),
+# written while the pages stream through, and old entries are evicted LRU by total size
+
+import os
+import json
+import zlib
+import pickle
+import struct
+import hashlib
+
+CACHE_DIR = ".cache/extraction"
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+CACHE_FORMAT_VERSION = 1
+
+_MAGIC = b"PDFBLK1\n"
+_FRAME_HEADER = struct.Struct("<I")
+
+def pdf_digest(pdf_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(pdf_path: str, **settings) -> str:
+    """
+    Combines the PDF content hash with every setting that changes the extracted blocks
+    (parser versions, OCR DPI, ...). Settings that only affect speed must not be included.
+    """
+    settings["cache_format"] = CACHE_FORMAT_VERSION
+    payload = pdf_digest(pdf_path) + json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _entry_path(key: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{key}.bin")
+
+def _write_frame(f, obj):
+    data = zlib.compress(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    f.write(_FRAME_HEADER.pack(len(data)))
+    f.write(data)
+
+def _read_frame(f):
+    header = f.read(_FRAME_HEADER.size)
+    if not header:
+        raise EOFError
+    (length,) = _FRAME_HEADER.unpack(header)
+    return pickle.loads(zlib.decompress(f.read(length)))
+
+def _iter_frames(f):
+    try:
+        while True:
+            try:
+                yield _read_frame(f)
+            except EOFError:
+                return
+    finally:
+        f.close()
+
+def load_cached_pages(key: str, cache_dir: str = CACHE_DIR):
+    """
+    Returns (kind, page iterator) for a cached entry, or None on a miss.
+    Pages are decoded lazily, one frame at a time.
+    """
+    path = _entry_path(key, cache_dir)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    try:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError("bad magic")
+        metadata = _read_frame(f)
+    except Exception:
+        f.close()
+        _remove_entry(path)
+        return None
+
+    # Refresh the access time used for LRU eviction; another worker may have evicted
+    # the entry since it was opened, which counts as a miss
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        f.close()
+        return None
+    return metadata["kind"], _iter_frames(f)
+
+def _remove_entry(path: str):
+    # Concurrent workers evict from the same directory: an entry may already be gone
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def store_cached_pages(key: str, kind: str, pages, cache_dir: str = CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES):
+    """
+    Passes pages through unchanged while writing them to the cache.
+    The entry only becomes visible once every page has been consumed.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(key, cache_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    completed = False
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC)
+            _write_frame(f, {"kind": kind})
+            for page_blocks in pages:
+                _write_frame(f, page_blocks)
+                yield page_blocks
+        os.replace(tmp_path, path)
+        completed = True
+    finally:
+        if not completed:
+            _remove_entry(tmp_path)
+
+    evict(cache_dir, max_bytes)
+
+def evict(cache_dir: str = CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES):
+    """
+    Deletes least recently used entries until the cache fits in max_bytes.
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".bin"):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove_entry(path)
+        total -= size
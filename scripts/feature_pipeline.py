@@ -0,0 +1,225 @@
+# scripts/feature_pipeline.py
+
+# The one feature-engineering path shared by training, evaluation, active learning and inference
+# FeaturePipeline turns block rows (input.csv rows, block_columns frames) into the model matrix
+# with a fixed column schema: alignment is one-hot encoded against a fixed category list,
+# so the dummy columns no longer depend on which alignments a given run happens to see
+# Font statistics (max / mean / std of non-noise font sizes) are computed per document
+# in one groupby, for training and inference alike
+# The fitted schema is saved next to the model as <model>.features.json
+
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+
+FEATURE_SCHEMA_VERSION = 1
+
+# Keywords to filter out noisy or irrelevant content
+IGNORE_TEXTS = ["author", "date", "page", "footer", "header", "contact", "copyright", "www.", "@", ".com"]
+
+def keyword_pattern(keywords) -> str:
+    """
+    "Contains any keyword" regex factored as a prefix trie: at each text position the matcher
+    follows at most one branch per character instead of retrying every keyword.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        # A keyword ending here already matches; longer keywords sharing the prefix add nothing
+        if "" in node:
+            return ""
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return build(trie)
+
+NOISE_PATTERN = re.compile(keyword_pattern(IGNORE_TEXTS))
+
+BASE_FEATURES = [
+    "font_size", "relative_to_max", "relative_to_mean", "above_std",
+    "is_bold", "is_italic", "line_spacing_before", "line_spacing_after",
+    "text_len", "y0", "page_number"
+]
+ALIGNMENTS = ["center", "indented", "left"]
+MERGE_KEYS = ["file_name", "page_number", "text"]
+# Lowercase font-name markers, the same rule pdf_parser uses for its is_bold / is_italic flags
+BOLD_MARKERS = ("bold",)
+ITALIC_MARKERS = ("italic", "oblique")
+
+def noise_mask(texts: pd.Series, normalized: pd.Series = None) -> pd.Series:
+    # One regex pass over the lowered text for all keywords; pass the already stripped text as normalized
+    stripped = texts.str.strip() if normalized is None else normalized
+    return (
+        stripped.str.lower().str.contains(NOISE_PATTERN)
+        | stripped.str.isdigit()
+        | (stripped.str.len() < 3)
+    )
+
+def _flag(values: pd.Series, fallback: pd.Series) -> pd.Series:
+    # Booleans may arrive as bools, 0/1 or "True"/"False" strings (CSV); missing values use the fallback
+    if values.dtype == bool:
+        return values.astype(int)
+    missing = values.isna()
+    flags = values.astype(str).str.strip().str.lower().isin(["true", "1", "1.0"])
+    return flags.where(~missing, fallback).astype(int)
+
+def font_name_flags(font_name) -> tuple:
+    """
+    (is_bold, is_italic) implied by a font name, case-insensitively ("Helvetica-bold", "ArialBD,bold").
+    """
+    name = (font_name or "").lower()
+    return any(m in name for m in BOLD_MARKERS), any(m in name for m in ITALIC_MARKERS)
+
+def block_style_flags(block) -> tuple:
+    """
+    Per-block style_flags: the extractor's flags, or the font name for blocks without them.
+    """
+    name_bold, name_italic = font_name_flags(block.get("font_name"))
+    is_bold, is_italic = block.get("is_bold"), block.get("is_italic")
+    return (name_bold if is_bold is None else bool(is_bold)), (name_italic if is_italic is None else bool(is_italic))
+
+def _contains_any(font_name: pd.Series, markers) -> pd.Series:
+    found = pd.Series(False, index=font_name.index)
+    for marker in markers:
+        found |= font_name.str.contains(marker, regex=False)
+    return found
+
+def style_flags(df: pd.DataFrame):
+    """
+    (is_bold, is_italic) 0/1 arrays; rows without the extractor's flags fall back to the font name.
+    """
+    font_name = df.get("font_name", pd.Series("", index=df.index)).fillna("").str.lower()
+    is_bold = df["is_bold"] if "is_bold" in df.columns else pd.Series(np.nan, index=df.index)
+    is_italic = df["is_italic"] if "is_italic" in df.columns else pd.Series(np.nan, index=df.index)
+    return (
+        _flag(is_bold, _contains_any(font_name, BOLD_MARKERS)).to_numpy(),
+        _flag(is_italic, _contains_any(font_name, ITALIC_MARKERS)).to_numpy(),
+    )
+
+def pipeline_path(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + ".features.json"
+
+class FeaturePipeline:
+    """
+    Builds the model feature matrix from block rows. fit() freezes the schema, transform()
+    always returns exactly self.columns in that order.
+    """
+    def __init__(self, alignments=None):
+        self.alignments = list(alignments or ALIGNMENTS)
+        self.columns = BASE_FEATURES + [f"alignment_{value}" for value in self.alignments[1:]]
+
+    def fit(self, df: pd.DataFrame):
+        missing = [col for col in ("text", "font_size") if col not in df.columns]
+        if missing:
+            raise ValueError(f"Feature input is missing columns: {missing}")
+        unknown = set(df.get("alignment", pd.Series(dtype=object)).dropna()) - set(self.alignments)
+        if unknown:
+            print(f"[!] Unknown alignment values {sorted(unknown)} are encoded as 'left'")
+        return self
+
+    def document_stats(self, df: pd.DataFrame, noise: pd.Series = None) -> pd.DataFrame:
+        """
+        Per-document font statistics over non-noise rows, indexed by file_name
+        ("" when the rows belong to a single unnamed document). body_font is the most
+        common font size (rounded to 0.1pt), i.e. the body text size.
+        """
+        if noise is None:
+            noise = noise_mask(df["text"])
+        docs = df["file_name"] if "file_name" in df.columns else pd.Series("", index=df.index)
+        keep = ~np.asarray(noise)
+        font_size = df["font_size"].astype(float)[keep]
+        grouped = font_size.groupby(docs[keep])
+        size_counts = font_size.round(1).groupby([docs[keep], font_size.round(1)]).size()
+        return pd.DataFrame({
+            "max_font": grouped.max(),
+            "mean_font": grouped.mean(),
+            "std_font": grouped.std(ddof=0),
+            "body_font": size_counts.groupby(level=0).idxmax().str[1] if len(size_counts) else pd.Series(dtype=float),
+        })
+
+    def transform(self, df: pd.DataFrame, stats: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Feature matrix for df; stats comes from document_stats over each document's full block list
+        (computed from df itself when omitted).
+        """
+        if stats is None:
+            stats = self.document_stats(df)
+        docs = df["file_name"] if "file_name" in df.columns else pd.Series("", index=df.index)
+        doc_stats = stats.reindex(docs.to_numpy())
+        max_font = doc_stats["max_font"].to_numpy()
+        mean_font = doc_stats["mean_font"].to_numpy()
+        # A document with a single font size has no spread
+        std_font = np.where(doc_stats["std_font"].to_numpy() > 0, doc_stats["std_font"].to_numpy(), 1.0)
+
+        font_size = df["font_size"].astype(float).to_numpy()
+        is_bold, is_italic = style_flags(df)
+        alignment = df.get("alignment", pd.Series("left", index=df.index)).fillna("left")
+        alignment = alignment.where(alignment.isin(self.alignments), "left")
+
+        X = pd.DataFrame({
+            "font_size": font_size,
+            "relative_to_max": font_size / max_font,
+            "relative_to_mean": font_size / mean_font,
+            "above_std": (font_size - mean_font) / std_font,
+            "is_bold": is_bold,
+            "is_italic": is_italic,
+            "line_spacing_before": df.get("line_spacing_before", pd.Series(0.0, index=df.index)).astype(float).fillna(0.0).to_numpy(),
+            "line_spacing_after": df.get("line_spacing_after", pd.Series(0.0, index=df.index)).astype(float).fillna(0.0).to_numpy(),
+            "text_len": df["text"].str.len().to_numpy(),
+            "y0": df.get("y0", pd.Series(0.0, index=df.index)).astype(float).to_numpy(),
+            "page_number": df.get("page_number", pd.Series(1, index=df.index)).astype(int).to_numpy(),
+        }, index=df.index)
+        for value in self.alignments[1:]:
+            X[f"alignment_{value}"] = (alignment == value).to_numpy()
+        return X[self.columns]
+
+    def fit_transform(self, df: pd.DataFrame, stats: pd.DataFrame = None) -> pd.DataFrame:
+        return self.fit(df).transform(df, stats)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": FEATURE_SCHEMA_VERSION, "alignments": self.alignments, "columns": self.columns},
+                      f, indent=2)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            schema = json.load(f)
+        if schema.get("version") != FEATURE_SCHEMA_VERSION:
+            raise ValueError(f"Unsupported feature schema version {schema.get('version')} in {path}")
+        pipeline = cls(schema["alignments"])
+        if pipeline.columns != schema["columns"]:
+            raise ValueError(f"Feature schema in {path} does not match this version of the pipeline")
+        return pipeline
+
+def load_pipeline(model_path: str) -> FeaturePipeline:
+    """
+    The pipeline saved next to model_path, or the default schema for models trained before it existed.
+    """
+    path = pipeline_path(model_path)
+    return FeaturePipeline.load(path) if os.path.exists(path) else FeaturePipeline()
+
+def labelled_features(input_df: pd.DataFrame, output_df: pd.DataFrame, pipeline: FeaturePipeline = None):
+    """
+    Joins block rows with their heading labels and builds the feature matrix.
+    Font statistics come from every block of each document, not only the labelled rows.
+    Returns (merged rows, X) with X aligned to the merged rows.
+    """
+    pipeline = pipeline or FeaturePipeline()
+    input_df = input_df.copy()
+    output_df = output_df.copy()
+    # Ensure page_number is int for consistent merge
+    input_df["page_number"] = input_df["page_number"].astype(int)
+    output_df["page_number"] = output_df["page_number"].astype(int)
+
+    stats = pipeline.fit(input_df).document_stats(input_df)
+    merged = pd.merge(input_df, output_df, on=MERGE_KEYS, how="inner")
+    return merged, pipeline.transform(merged, stats)
@@ -8,44 +8,75 @@
 # scripts/generate_csv.py
 
 import os
+import io
 import json
 import csv
+import hashlib
 import argparse
+from scripts.block_store import load_extracted
+from scripts.feature_pipeline import block_style_flags
+
+INPUT_CSV_FIELDS = [
+    "file_name", "page_number", "text", "font_size", "font_name", "x0", "y0", "x1", "y1",
+    "is_bold", "is_italic", "alignment", "line_spacing_before", "line_spacing_after"
+]
+MANIFEST_SUFFIX = ".manifest.json"
 
 def parse_input_json_file(json_file):
+    # Accepts both legacy JSON and columnar .npz block files
     rows = []
-    with open(json_file, 'r') as f:
-        data = json.load(f)
-        pdf_name = data.get("pdf_name", os.path.basename(json_file).replace(".json", ".pdf"))
-        for block in data.get("text_blocks", []):
-            rows.append({
-                "file_name": pdf_name,
-                "page_number": block.get("page_number"),
-                "text": block.get("text"),
-                "font_size": block.get("font_size"),
-                "font_name": block.get("font_name"),
-                "x0": block.get("x0"),
-                "y0": block.get("y0"),
-                "x1": block.get("x1"),
-                "y1": block.get("y1"),
-                "is_bold": "Bold" in block.get("font_name", ""),
-                "is_italic": "Italic" in block.get("font_name", "") or "Oblique" in block.get("font_name", ""),
-                "alignment": block.get("alignment"),
-                "line_spacing_before": block.get("line_spacing_before"),
-                "line_spacing_after": block.get("line_spacing_after")
-            })
+    data = load_extracted(json_file)
+    pdf_name = data.get("pdf_name", os.path.basename(json_file).replace(".json", ".pdf"))
+    for block in data.get("text_blocks", []):
+        # Same flags inference uses (feature_pipeline.style_flags), so training rows match
+        is_bold, is_italic = block_style_flags(block)
+        rows.append({
+            "file_name": pdf_name,
+            "page_number": block.get("page_number"),
+            "text": block.get("text"),
+            "font_size": block.get("font_size"),
+            "font_name": block.get("font_name"),
+            "x0": block.get("x0"),
+            "y0": block.get("y0"),
+            "x1": block.get("x1"),
+            "y1": block.get("y1"),
+            "is_bold": is_bold,
+            "is_italic": is_italic,
+            "alignment": block.get("alignment"),
+            "line_spacing_before": block.get("line_spacing_before"),
+            "line_spacing_after": block.get("line_spacing_after")
+        })
     return rows
 
-def generate_input_csv(json_input, output_csv):
+def list_json_files(json_input):
+    if os.path.isdir(json_input):
+        return sorted(
+            os.path.join(json_input, file) for file in os.listdir(json_input) if file.endswith((".json", ".npz"))
+        )
+    return [json_input]
+
+def read_input_rows(json_input):
+    """
+    Input CSV rows for a block file (.json / .npz) or a directory of them, without writing a CSV.
+    """
     rows = []
+    for file_path in list_json_files(json_input):
+        rows.extend(parse_input_json_file(file_path))
+    return rows
 
-    if os.path.isdir(json_input):
-        for file in os.listdir(json_input):
-            if file.endswith(".json"):
-                file_path = os.path.join(json_input, file)
-                rows.extend(parse_input_json_file(file_path))
-    else:
-        rows.extend(parse_input_json_file(json_input))
+def render_input_rows(rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=INPUT_CSV_FIELDS, quoting=csv.QUOTE_ALL)
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+def generate_input_csv(json_input, output_csv, incremental=False):
+    if incremental:
+        return update_input_csv(json_input, output_csv)
+
+    rows = read_input_rows(json_input)
 
     if not rows:
         print(f"[!] No valid text blocks found in: {json_input}")
@@ -53,12 +84,136 @@ def generate_input_csv(json_input, output_csv):
 
     os.makedirs(os.path.dirname(output_csv), exist_ok=True)
     with open(output_csv, "w", newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=rows[0].keys(), quoting=csv.QUOTE_ALL)
+        writer = csv.DictWriter(f, fieldnames=INPUT_CSV_FIELDS, quoting=csv.QUOTE_ALL)
         writer.writeheader()
         writer.writerows(rows)
 
+    # A full rebuild invalidates any incremental manifest
+    if os.path.exists(output_csv + MANIFEST_SUFFIX):
+        os.remove(output_csv + MANIFEST_SUFFIX)
+
     print(f"[✓] Input CSV saved to: {output_csv}")
 
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _load_manifest(manifest_path, output_csv):
+    """
+    Returns the manifest only if the CSV on disk is still the one it describes.
+    """
+    if not os.path.exists(manifest_path) or not os.path.exists(output_csv):
+        return None
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    stat = os.stat(output_csv)
+    if manifest.get("csv_size") != stat.st_size or manifest.get("csv_mtime_ns") != stat.st_mtime_ns:
+        return None
+    return manifest
+
+def _save_manifest(manifest_path, output_csv, plan):
+    stat = os.stat(output_csv)
+    manifest = {
+        "csv_size": stat.st_size,
+        "csv_mtime_ns": stat.st_mtime_ns,
+        "files": {file_path: entry for file_path, entry, _, _ in plan},
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+
+def update_input_csv(json_input, output_csv):
+    """
+    Incrementally updates input.csv: only JSON files whose mtime/size and content hash changed
+    are re-parsed, unchanged rows are copied as raw bytes and new trailing files are appended.
+    The result is byte-identical to a full rebuild with generate_input_csv.
+    """
+    manifest_path = output_csv + MANIFEST_SUFFIX
+    manifest = _load_manifest(manifest_path, output_csv) or {"files": {}}
+    old_entries = manifest["files"]
+
+    # plan: (path, manifest entry, old entry to reuse or None, freshly rendered bytes or None)
+    plan = []
+    for file_path in list_json_files(json_input):
+        stat = os.stat(file_path)
+        entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+        old = old_entries.get(file_path)
+
+        if old and old["mtime_ns"] == entry["mtime_ns"] and old["size"] == entry["size"]:
+            entry["sha256"] = old["sha256"]
+        else:
+            entry["sha256"] = _file_sha256(file_path)
+
+        if old and old["sha256"] == entry["sha256"]:
+            plan.append((file_path, entry, old, None))
+        else:
+            plan.append((file_path, entry, None, render_input_rows(parse_input_json_file(file_path))))
+
+    removed = set(old_entries) - {file_path for file_path, _, _, _ in plan}
+    changed = [file_path for file_path, _, old, _ in plan if old is None]
+
+    if not any(old["length"] if old is not None else data for _, _, old, data in plan):
+        print(f"[!] No valid text blocks found in: {json_input}")
+        return
+
+    if not changed and not removed:
+        # Refresh mtimes so touched-but-identical files are not re-hashed next run
+        for file_path, entry, old, _ in plan:
+            entry["offset"], entry["length"] = old["offset"], old["length"]
+        _save_manifest(manifest_path, output_csv, plan)
+        print(f"[✓] Input CSV up to date: {output_csv}")
+        return
+
+    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
+    first_new = next((i for i, (_, _, old, _) in enumerate(plan) if old is None), len(plan))
+    can_append = (
+        old_entries
+        and not removed
+        and all(old is None and file_path not in old_entries for file_path, _, old, _ in plan[first_new:])
+    )
+
+    if can_append:
+        # Only new files sorted after every known file: append their rows
+        # (a changed known file has rows in the CSV already, so it always forces a rebuild)
+        offset = os.path.getsize(output_csv)
+        with open(output_csv, "ab") as out:
+            for file_path, entry, old, data in plan:
+                if old is not None:
+                    entry["offset"], entry["length"] = old["offset"], old["length"]
+                    continue
+                out.write(data)
+                entry["offset"], entry["length"] = offset, len(data)
+                offset += len(data)
+    else:
+        # Rebuild, copying unchanged rows from the previous CSV without re-parsing their JSON
+        tmp_path = output_csv + ".tmp"
+        src = open(output_csv, "rb") if any(old is not None for _, _, old, _ in plan) else None
+        try:
+            with open(tmp_path, "wb") as out:
+                header = render_input_rows([], header=True)
+                out.write(header)
+                offset = len(header)
+                for file_path, entry, old, data in plan:
+                    if old is not None:
+                        src.seek(old["offset"])
+                        data = src.read(old["length"])
+                    out.write(data)
+                    entry["offset"], entry["length"] = offset, len(data)
+                    offset += len(data)
+        finally:
+            if src:
+                src.close()
+        os.replace(tmp_path, output_csv)
+
+    _save_manifest(manifest_path, output_csv, plan)
+    print(f"[✓] Input CSV updated ({len(changed)} changed, {len(removed)} removed): {output_csv}")
+
 def parse_output_json_file(json_file):
     rows = []
     with open(json_file, 'r') as f:
@@ -102,12 +257,14 @@ if __name__ == "__main__":
     parser.add_argument("--mode", choices=["input", "output"], required=True, help="Choose mode: input or output")
     parser.add_argument("--json_dir", default="extracted_json", help="Path to JSON file or directory")
     parser.add_argument("--output_csv", default=None, help="Output CSV file path")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Input mode only: re-parse only JSON files that changed since the last run")
 
     args = parser.parse_args()
 
     if args.mode == "input":
         out_path = args.output_csv or "parsed_csv/input.csv"
-        generate_input_csv(args.json_dir, out_path)
+        generate_input_csv(args.json_dir, out_path, incremental=args.incremental)
 
     elif args.mode == "output":
         out_path = args.output_csv or "parsed_csv/output.csv"
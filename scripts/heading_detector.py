@@ -6,99 +6,155 @@
 # it extracts text blocks, computes features, and predicts headings
 import os
 import json
-import joblib
 import numpy as np
 import pandas as pd
 from typing import List, Dict
+from scripts.block_store import load_block_columns
+from scripts.feature_pipeline import FeaturePipeline, noise_mask, load_pipeline
+from scripts.candidate_filter import load_candidate_filter
+from scripts import instrumentation
 
-# Keywords to filter out noisy or irrelevant content
-IGNORE_TEXTS = ["author", "date", "page", "footer", "header", "contact", "copyright", "www.", "@", ".com"]
+def load_model(model_path: str, label_encoder_path: str):
+    """
+    Loads the trained model and label encoder once so callers can reuse them across documents.
+    A .npz model_path is an exported predictor (model_backends.export_predictor): it embeds the
+    label classes, needs neither sklearn nor joblib, and label_encoder_path is ignored.
+    The feature pipeline and candidate filter saved next to the model come from load_preprocessing.
+    """
+    if model_path.endswith(".npz"):
+        from scripts.model_backends import load_predictor
+        model, label_encoder = load_predictor(model_path)
+    else:
+        import joblib
+        model = joblib.load(model_path)
+        label_encoder = joblib.load(label_encoder_path)
 
-def is_noise(text: str) -> bool:
-    text_lower = text.lower()
-    return (
-        any(keyword in text_lower for keyword in IGNORE_TEXTS)
-        or text.strip().isdigit()
-        or len(text.strip()) < 3
-    )
+    check_feature_schema(model_path, model)
+    return model, label_encoder
 
-def get_font_stats(blocks: List[Dict]) -> Dict:
-    font_sizes = [b["font_size"] for b in blocks if not is_noise(b["text"])]
-    return {
-        "max_font": max(font_sizes),
-        "mean_font": np.mean(font_sizes),
-        "std_font": np.std(font_sizes)
-    }
+def check_feature_schema(model_path: str, model):
+    # The pipeline saved next to the model must build the columns the model was fitted on
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None and list(names) != load_pipeline(model_path).columns:
+        print(f"[!] {model_path} does not match its saved feature pipeline; retrain to refresh it")
 
-def extract_features(blocks: List[Dict], font_stats: Dict, title_text: str = None):
-    rows = []
-    for block in blocks:
-        text = block.get("text", "")
-        if is_noise(text):
-            continue
-        if title_text and text.strip() == title_text.strip():
-            continue
+# Block fields used for features, in block_columns order
+BLOCK_FIELDS = ["text", "font_size", "font_name", "is_bold", "is_italic", "alignment", "line_spacing_before",
+                "line_spacing_after", "y0", "page_number"]
 
-        row = {
-            "font_size": block.get("font_size"),
-            "relative_to_max": block.get("font_size") / font_stats["max_font"],
-            "relative_to_mean": block.get("font_size") / font_stats["mean_font"],
-            "above_std": (block.get("font_size") - font_stats["mean_font"]) / font_stats["std_font"],
-            "text_len": len(text),
-            "is_bold": int("Bold" in block.get("font_name", "")),
-            "is_italic": int("Italic" in block.get("font_name", "") or "Oblique" in block.get("font_name", "")),
-            "alignment": block.get("alignment", "left"),
-            "line_spacing_before": block.get("line_spacing_before", 0.0),
-            "line_spacing_after": block.get("line_spacing_after", 0.0),
-            "y0": block.get("y0", 0.0),
-            "page_number": block.get("page_number", 1),
-            "text": text
-        }
-        rows.append((block, row))
-    return rows
-
-def detect_headings(input_json_path: str, model_path: str, label_encoder_path: str, output_json_path: str):
-    # Load JSON data
-    with open(input_json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+# Default schema, used for models saved before <model>.features.json existed (see load_pipeline)
+FEATURE_PIPELINE = FeaturePipeline()
 
-    blocks = data.get("text_blocks", [])
-    pdf_name = data.get("pdf_name", "unknown.pdf")
+class Preprocessing:
+    """
+    Per-model settings applied before prediction: the feature pipeline and the candidate
+    pre-filter (candidate_filter.py; None sends every block to the model).
+    """
+    __slots__ = ("pipeline", "candidate_filter")
 
-    if not blocks:
-        print(f"[!] No text blocks found in {input_json_path}")
-        return
+    def __init__(self, pipeline: FeaturePipeline = FEATURE_PIPELINE, candidate_filter=None):
+        self.pipeline = pipeline
+        self.candidate_filter = candidate_filter
 
-    # Step 1: Font stats for heuristic features
-    font_stats = get_font_stats(blocks)
+DEFAULT_PREPROCESSING = Preprocessing()
 
-    # Step 2: Title detection from page 1
-    page1_blocks = [b for b in blocks if b.get("page_number") == 1 and not is_noise(b.get("text", ""))]
-    title_block = max(page1_blocks, key=lambda b: b.get("font_size", 0), default=None)
-    title_text = title_block.get("text") if title_block else None
+def load_preprocessing(model_path: str) -> Preprocessing:
+    """
+    The settings saved next to model_path: the feature pipeline fitted with the model
+    (<model>.features.json) and the candidate filter. Callers load them once alongside load_model.
+    """
+    return Preprocessing(load_pipeline(model_path), load_candidate_filter(model_path))
 
-    # Step 3: Extract and prepare features
-    features_data = extract_features(blocks, font_stats, title_text)
-    if not features_data:
-        print(f"[!] No valid text blocks found in {input_json_path}")
-        return
+def block_columns(blocks: List[Dict]) -> pd.DataFrame:
+    """
+    Columnar view of the block fields used for features.
+    """
+    return pd.DataFrame({
+        "text": [b.get("text", "") for b in blocks],
+        "font_size": [b.get("font_size") for b in blocks],
+        "font_name": [b.get("font_name", "") for b in blocks],
+        # None (older block files without the flag) falls back to the font name in FeaturePipeline
+        "is_bold": [b.get("is_bold") for b in blocks],
+        "is_italic": [b.get("is_italic") for b in blocks],
+        "alignment": [b.get("alignment", "left") for b in blocks],
+        "line_spacing_before": [b.get("line_spacing_before", 0.0) for b in blocks],
+        "line_spacing_after": [b.get("line_spacing_after", 0.0) for b in blocks],
+        "y0": [b.get("y0", 0.0) for b in blocks],
+        "page_number": [b.get("page_number", 1) for b in blocks],
+    })
+
+def prepare_columns(columns: pd.DataFrame, preprocessing: Preprocessing = DEFAULT_PREPROCESSING):
+    """
+    Detects the title and builds the model feature matrix from a block_columns frame.
+    Blocks rejected by preprocessing.candidate_filter are dropped before feature building.
+    Returns (title_text, kept row positions, X); X is None if no block survives filtering.
+    """
+    with instrumentation.span("features", blocks=len(columns)) as s:
+        title_text, kept_positions, X = _prepare_columns(columns, preprocessing.pipeline, preprocessing.candidate_filter)
+        s.add(candidates=len(kept_positions))
+        return title_text, kept_positions, X
 
-    blocks_filtered, feature_rows = zip(*features_data)
-    df = pd.DataFrame(feature_rows)
+def preprocess_columns(columns: pd.DataFrame):
+    """
+    One scan over the block text: stripped text, noise mask and the page-1 title
+    (largest non-noise font on page 1, first one wins on ties).
+    Returns (normalized text, noise array, title row position or None).
+    """
+    normalized = columns["text"].str.strip()
+    noise = noise_mask(columns["text"], normalized).to_numpy()
+    page1 = np.flatnonzero((columns["page_number"].to_numpy() == 1) & ~noise)
+    if not len(page1):
+        return normalized, noise, None
+    return normalized, noise, page1[columns["font_size"].to_numpy(dtype=float)[page1].argmax()]
 
-    # Step 4: One-hot encode alignment and prepare input
-    df["alignment"] = df["alignment"].fillna("left")
-    df = pd.get_dummies(df, columns=["alignment"], drop_first=True)
-    X = df.drop(columns=["text", "page_number"])
+def _prepare_columns(columns, pipeline, candidate_filter=None):
+    # Step 1: Normalized text, noise mask and title in one pass;
+    # font stats cover every non-noise block, title included
+    normalized, noise, title_position = preprocess_columns(columns)
+    stats = pipeline.document_stats(columns, noise)
+    title_text = None if title_position is None else columns["text"].iat[title_position]
 
-    # Step 5: Load trained model and label encoder
-    model = joblib.load(model_path)
-    label_encoder = joblib.load(label_encoder_path)
+    # Step 2: Drop noise, the title and (with a candidate filter) obvious body text,
+    # then build features through the shared pipeline
+    keep = ~noise
+    if title_text:
+        keep &= (normalized != normalized.iat[title_position]).to_numpy()
+    if candidate_filter is not None:
+        keep[keep] = candidate_filter.keep_mask(columns[keep], stats, normalized[keep])
+    kept_positions = np.flatnonzero(keep)
+    if not len(kept_positions):
+        return title_text, kept_positions, None
 
-    y_pred = model.predict(X)
-    y_labels = label_encoder.inverse_transform(y_pred)
+    X = pipeline.transform(columns.iloc[kept_positions].reset_index(drop=True), stats)
+    return title_text, kept_positions, X
 
-    # Step 6: Build structured output
+def prepare_document(blocks: List[Dict], preprocessing: Preprocessing = DEFAULT_PREPROCESSING):
+    """
+    Detects the title and builds the model feature matrix for one document's blocks.
+    Returns (title_text, blocks_filtered, X); blocks_filtered is empty if no block survives filtering.
+    """
+    title_text, kept_positions, X = prepare_columns(block_columns(blocks), preprocessing)
+    if X is None:
+        return title_text, (), None
+    return title_text, [blocks[i] for i in kept_positions], X
+
+def feature_columns(model, frames) -> List[str]:
+    """
+    Column order expected by the model; falls back to the union of the frames' columns.
+    """
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None:
+        return list(names)
+    columns = []
+    for X in frames:
+        columns.extend(col for col in X.columns if col not in columns)
+    return columns
+
+def align_features(X, columns: List[str]):
+    # Alignment dummies missing from a document are all-False columns
+    return X.reindex(columns=columns, fill_value=False)
+
+def build_outline(title_text, blocks_filtered, y_labels) -> Dict:
     outline = []
     for i, label in enumerate(y_labels):
         if label == "None":
@@ -109,13 +165,144 @@ def detect_headings(input_json_path: str, model_path: str, label_encoder_path: s
             "page": blocks_filtered[i]["page_number"]
         })
 
-    output_data = {
+    return {
         "title": title_text or "Untitled",
         "outline": outline
     }
 
+def predict_outline(title_text, blocks_filtered, X, model, label_encoder) -> Dict:
+    with instrumentation.span("predict", blocks=len(X)):
+        X = align_features(X, feature_columns(model, [X]))
+        y_pred = model.predict(X)
+        y_labels = label_encoder.inverse_transform(y_pred)
+
+    # Build structured output
+    return build_outline(title_text, blocks_filtered, y_labels)
+
+def detect_headings_from_blocks(data: Dict, model, label_encoder, preprocessing: Preprocessing = DEFAULT_PREPROCESSING):
+    """
+    Runs heading detection on already-extracted blocks and returns the {"title", "outline"} dict,
+    or None if the document has no usable text blocks.
+    """
+    blocks = data.get("text_blocks", [])
+    pdf_name = data.get("pdf_name", "unknown.pdf")
+
+    if not blocks:
+        print(f"[!] No text blocks found in {pdf_name}")
+        return None
+
+    title_text, blocks_filtered, X = prepare_document(blocks, preprocessing)
+    if not blocks_filtered:
+        print(f"[!] No valid text blocks found in {pdf_name}")
+        return None
+
+    return predict_outline(title_text, blocks_filtered, X, model, label_encoder)
+
+def detect_headings_from_columns(columns: pd.DataFrame, model, label_encoder, pdf_name: str = "unknown.pdf",
+                                 preprocessing: Preprocessing = DEFAULT_PREPROCESSING):
+    """
+    Runs heading detection on a block_columns frame; output rows are built from the frame,
+    so no per-block dicts are needed.
+    """
+    title_text, kept_positions, X = prepare_columns(columns, preprocessing)
+    if X is None:
+        print(f"[!] No valid text blocks found in {pdf_name}")
+        return None
+
+    blocks_filtered = columns.iloc[kept_positions][["text", "page_number"]].to_dict("records")
+    return predict_outline(title_text, blocks_filtered, X, model, label_encoder)
+
+def predict_labels_batch(Xs: List[pd.DataFrame], model, label_encoder) -> List[np.ndarray]:
+    """
+    Predicts several documents' feature matrices in one model call (columns aligned to the model)
+    and returns one label array per matrix.
+    """
+    columns = feature_columns(model, Xs)
+    X = pd.concat([align_features(X, columns) for X in Xs], ignore_index=True)
+    with instrumentation.span("predict", blocks=len(X)):
+        labels = label_encoder.inverse_transform(model.predict(X))
+    return np.split(labels, np.cumsum([len(X) for X in Xs])[:-1])
+
+def detect_headings_batch(docs, model, label_encoder, preprocessing: Preprocessing = DEFAULT_PREPROCESSING) -> List[Dict]:
+    """
+    Heading detection for many documents at once: title, font stats and features are computed
+    per document, all feature rows are predicted in a single model call and the outlines are
+    split back. docs are extracted-block dicts ({"pdf_name", "text_blocks"}) or block_columns
+    frames; returns one {"title", "outline"} dict per document, None where no block is usable.
+    """
+    prepared = []
+    for i, doc in enumerate(docs):
+        if isinstance(doc, pd.DataFrame):
+            columns, pdf_name = doc, f"document {i}"
+        else:
+            columns, pdf_name = block_columns(doc.get("text_blocks", [])), doc.get("pdf_name", f"document {i}")
+        if columns.empty:
+            print(f"[!] No text blocks found in {pdf_name}")
+            prepared.append(None)
+            continue
+
+        title_text, kept_positions, X = prepare_columns(columns, preprocessing)
+        if X is None:
+            print(f"[!] No valid text blocks found in {pdf_name}")
+            prepared.append(None)
+            continue
+        prepared.append((title_text, columns.iloc[kept_positions][["text", "page_number"]].to_dict("records"), X))
+
+    usable = [item for item in prepared if item is not None]
+    labels = iter(predict_labels_batch([X for _, _, X in usable], model, label_encoder) if usable else [])
+    return [None if item is None else build_outline(item[0], item[1], next(labels)) for item in prepared]
+
+def detect_headings_from_pages(pages, model, label_encoder, pdf_name: str = "unknown.pdf",
+                               preprocessing: Preprocessing = DEFAULT_PREPROCESSING):
+    """
+    Streaming variant of detect_headings_from_blocks for an iterable of per-page block lists
+    (e.g. pdf_parser.iter_text_blocks). Each page is reduced to its compact feature columns
+    as soon as it arrives, so only one page of block dicts is alive at a time.
+    """
+    frames = [block_columns(page_blocks) for page_blocks in pages if page_blocks]
+    if not frames:
+        print(f"[!] No text blocks found in {pdf_name}")
+        return None
+
+    columns = pd.concat(frames, ignore_index=True)
+    for col in ("line_spacing_before", "line_spacing_after"):
+        # Pages where every value is None come back as object columns
+        if columns[col].dtype == object:
+            columns[col] = columns[col].astype(float)
+
+    return detect_headings_from_columns(columns, model, label_encoder, pdf_name, preprocessing)
+
+def save_output(output_data: Dict, output_json_path: str):
     os.makedirs(os.path.dirname(output_json_path), exist_ok=True)
     with open(output_json_path, "w", encoding="utf-8") as f:
         json.dump(output_data, f, indent=2)
 
     print(f"[✓] Output saved to {output_json_path}")
+
+def detect_headings(input_json_path: str, model_path: str, label_encoder_path: str, output_json_path: str,
+                    model=None, label_encoder=None, preprocessing: Preprocessing = None):
+    # Load trained model, label encoder and their preprocessing settings (unless already loaded by the caller)
+    if model is None or label_encoder is None:
+        model, label_encoder = load_model(model_path, label_encoder_path)
+    if preprocessing is None:
+        preprocessing = load_preprocessing(model_path)
+
+    if input_json_path.endswith(".npz"):
+        # Columnar block file: go straight to feature columns
+        store = load_block_columns(input_json_path)
+        if not store["text"]:
+            print(f"[!] No text blocks found in {input_json_path}")
+            return
+        columns = pd.DataFrame({field: store[field] for field in BLOCK_FIELDS})
+        output_data = detect_headings_from_columns(columns, model, label_encoder, store["pdf_name"], preprocessing)
+    else:
+        # Load JSON data
+        with open(input_json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        output_data = detect_headings_from_blocks(data, model, label_encoder, preprocessing)
+
+    if output_data is None:
+        return
+
+    save_output(output_data, output_json_path)
+    return output_data
@@ -0,0 +1,199 @@
+# scripts/inference_server.py
+
+# Long-running local HTTP service for heading detection
+# The model and label encoder are loaded once and kept warm,
+# concurrent requests are batched into a single model.predict call
+#
+# POST /detect  with JSON {"pdf_path": "..."} or raw PDF bytes (Content-Type: application/pdf)
+# GET  /metrics returns request counts and p50/p99 latency in milliseconds
+
+import os
+import json
+import time
+import queue
+import argparse
+import tempfile
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+from scripts.auto_detector import extract_blocks
+from scripts.heading_detector import load_model, load_preprocessing, prepare_document, predict_labels_batch, build_outline
+
+MODEL_PATH = "models/heading_model.pkl"
+LABEL_ENCODER_PATH = "models/label_encoder.pkl"
+
+class PredictionBatcher:
+    """
+    Collects feature matrices from concurrent requests and predicts them in one model call.
+    """
+
+    def __init__(self, model, label_encoder, max_batch_size=32, max_wait=0.005):
+        self.model = model
+        self.label_encoder = label_encoder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.pending = queue.Queue()
+        self.batches = 0
+        self.batched_docs = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def predict(self, X):
+        job = {"X": X, "done": threading.Event(), "labels": None, "error": None}
+        self.pending.put(job)
+        job["done"].wait()
+        if job["error"] is not None:
+            raise job["error"]
+        return job["labels"]
+
+    def _collect(self):
+        batch = [self.pending.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                labels = predict_labels_batch([job["X"] for job in batch], self.model, self.label_encoder)
+                for job, job_labels in zip(batch, labels):
+                    job["labels"] = job_labels
+            except Exception as e:
+                for job in batch:
+                    job["error"] = e
+            self.batches += 1
+            self.batched_docs += len(batch)
+            for job in batch:
+                job["done"].set()
+
+class LatencyStats:
+    def __init__(self, window=10000):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds, ok=True):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+
+    def snapshot(self):
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            requests, errors = self.requests, self.errors
+        return {
+            "requests": requests,
+            "errors": errors,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2) if len(latencies) else None,
+            "p99_ms": round(float(np.percentile(latencies, 99)), 2) if len(latencies) else None,
+        }
+
+def detect_pdf(pdf_path, batcher, preprocessing):
+    data = extract_blocks(pdf_path)
+    blocks = data.get("text_blocks", [])
+    if not blocks:
+        return {"title": "Untitled", "outline": []}
+
+    title_text, blocks_filtered, X = prepare_document(blocks, preprocessing)
+    if not blocks_filtered:
+        return build_outline(title_text, (), [])
+    return build_outline(title_text, blocks_filtered, batcher.predict(X))
+
+def make_handler(batcher, stats, preprocessing):
+    class HeadingRequestHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/metrics":
+                self._send_json(404, {"error": "not found"})
+                return
+            payload = stats.snapshot()
+            payload["batches"] = batcher.batches
+            payload["mean_batch_size"] = round(batcher.batched_docs / batcher.batches, 2) if batcher.batches else None
+            self._send_json(200, payload)
+
+        def do_POST(self):
+            if self.path != "/detect":
+                self._send_json(404, {"error": "not found"})
+                return
+
+            start = time.perf_counter()
+            tmp_path = None
+            try:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Type", "").startswith("application/pdf"):
+                    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+                        tmp.write(body)
+                        tmp_path = tmp.name
+                    pdf_path = tmp_path
+                else:
+                    pdf_path = json.loads(body or b"{}").get("pdf_path")
+                    if not pdf_path or not os.path.exists(pdf_path):
+                        raise FileNotFoundError(f"File not found: {pdf_path}")
+
+                result = detect_pdf(pdf_path, batcher, preprocessing)
+            except FileNotFoundError as e:
+                stats.record(time.perf_counter() - start, ok=False)
+                self._send_json(404, {"error": str(e)})
+                return
+            except Exception as e:
+                stats.record(time.perf_counter() - start, ok=False)
+                self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+                return
+            finally:
+                if tmp_path:
+                    os.remove(tmp_path)
+
+            stats.record(time.perf_counter() - start)
+            self._send_json(200, result)
+
+        def log_message(self, format, *args):
+            pass
+
+    return HeadingRequestHandler
+
+def serve(host="127.0.0.1", port=8765, model_path=MODEL_PATH, label_encoder_path=LABEL_ENCODER_PATH,
+          max_batch_size=32, max_wait_ms=5.0):
+    print("[INFO] Loading model and label encoder...")
+    model, label_encoder = load_model(model_path, label_encoder_path)
+    preprocessing = load_preprocessing(model_path)
+    batcher = PredictionBatcher(model, label_encoder, max_batch_size, max_wait_ms / 1000)
+    stats = LatencyStats()
+
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, stats, preprocessing))
+    print(f"[✓] Heading detection server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve heading detection over HTTP with a warm model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model_path", default=MODEL_PATH)
+    parser.add_argument("--label_encoder_path", default=LABEL_ENCODER_PATH)
+    parser.add_argument("--max_batch_size", type=int, default=32, help="Max documents per model.predict call")
+    parser.add_argument("--max_wait_ms", type=float, default=5.0, help="How long to wait for a batch to fill")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.model_path, args.label_encoder_path, args.max_batch_size, args.max_wait_ms)
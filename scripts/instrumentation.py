@@ -0,0 +1,269 @@
+# scripts/instrumentation.py
+
+# Structured per-stage instrumentation for the pipeline
+# span("stage") / iter_span("stage", pages) measure wall time, CPU time (including
+# tesseract / poppler child processes) and page and block counts, tagged with the document
+# being processed; records go to a JSON-lines file or are aggregated into a Prometheus text
+# file (textfile-collector format)
+# Memory is reported as rss_high_water_mb: the process RSS high-water mark when the span ends.
+# It is cumulative (ru_maxrss never goes down), so it shows the largest usage so far, not the
+# span's own; a span only stands out when it raises the mark
+# profile_document() optionally wraps a document in cProfile or pyinstrument
+# Everything is a no-op until configure() is called, so library callers pay nothing
+
+import os
+import sys
+import json
+import time
+import atexit
+import resource
+import contextvars
+from contextlib import contextmanager
+
+SINKS = ["jsonl", "prometheus"]
+PROFILERS = ["cprofile", "pyinstrument"]
+
+_config = {"sink": None, "path": None, "profile": None, "profile_dir": "profiles"}
+_buffer = []
+_totals = {}
+_document = contextvars.ContextVar("document", default=None)
+_parent = contextvars.ContextVar("parent_stage", default=None)
+
+def configure(sink=None, path=None, profile=None, profile_dir="profiles"):
+    """
+    Enables instrumentation. sink is "jsonl" (one JSON object per span appended to path),
+    "prometheus" (per-stage totals rewritten to path on flush) or "buffer" (kept in memory
+    for drain(), used by worker processes); profile is None, "cprofile" or "pyinstrument".
+    """
+    _config.update(sink=sink, path=path, profile=profile, profile_dir=profile_dir)
+    if path and sink in SINKS:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if sink == "prometheus":
+        atexit.register(flush)
+
+def settings() -> dict:
+    return dict(_config)
+
+def enabled() -> bool:
+    return _config["sink"] is not None
+
+def _rss_high_water_mb():
+    # Process-lifetime maximum; ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) * scale / 2**20, 1)
+
+def _cpu_seconds():
+    # Own threads plus reaped child processes (tesseract, pdftoppm)
+    t = os.times()
+    return time.process_time() + t.children_user + t.children_system
+
+def emit(record: dict):
+    sink = _config["sink"]
+    if sink == "jsonl":
+        # One write per line keeps appends from concurrent processes whole
+        with open(_config["path"], "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    elif sink == "prometheus":
+        totals = _totals.setdefault(record["stage"], {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "pages": 0,
+                                                      "blocks": 0, "rss_high_water_mb": 0.0})
+        totals["calls"] += 1
+        for key in ("wall_s", "cpu_s", "pages", "blocks"):
+            totals[key] += record.get(key) or 0
+        totals["rss_high_water_mb"] = max(totals["rss_high_water_mb"], record.get("rss_high_water_mb") or 0.0)
+    elif sink == "buffer":
+        _buffer.append(record)
+
+def record(stage: str, wall_s: float, cpu_s: float = None, pages: int = 0, blocks: int = 0, **attrs):
+    """
+    Emits a span measured by the caller (e.g. OCR work timed inside a thread pool).
+    """
+    if not enabled():
+        return
+    emit({
+        "stage": stage,
+        "document": _document.get(),
+        "parent": _parent.get(),
+        "wall_s": round(wall_s, 6),
+        "cpu_s": None if cpu_s is None else round(cpu_s, 6),
+        "pages": pages,
+        "blocks": blocks,
+        "rss_high_water_mb": _rss_high_water_mb(),
+        "pid": os.getpid(),
+        **attrs,
+    })
+
+class Span:
+    """
+    Counters of an open span; callers add the pages / blocks they processed.
+    """
+    __slots__ = ("pages", "blocks", "attrs")
+
+    def __init__(self):
+        self.pages = 0
+        self.blocks = 0
+        self.attrs = {}
+
+    def add(self, pages=0, blocks=0, **attrs):
+        self.pages += pages
+        self.blocks += blocks
+        self.attrs.update(attrs)
+
+class _NullSpan:
+    __slots__ = ()
+
+    def add(self, pages=0, blocks=0, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+@contextmanager
+def span(stage: str, pages: int = 0, blocks: int = 0):
+    """
+    with span("stage") as s: ... s.add(blocks=n) — records wall/CPU time, counts and the RSS high-water mark.
+    """
+    if not enabled():
+        yield _NULL_SPAN
+        return
+
+    current = Span()
+    current.add(pages, blocks)
+    token = _parent.set(stage)
+    wall_start, cpu_start = time.perf_counter(), _cpu_seconds()
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        wall, cpu = time.perf_counter() - wall_start, _cpu_seconds() - cpu_start
+        _parent.reset(token)
+        attrs = dict(current.attrs, error=error) if error else current.attrs
+        record(stage, wall, cpu, current.pages, current.blocks, **attrs)
+
+def iter_span(stage: str, pages):
+    """
+    Wraps an iterator of per-page block lists: only the time spent producing pages is
+    measured (not the consumer's), and pages / blocks are counted as they stream by.
+    """
+    if not enabled():
+        return pages
+    return _iter_span(stage, pages)
+
+def _iter_span(stage, pages):
+    document = _document.get()
+    wall = cpu = 0.0
+    n_pages = n_blocks = 0
+    iterator = iter(pages)
+    try:
+        while True:
+            wall_start, cpu_start = time.perf_counter(), _cpu_seconds()
+            try:
+                page_blocks = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                wall += time.perf_counter() - wall_start
+                cpu += _cpu_seconds() - cpu_start
+            n_pages += 1
+            n_blocks += len(page_blocks)
+            yield page_blocks
+    finally:
+        token = _document.set(document)
+        record(stage, wall, cpu, n_pages, n_blocks)
+        _document.reset(token)
+
+@contextmanager
+def document(name: str):
+    """
+    Tags every span recorded inside with the document name.
+    """
+    token = _document.set(name)
+    try:
+        yield
+    finally:
+        _document.reset(token)
+
+@contextmanager
+def profile_document(name: str):
+    """
+    With profile="cprofile" writes <profile_dir>/<name>.prof (pstats / snakeviz);
+    with "pyinstrument" writes <profile_dir>/<name>.html. No-op otherwise.
+    """
+    profiler_name = _config["profile"]
+    if profiler_name is None:
+        yield
+        return
+
+    os.makedirs(_config["profile_dir"], exist_ok=True)
+    base = os.path.join(_config["profile_dir"], name)
+    if profiler_name == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("[!] pyinstrument is not installed → profiling disabled")
+            _config["profile"] = None
+            yield
+            return
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(base + ".html", "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        return
+
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(base + ".prof")
+
+def drain() -> list:
+    """
+    Returns and clears the spans buffered by a worker process (sink="buffer").
+    """
+    records = list(_buffer)
+    _buffer.clear()
+    return records
+
+def ingest(records):
+    # Spans shipped back from worker processes
+    for r in records:
+        emit(r)
+
+def render_prometheus() -> str:
+    metrics = [
+        ("pdf_stage_calls_total", "counter", "Spans recorded per stage", "calls", 1),
+        ("pdf_stage_wall_seconds_total", "counter", "Wall time per stage", "wall_s", 1),
+        ("pdf_stage_cpu_seconds_total", "counter", "CPU time per stage (including child processes)", "cpu_s", 1),
+        ("pdf_stage_pages_total", "counter", "Pages processed per stage", "pages", 1),
+        ("pdf_stage_blocks_total", "counter", "Text blocks processed per stage", "blocks", 1),
+        ("pdf_stage_rss_high_water_bytes", "gauge",
+         "Process RSS high-water mark (cumulative since process start) when a stage ended", "rss_high_water_mb", 2**20),
+    ]
+    lines = []
+    for name, kind, help_text, key, scale in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for stage, totals in sorted(_totals.items()):
+            lines.append(f'{name}{{stage="{stage}"}} {totals[key] * scale:g}')
+    return "\n".join(lines) + "\n"
+
+def flush():
+    """
+    Rewrites the Prometheus text file atomically (no-op for the other sinks).
+    """
+    if _config["sink"] != "prometheus" or not _config["path"]:
+        return
+    tmp_path = _config["path"] + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, _config["path"])
@@ -0,0 +1,293 @@
+# scripts/job_runner.py
+
+# Asyncio job runner for unattended ingestion
+# Jobs live in a SQLite queue (fed by `enqueue` or by watching a directory); each job runs
+# detect_pdf_type_and_extract + detect_headings in its own subprocess and process group,
+# so a document that exceeds its timeout is killed together with any pdftoppm / tesseract
+# children. Structured and OCR jobs have separate concurrency limits, so slow scans
+# cannot starve born-digital PDFs; failed jobs are retried with exponential backoff
+# Run from the repo root:
+#   python -m scripts.job_runner run --watch input_pdfs --structured-slots 4 --ocr-slots 2
+#   python -m scripts.job_runner enqueue input_pdfs/a.pdf input_pdfs/b.pdf
+#   python -m scripts.job_runner status
+
+import os
+import sys
+import time
+import signal
+import sqlite3
+import asyncio
+import argparse
+
+QUEUE_PATH = "job_queue.sqlite3"
+OUTPUT_JSON_DIR = "parsed_csv/output_json"
+MODEL_PATH = "models/heading_model.pkl"
+LABEL_ENCODER_PATH = "models/label_encoder.pkl"
+
+# Keep the last part of a failed child's output as the job error
+ERROR_TAIL_CHARS = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pdf_path TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL DEFAULT 'queued',
+    kind TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    elapsed_s REAL,
+    output_path TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready_by_kind ON jobs (status, kind, available_at);
+"""
+
+class JobQueue:
+    """
+    SQLite-backed job queue: queued → running → done | failed (queued again while retries remain).
+    """
+    def __init__(self, path=QUEUE_PATH):
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def enqueue(self, pdf_path) -> bool:
+        # Re-enqueueing a known path is a no-op; returns whether a job was added
+        cursor = self.db.execute("INSERT OR IGNORE INTO jobs (pdf_path, enqueued_at) VALUES (?, ?)",
+                                 (os.path.abspath(pdf_path), time.time()))
+        return cursor.rowcount > 0
+
+    def recover(self):
+        # Jobs left running by a crashed runner go back to the queue
+        self.db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+
+    def ready(self, kind, limit):
+        # kind=None selects jobs not classified yet
+        condition = "kind IS NULL" if kind is None else "kind = ?"
+        params = () if kind is None else (kind,)
+        return self.db.execute(
+            f"SELECT * FROM jobs WHERE status = 'queued' AND {condition} AND available_at <= ? "
+            "ORDER BY available_at, id LIMIT ?", params + (time.time(), limit)).fetchall()
+
+    def set_kind(self, job_id, kind):
+        self.db.execute("UPDATE jobs SET kind = ? WHERE id = ?", (kind, job_id))
+
+    def start(self, job_id):
+        self.db.execute("UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                        (time.time(), job_id))
+
+    def finish(self, job_id, elapsed, output_path):
+        self.db.execute("UPDATE jobs SET status = 'done', finished_at = ?, elapsed_s = ?, output_path = ?, error = NULL "
+                        "WHERE id = ?", (time.time(), elapsed, output_path, job_id))
+
+    def fail(self, job_id, elapsed, error, retry_at=None):
+        status = "queued" if retry_at is not None else "failed"
+        self.db.execute("UPDATE jobs SET status = ?, available_at = ?, finished_at = ?, elapsed_s = ?, error = ? "
+                        "WHERE id = ?", (status, retry_at or 0, time.time(), elapsed, error, job_id))
+
+    def pending(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def counts(self) -> dict:
+        return dict(self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+def classify_job(pdf_path) -> str:
+    """
+    "ocr" if any page needs OCR (scanned or mixed), "structured" otherwise; cheap metadata check.
+    """
+    from scripts.auto_detector import classify_pages
+    return "ocr" if any(classify_pages(pdf_path)) else "structured"
+
+def run_one(pdf_path, output_dir=OUTPUT_JSON_DIR, ocr_dpi=300, ocr_workers=1, page_timeout=0):
+    """
+    Job body (runs in the child process): extract blocks, then detect headings.
+    """
+    from scripts.auto_detector import detect_pdf_type_and_extract
+    from scripts.heading_detector import detect_headings
+
+    pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    output_path = os.path.join(output_dir, f"{pdf_name}.json")
+    input_path = detect_pdf_type_and_extract(pdf_path, "npz", ocr_dpi=ocr_dpi, ocr_workers=ocr_workers,
+                                             ocr_page_timeout=page_timeout, use_cache=True)
+    detect_headings(input_path, MODEL_PATH, LABEL_ENCODER_PATH, output_path)
+    return output_path
+
+class JobRunner:
+    """
+    Dispatches queued jobs to subprocesses within per-kind slot limits.
+    """
+    def __init__(self, queue, structured_slots=None, ocr_slots=None, doc_timeout=600, page_timeout=60,
+                 max_attempts=3, retry_backoff=30, ocr_dpi=300, ocr_workers=1, poll_interval=1.0):
+        cpus = os.cpu_count() or 1
+        self.queue = queue
+        self.slots = {"structured": structured_slots or cpus, "ocr": ocr_slots or max(1, cpus // 4)}
+        self.running = {"structured": 0, "ocr": 0}
+        self.doc_timeout = doc_timeout
+        self.page_timeout = page_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.ocr_dpi = ocr_dpi
+        self.ocr_workers = ocr_workers
+        self.poll_interval = poll_interval
+        self.tasks = set()
+        self.wakeup = asyncio.Event()
+
+    def _command(self, job):
+        return [
+            sys.executable, "-m", "scripts.job_runner", "run-one", job["pdf_path"],
+            "--ocr-dpi", str(self.ocr_dpi), "--ocr-workers", str(self.ocr_workers),
+            "--page-timeout", str(self.page_timeout),
+        ]
+
+    async def _execute(self, job, kind):
+        job_id, pdf_name = job["id"], os.path.basename(job["pdf_path"])
+        start = time.perf_counter()
+        # Own session = own process group, so the whole tree can be killed on timeout
+        proc = await asyncio.create_subprocess_exec(*self._command(job), stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.STDOUT, start_new_session=True)
+        try:
+            output, _ = await asyncio.wait_for(proc.communicate(), timeout=self.doc_timeout or None)
+            error = None if proc.returncode == 0 else output.decode("utf-8", "replace")[-ERROR_TAIL_CHARS:]
+        except asyncio.TimeoutError:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+            error = f"Timed out after {self.doc_timeout}s"
+        elapsed = time.perf_counter() - start
+
+        if error is None:
+            output_path = os.path.join(OUTPUT_JSON_DIR, f"{os.path.splitext(pdf_name)[0]}.json")
+            self.queue.finish(job_id, elapsed, output_path)
+            print(f"[✓] {pdf_name} ({kind}) done in {elapsed:.2f}s")
+        elif job["attempts"] + 1 < self.max_attempts:
+            retry_at = time.time() + self.retry_backoff * 2 ** job["attempts"]
+            self.queue.fail(job_id, elapsed, error, retry_at)
+            print(f"[!] {pdf_name} ({kind}) failed after {elapsed:.2f}s, retry {job['attempts'] + 2}/{self.max_attempts} "
+                  f"in {retry_at - time.time():.0f}s: {error.strip().splitlines()[-1] if error.strip() else error}")
+        else:
+            self.queue.fail(job_id, elapsed, error)
+            print(f"[ERROR] {pdf_name} ({kind}) failed permanently after {self.max_attempts} attempts")
+
+    async def _run_job(self, job, kind):
+        try:
+            await self._execute(job, kind)
+        finally:
+            self.running[kind] -= 1
+            self.wakeup.set()
+
+    async def _classify(self, limit=100):
+        # Unclassified jobs get their kind first, so each kind can then be selected on its own
+        for job in self.queue.ready(None, limit):
+            try:
+                kind = await asyncio.to_thread(classify_job, job["pdf_path"])
+            except Exception as e:
+                self.queue.start(job["id"])
+                self.queue.fail(job["id"], 0.0, f"Classification failed: {type(e).__name__}: {e}")
+                print(f"[ERROR] {os.path.basename(job['pdf_path'])}: cannot open PDF ({e})")
+                continue
+            self.queue.set_kind(job["id"], kind)
+
+    async def _dispatch(self):
+        # Each kind fills only its own free slots from its own ready jobs, so a full OCR pool
+        # (or a long OCR backlog at the head of the queue) never blocks structured jobs
+        await self._classify()
+        for kind, slots in self.slots.items():
+            free = slots - self.running[kind]
+            if free <= 0:
+                continue
+            for job in self.queue.ready(kind, free):
+                self.running[kind] += 1
+                self.queue.start(job["id"])
+                task = asyncio.create_task(self._run_job(job, kind))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+    async def _watch(self, watch_dir):
+        # Polling keeps this dependency-free; new PDFs are picked up within poll_interval
+        while True:
+            for name in sorted(os.listdir(watch_dir)):
+                if name.lower().endswith(".pdf") and self.queue.enqueue(os.path.join(watch_dir, name)):
+                    print(f"[INFO] Queued {name}")
+                    self.wakeup.set()
+            await asyncio.sleep(self.poll_interval)
+
+    async def run(self, watch_dir=None, once=False):
+        """
+        Processes the queue until it is empty (once=True) or forever.
+        """
+        self.queue.recover()
+        print(f"[INFO] Job runner: {self.slots['structured']} structured / {self.slots['ocr']} OCR slots, "
+              f"document timeout {self.doc_timeout}s, page timeout {self.page_timeout}s")
+        watcher = asyncio.create_task(self._watch(watch_dir)) if watch_dir else None
+        if watcher and once:
+            # Let the first directory scan fill the queue before checking for an empty one
+            await asyncio.sleep(0)
+        try:
+            while True:
+                await self._dispatch()
+                if once and not self.tasks and self.queue.pending() == 0:
+                    break
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if watcher:
+                watcher.cancel()
+            if self.tasks:
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+        print(f"[✓] Queue status: {self.queue.counts()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite-backed asyncio job runner for PDF heading detection")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="SQLite queue file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="Add PDFs to the queue")
+    enqueue_parser.add_argument("pdf_paths", nargs="+")
+
+    subparsers.add_parser("status", help="Show job counts and failures")
+
+    run_parser = subparsers.add_parser("run", help="Process queued jobs")
+    run_parser.add_argument("--watch", default=None, help="Directory polled for new PDFs")
+    run_parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    run_parser.add_argument("--structured-slots", type=int, default=None, help="Concurrent structured jobs (default: all cores)")
+    run_parser.add_argument("--ocr-slots", type=int, default=None, help="Concurrent OCR jobs (default: cores / 4)")
+    run_parser.add_argument("--ocr-workers", type=int, default=1, help="tesseract threads per OCR job")
+    run_parser.add_argument("--ocr-dpi", type=int, default=300)
+    run_parser.add_argument("--doc-timeout", type=int, default=600, help="Seconds before a job's process group is killed")
+    run_parser.add_argument("--page-timeout", type=int, default=60, help="Seconds per page for pdftoppm / tesseract (0 = none)")
+    run_parser.add_argument("--max-attempts", type=int, default=3)
+    run_parser.add_argument("--retry-backoff", type=float, default=30, help="Seconds before the first retry (doubles each time)")
+
+    one_parser = subparsers.add_parser("run-one", help="Process a single PDF in this process (used by the runner)")
+    one_parser.add_argument("pdf_path")
+    one_parser.add_argument("--ocr-dpi", type=int, default=300)
+    one_parser.add_argument("--ocr-workers", type=int, default=1)
+    one_parser.add_argument("--page-timeout", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "run-one":
+        run_one(args.pdf_path, ocr_dpi=args.ocr_dpi, ocr_workers=args.ocr_workers, page_timeout=args.page_timeout)
+        sys.exit(0)
+
+    queue = JobQueue(args.queue)
+    if args.command == "enqueue":
+        added = sum(queue.enqueue(path) for path in args.pdf_paths)
+        print(f"[✓] Queued {added} new jobs ({len(args.pdf_paths) - added} already known)")
+    elif args.command == "status":
+        print(f"[INFO] {queue.counts()}")
+        for row in queue.db.execute("SELECT pdf_path, attempts, error FROM jobs WHERE status = 'failed'"):
+            last_line = (row["error"] or "").strip().splitlines()[-1:] or [""]
+            print(f"  [ERROR] {os.path.basename(row['pdf_path'])} ({row['attempts']} attempts): {last_line[0]}")
+    else:
+        runner = JobRunner(queue, args.structured_slots, args.ocr_slots, args.doc_timeout, args.page_timeout,
+                           args.max_attempts, args.retry_backoff, args.ocr_dpi, args.ocr_workers)
+        asyncio.run(runner.run(args.watch, args.once))
@@ -0,0 +1,233 @@
+# scripts/model_backends.py
+
+# Pluggable heading classifiers and a compiled (sklearn-free) predictor
+# make_model builds the classifier for a backend name ("hist_gb" = HistGradientBoostingClassifier,
+# the default; "gb" = the original GradientBoostingClassifier)
+# export_predictor flattens a fitted model's trees into plain NumPy arrays (.npz);
+# TreeArrayPredictor evaluates all trees at once with vectorized traversal and
+# only needs numpy, so heading_detector can load it without importing sklearn
+# The exporter reads private sklearn tree internals, so it only runs on the scikit-learn
+# versions it was tested against (EXPORT_SKLEARN_VERSIONS, pinned in requriements.txt)
+
+import numpy as np
+
+BACKENDS = ["gb", "hist_gb"]
+DEFAULT_BACKEND = "hist_gb"
+# major.minor scikit-learn versions whose tree internals export_predictor has been checked against
+EXPORT_SKLEARN_VERSIONS = ("1.3",)
+
+# Hyperparameter grids for train_model --search
+PARAM_GRIDS = {
+    "gb": {
+        "n_estimators": [100, 200, 400],
+        "learning_rate": [0.05, 0.1, 0.2],
+        "max_depth": [3, 5, 7],
+    },
+    "hist_gb": {
+        "max_iter": [100, 200, 400],
+        "learning_rate": [0.05, 0.1, 0.2],
+        "max_leaf_nodes": [15, 31, 63],
+        "l2_regularization": [0.0, 1.0],
+    },
+}
+
+PREDICTOR_FORMAT_VERSION = 1
+
+def make_model(backend: str = DEFAULT_BACKEND, random_state: int = 42, **params):
+    """
+    Returns an unfitted classifier for the given backend name; params override the default hyperparameters.
+    """
+    if backend == "gb":
+        from sklearn.ensemble import GradientBoostingClassifier
+        params = {"n_estimators": 200, "learning_rate": 0.1, "max_depth": 5, **params}
+        return GradientBoostingClassifier(random_state=random_state, **params)
+    if backend == "hist_gb":
+        from sklearn.ensemble import HistGradientBoostingClassifier
+        params = {"max_iter": 200, "learning_rate": 0.1, "max_depth": 5, **params}
+        return HistGradientBoostingClassifier(random_state=random_state, **params)
+    raise ValueError(f"Unknown model backend {backend!r} (expected one of {BACKENDS})")
+
+def _gb_trees(model):
+    # GradientBoostingClassifier: estimators_[i, k] is a regression tree for output k,
+    # scaled by the learning rate and added to the constant init prediction
+    n_features = model.n_features_in_
+    baseline = np.asarray(model._raw_predict_init(np.zeros((1, n_features), dtype=np.float32)), dtype=np.float64)[0]
+    trees = []
+    for stage in model.estimators_:
+        for k, estimator in enumerate(stage):
+            tree = estimator.tree_
+            missing_left = getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=np.uint8))
+            trees.append({
+                "output": k,
+                "feature": tree.feature,
+                "threshold": tree.threshold,
+                "left": tree.children_left,
+                "right": tree.children_right,
+                "missing_left": missing_left,
+                "is_leaf": tree.children_left == -1,
+                "value": tree.value[:, 0, 0] * model.learning_rate,
+            })
+    # Trees split on float32 inputs
+    return baseline, trees, np.float32
+
+def _hist_gb_trees(model):
+    # HistGradientBoostingClassifier: node values already include the learning rate
+    baseline = np.asarray(model._baseline_prediction, dtype=np.float64).ravel()
+    trees = []
+    for stage in model._predictors:
+        for k, predictor in enumerate(stage):
+            nodes = predictor.nodes
+            if nodes["is_categorical"].any():
+                raise ValueError("Categorical splits are not supported by the compiled predictor")
+            trees.append({
+                "output": k,
+                "feature": nodes["feature_idx"],
+                "threshold": nodes["num_threshold"],
+                "left": nodes["left"],
+                "right": nodes["right"],
+                "missing_left": nodes["missing_go_to_left"],
+                "is_leaf": nodes["is_leaf"].astype(bool),
+                "value": nodes["value"],
+            })
+    return baseline, trees, np.float64
+
+def _tree_depth(left, right, is_leaf):
+    depth, frontier = 0, [0]
+    while True:
+        frontier = [child for node in frontier if not is_leaf[node] for child in (left[node], right[node])]
+        if not frontier:
+            return depth
+        depth += 1
+
+def _check_export_support(model):
+    # _raw_predict_init / _predictors / _baseline_prediction are private and change between releases
+    import sklearn
+    version = ".".join(sklearn.__version__.split(".")[:2])
+    if version not in EXPORT_SKLEARN_VERSIONS:
+        raise ValueError(f"export_predictor is not tested with scikit-learn {sklearn.__version__} "
+                         f"(supported: {', '.join(EXPORT_SKLEARN_VERSIONS)}.x)")
+    required = ("_predictors", "_baseline_prediction") if hasattr(model, "max_iter") else ("_raw_predict_init", "estimators_")
+    missing = [name for name in required if not hasattr(model, name)]
+    if missing:
+        raise ValueError(f"Cannot export {type(model).__name__}: missing {missing} (is the model fitted?)")
+
+def export_predictor(model, label_encoder, path: str):
+    """
+    Flattens a fitted GradientBoostingClassifier / HistGradientBoostingClassifier (and its
+    label encoder) into a NumPy .npz file that TreeArrayPredictor.load can evaluate.
+    """
+    _check_export_support(model)
+    if hasattr(model, "_predictors"):
+        baseline, trees, input_dtype = _hist_gb_trees(model)
+    else:
+        baseline, trees, input_dtype = _gb_trees(model)
+
+    # Concatenate all trees into one node table; child indices become global
+    offsets = np.cumsum([0] + [len(tree["feature"]) for tree in trees])
+    is_leaf = np.concatenate([tree["is_leaf"] for tree in trees])
+    left = np.concatenate([np.asarray(tree["left"], dtype=np.int64) + offset for tree, offset in zip(trees, offsets)])
+    right = np.concatenate([np.asarray(tree["right"], dtype=np.int64) + offset for tree, offset in zip(trees, offsets)])
+    # Leaves point to themselves so every row can take the same number of steps
+    node_ids = np.arange(len(is_leaf))
+    left[is_leaf] = node_ids[is_leaf]
+    right[is_leaf] = node_ids[is_leaf]
+    feature = np.concatenate([tree["feature"] for tree in trees]).astype(np.int64)
+    feature[is_leaf] = 0
+
+    depth = max(_tree_depth(tree["left"], tree["right"], tree["is_leaf"]) for tree in trees)
+    feature_names = getattr(model, "feature_names_in_", None)
+    if feature_names is None:
+        feature_names = [f"x{i}" for i in range(model.n_features_in_)]
+
+    np.savez(
+        path,
+        version=np.array(PREDICTOR_FORMAT_VERSION),
+        feature_names=np.array(list(feature_names), dtype=str),
+        model_classes=np.asarray(model.classes_),
+        label_classes=np.asarray(label_encoder.classes_, dtype=str),
+        baseline=baseline,
+        roots=offsets[:-1],
+        outputs=np.array([tree["output"] for tree in trees], dtype=np.int64),
+        feature=feature,
+        threshold=np.concatenate([tree["threshold"] for tree in trees]).astype(np.float64),
+        left=left,
+        right=right,
+        missing_left=np.concatenate([tree["missing_left"] for tree in trees]).astype(bool),
+        value=np.concatenate([tree["value"] for tree in trees]).astype(np.float64),
+        depth=np.array(depth),
+        input_dtype=np.array(np.dtype(input_dtype).name),
+    )
+
+class ArrayLabelEncoder:
+    """
+    The part of LabelEncoder used at inference time (classes_, inverse_transform), backed by an array.
+    """
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+
+    def inverse_transform(self, y):
+        return self.classes_[np.asarray(y, dtype=np.int64)]
+
+class TreeArrayPredictor:
+    """
+    Evaluates an exported tree ensemble with NumPy only. Exposes feature_names_in_,
+    classes_ and predict like the sklearn model it was exported from.
+    """
+    def __init__(self, arrays: dict):
+        self.feature_names_in_ = arrays["feature_names"]
+        self.classes_ = arrays["model_classes"]
+        self.label_encoder = ArrayLabelEncoder(arrays["label_classes"])
+        self.baseline = arrays["baseline"]
+        self.roots = arrays["roots"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.missing_left = arrays["missing_left"]
+        self.value = arrays["value"]
+        self.depth = int(arrays["depth"])
+        self.input_dtype = np.dtype(str(arrays["input_dtype"]))
+        # outputs one-hot: (n_trees, n_outputs), sums leaf values per output column
+        self.output_matrix = np.zeros((len(self.roots), len(self.baseline)))
+        self.output_matrix[np.arange(len(self.roots)), arrays["outputs"]] = 1.0
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path, allow_pickle=False) as store:
+            version = int(store["version"])
+            if version != PREDICTOR_FORMAT_VERSION:
+                raise ValueError(f"Unsupported predictor format version {version} in {path}")
+            return cls({name: store[name] for name in store.files})
+
+    def _raw_predict_chunk(self, X):
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.depth):
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.baseline + self.value[node] @ self.output_matrix
+
+    def raw_predict(self, X, chunk_size: int = 4096):
+        X = np.asarray(X, dtype=self.input_dtype)
+        if X.ndim != 2 or X.shape[1] != len(self.feature_names_in_):
+            raise ValueError(f"Expected {len(self.feature_names_in_)} features, got shape {X.shape}")
+        # Chunking bounds the (rows x trees) node matrix
+        return np.concatenate([self._raw_predict_chunk(X[i:i + chunk_size])
+                               for i in range(0, X.shape[0], chunk_size)] or [np.empty((0, len(self.baseline)))])
+
+    def predict(self, X):
+        raw = self.raw_predict(X)
+        if raw.shape[1] == 1:
+            # Binary: a single log-odds column, positive → second class
+            indices = (raw[:, 0] > 0).astype(np.int64)
+        else:
+            indices = raw.argmax(axis=1)
+        return self.classes_[indices]
+
+def load_predictor(path: str):
+    """
+    Loads an exported .npz predictor; returns (predictor, label_encoder) like heading_detector.load_model.
+    """
+    predictor = TreeArrayPredictor.load(path)
+    return predictor, predictor.label_encoder
@@ -6,64 +6,191 @@
 # saves the extracted text blocks as JSON
 
 import pytesseract
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
+from pdf2image.exceptions import PDFPopplerTimeoutError
 import os
-import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from scripts.text_block import TextBlock
+from scripts import instrumentation
 
-def ocr_extract_text_blocks(pdf_path, dpi=300):
-    images = convert_from_path(pdf_path, dpi=dpi)
+# Bump whenever the extracted block fields change (invalidates the extraction cache)
+OCR_PARSER_VERSION = 4
+
+# PDF user space unit: pdf_parser emits points, so OCR pixels are scaled by POINTS_PER_INCH / dpi
+POINTS_PER_INCH = 72
+
+def _word_items(data):
+    # One item per recognized word: (text, x0, y0, x1, y1, font_size, block_id)
+    for i in range(len(data['text'])):
+        text = data['text'][i].strip()
+        if not text:
+            continue
+        x0, y0 = data['left'][i], data['top'][i]
+        w, h = data['width'][i], data['height'][i]
+        yield text, x0, y0, x0 + w, y0 + h, h, i
+
+def _line_items(data):
+    # Words grouped by tesseract's (block_num, par_num, line_num), in reading order
+    lines = {}
+    for i in range(len(data['text'])):
+        text = data['text'][i].strip()
+        if not text:
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append(i)
+
+    for (block_num, _, _), indices in lines.items():
+        indices.sort(key=lambda i: data['word_num'][i])
+        heights = sorted(data['height'][i] for i in indices)
+        yield (
+            " ".join(data['text'][i].strip() for i in indices),
+            min(data['left'][i] for i in indices),
+            min(data['top'][i] for i in indices),
+            max(data['left'][i] + data['width'][i] for i in indices),
+            max(data['top'][i] + data['height'][i] for i in indices),
+            # Median word height is a steadier font-size proxy than any single word
+            heights[len(heights) // 2],
+            block_num,
+        )
+
+# pdf_parser's 100pt indent threshold, relative to an A4 page width (595pt)
+INDENT_RATIO = 100 / 595
+# A centred line's midpoint lies within this share of the page width from the page centre
+CENTER_TOLERANCE = 0.03
+
+def _alignment(x0, x1, page_width):
+    # Pixel thresholds would depend on the DPI, so positions are taken relative to the page width
+    left_margin = x0 / page_width
+    center_offset = abs((x0 + x1) / 2 - page_width / 2) / page_width
+    if left_margin >= INDENT_RATIO:
+        # Full-width body lines are roughly centred too, but only short lines clear the indent margin
+        return "center" if center_offset <= CENTER_TOLERANCE else "indented"
+    return "left"
+
+def ocr_page_blocks(image, page_num, granularity="line", timeout=0, dpi=300):
+    """
+    Runs tesseract on one page image and returns its blocks: one per text line
+    (granularity="line", words grouped by tesseract's block/par/line ids) or one per word.
+    dpi is the rasterization resolution of image: coordinates, font sizes and spacings are
+    converted from pixels to points, the unit of pdf_parser, so mixed documents share one scale.
+    line_spacing_after is resolved within the page.
+    With timeout (seconds, 0 = none) pytesseract kills a stuck tesseract process and raises RuntimeError.
+    """
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT, timeout=timeout)
+    items = _line_items(data) if granularity == "line" else _word_items(data)
+    scale = POINTS_PER_INCH / dpi
+    prev_y1 = None
     text_blocks = []
 
-    for page_num, image in enumerate(images, start=1):
-        data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-        n = len(data['text'])
-        prev_y1 = None
-
-        for i in range(n):
-            text = data['text'][i].strip()
-            if not text:
-                continue
-
-            x0 = data['left'][i]
-            y0 = data['top'][i]
-            w = data['width'][i]
-            h = data['height'][i]
-            x1 = x0 + w
-            y1 = y0 + h
-
-            font_size = h
-            font_name = "OCR"
-            is_bold = False
-            is_italic = False
-
-            alignment = "indented" if x0 > 100 else "left"
-            if w > 500:
-                alignment = "center"
-
-            line_spacing_before = round(y0 - prev_y1, 2) if prev_y1 else None
-            prev_y1 = y1
-
-            text_blocks.append({
-                "text": text,
-                "font_size": font_size,
-                "font_name": font_name,
-                "x0": x0,
-                "y0": y0,
-                "x1": x1,
-                "y1": y1,
-                "is_bold": is_bold,
-                "is_italic": is_italic,
-                "alignment": alignment,
-                "line_spacing_before": line_spacing_before,
-                "line_spacing_after": None,
-                "page_number": page_num,
-                "block_id": i
-            })
+    for text, x0, y0, x1, y1, font_size, block_id in items:
+        font_name = "OCR"
+        is_bold = False
+        is_italic = False
+        alignment = _alignment(x0, x1, image.width)
+        x0, y0, x1, y1 = (round(value * scale, 2) for value in (x0, y0, x1, y1))
+        font_size = round(font_size * scale, 2)
+
+        line_spacing_before = round(y0 - prev_y1, 2) if prev_y1 is not None else None
+        prev_y1 = y1
+
+        text_blocks.append(TextBlock(
+            text=text,
+            font_size=font_size,
+            font_name=font_name,
+            x0=x0,
+            y0=y0,
+            x1=x1,
+            y1=y1,
+            is_bold=is_bold,
+            is_italic=is_italic,
+            alignment=alignment,
+            line_spacing_before=line_spacing_before,
+            line_spacing_after=None,
+            page_number=page_num,
+            block_id=block_id
+        ))
 
     # Add line_spacing_after
     for i in range(len(text_blocks) - 1):
-        if text_blocks[i]["page_number"] == text_blocks[i + 1]["page_number"]:
-            text_blocks[i]["line_spacing_after"] = round(text_blocks[i + 1]["y0"] - text_blocks[i]["y1"], 2)
+        text_blocks[i].line_spacing_after = round(text_blocks[i + 1].y0 - text_blocks[i].y1, 2)
+
+    return text_blocks
+
+def _ocr_page(image, page_num, granularity, timeout, dpi):
+    start = time.perf_counter()
+    try:
+        return ocr_page_blocks(image, page_num, granularity, timeout, dpi), time.perf_counter() - start
+    except RuntimeError as e:
+        # pytesseract's timeout: the tesseract process is already killed, the page is skipped
+        if "timeout" not in str(e).lower():
+            raise
+        print(f"[!] OCR page {page_num}: tesseract timed out after {timeout}s → page skipped")
+        return [], time.perf_counter() - start
+    finally:
+        image.close()
+
+def _rasterize_page(pdf_path, page_num, dpi, timeout):
+    try:
+        return convert_from_path(pdf_path, dpi=dpi, first_page=page_num, last_page=page_num,
+                                 timeout=timeout or None)[0]
+    except PDFPopplerTimeoutError:
+        print(f"[!] OCR page {page_num}: rasterization timed out after {timeout}s → page skipped")
+        return None
+
+def iter_ocr_text_blocks(pdf_path, dpi=300, workers=None, max_pending=None, timings=None, pages=None,
+                         granularity="line", page_timeout=0):
+    """
+    Yields the OCR line (or word, see ocr_page_blocks) blocks of a scanned PDF one page at a time (a list per page), in page order.
+    Pages are rasterized one at a time and fed to a pool of tesseract workers; at most
+    max_pending page images exist at once, so memory stays flat regardless of page count.
+    pages restricts OCR to the given 1-based page numbers (in ascending order).
+    Per-page timings are printed and, if a list is passed as timings, appended to it.
+    page_timeout (seconds, 0 = none) bounds pdftoppm and tesseract for each page; a page that
+    exceeds it has its subprocess killed and yields no blocks.
+    """
+    page_count = pdfinfo_from_path(pdf_path)["Pages"]
+    if pages is None:
+        pages = range(1, page_count + 1)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    pending = deque()
+
+    def finish_oldest():
+        page_num, rasterize_time, future = pending.popleft()
+        page_blocks, ocr_time = future.result()
+        print(f"[INFO] OCR page {page_num}/{page_count}: rasterize {rasterize_time:.2f}s, tesseract {ocr_time:.2f}s")
+        if timings is not None:
+            timings.append({"page": page_num, "rasterize_s": rasterize_time, "ocr_s": ocr_time})
+        instrumentation.record("ocr_rasterize", rasterize_time, pages=1, page=page_num)
+        instrumentation.record("ocr_tesseract", ocr_time, pages=1, blocks=len(page_blocks), page=page_num)
+        return page_blocks
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for page_num in pages:
+            # Backpressure: wait for the oldest page before rasterizing another one
+            while len(pending) >= max_pending:
+                yield finish_oldest()
+
+            start = time.perf_counter()
+            image = _rasterize_page(pdf_path, page_num, dpi, page_timeout)
+            rasterize_time = time.perf_counter() - start
+            if image is None:
+                future = executor.submit(lambda: ([], 0.0))
+            else:
+                future = executor.submit(_ocr_page, image, page_num, granularity, page_timeout, dpi)
+            pending.append((page_num, rasterize_time, future))
+
+        while pending:
+            yield finish_oldest()
+
+def ocr_extract_text_blocks(pdf_path, dpi=300, workers=None, max_pending=None, granularity="line", page_timeout=0):
+    text_blocks = []
+    pages = iter_ocr_text_blocks(pdf_path, dpi=dpi, workers=workers, max_pending=max_pending, granularity=granularity,
+                                 page_timeout=page_timeout)
+    for page_blocks in pages:
+        text_blocks.extend(page_blocks)
 
     return {
         "pdf_name": os.path.basename(pdf_path),
@@ -71,14 +198,27 @@ def ocr_extract_text_blocks(pdf_path, dpi=300):
     }
 
 if __name__ == "__main__":
-    import sys
-    pdf_path = sys.argv[1]
-    result = ocr_extract_text_blocks(pdf_path)
+    import argparse
+    from scripts.block_store import save_extracted
+    parser = argparse.ArgumentParser(description="Extract text blocks from a scanned PDF with OCR")
+    parser.add_argument("pdf_path")
+    parser.add_argument("--dpi", type=int, default=300, help="Rasterization DPI")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent tesseract calls (default: all cores)")
+    parser.add_argument("--max_pending", type=int, default=None,
+                        help="Max rasterized pages in flight (default: 2 x workers)")
+    parser.add_argument("--granularity", choices=["line", "word"], default="line",
+                        help="Emit one block per text line (default) or per word")
+    parser.add_argument("--format", choices=["npz", "json"], default="json",
+                        help="npz: compact columnar block file, json: indented JSON")
+    args = parser.parse_args()
+
+    pdf_path = args.pdf_path
+    result = ocr_extract_text_blocks(pdf_path, dpi=args.dpi, workers=args.workers, max_pending=args.max_pending,
+                                     granularity=args.granularity)
 
     filename = os.path.splitext(os.path.basename(pdf_path))[0]
-    output_path = os.path.join("extracted_json", f"{filename}_ocr.json")
+    output_path = os.path.join("extracted_json", f"{filename}_ocr.{args.format}")
 
     os.makedirs("extracted_json", exist_ok=True)
-    with open(output_path, "w") as f:
-        json.dump(result, f, indent=2)
+    save_extracted(result, output_path)
     print(f"[✓] OCR text saved to: {output_path}")
@@ -5,61 +5,175 @@
 
 import fitz  # PyMuPDF
 import os
-import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from scripts.text_block import TextBlock
+from scripts import instrumentation
 
-def extract_text_blocks(pdf_path):
-    doc = fitz.open(pdf_path)
-    text_blocks = []
-    prev_y1 = {}
+# Bump whenever the extracted block fields change (invalidates the extraction cache)
+PARSER_VERSION = 2
 
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        blocks = page.get_text("dict")["blocks"]
+# Documents shorter than this are not worth the process pool startup cost
+MIN_PAGES_FOR_PARALLEL = 16
 
-        for block_id, block in enumerate(blocks):
-            if "lines" not in block:
-                continue
+def _span_units(blocks, granularity):
+    # Yields (block_id, lines): the spans of each unit, grouped by line, become one output block
+    for block_id, block in enumerate(blocks):
+        if "lines" not in block:
+            continue
 
+        if granularity == "block":
+            yield block_id, [line["spans"] for line in block["lines"]]
+        elif granularity == "line":
+            for line in block["lines"]:
+                yield block_id, [line["spans"]]
+        else:
             for line in block["lines"]:
                 for span in line["spans"]:
-                    text = span.get("text", "").strip()
-                    font_name = span.get("font", "")
-                    if not text:
-                        continue
-
-                    x0, y0 = span["bbox"][0], span["bbox"][1]
-                    x1, y1 = span["bbox"][2], span["bbox"][3]
-
-                    is_bold = "bold" in font_name.lower()
-                    is_italic = "italic" in font_name.lower() or "oblique" in font_name.lower()
-                    alignment = "indented" if x0 > 100 else "left"
-                    if abs((x1 - x0) - page.rect.width) < 50:
-                        alignment = "center"
-
-                    line_spacing_before = round(y0 - prev_y1.get(page_num, 0), 2) if page_num in prev_y1 else None
-                    prev_y1[page_num] = y1
-
-                    text_blocks.append({
-                        "text": text,
-                        "font_size": span.get("size"),
-                        "font_name": font_name,
-                        "x0": x0,
-                        "y0": y0,
-                        "x1": x1,
-                        "y1": y1,
-                        "is_bold": is_bold,
-                        "is_italic": is_italic,
-                        "alignment": alignment,
-                        "line_spacing_before": line_spacing_before,
-                        "line_spacing_after": None,
-                        "page_number": page_num + 1,
-                        "block_id": block_id,
-                    })
+                    yield block_id, [[span]]
+
+def _merge_spans(lines):
+    """
+    Merges the spans of one unit: joined text, union bbox, the font of the span with the
+    most characters, and character-weighted bold/italic fractions. Returns None if the unit is empty.
+    """
+    spans = [span for line_spans in lines for span in line_spans if span.get("text", "").strip()]
+    if not spans:
+        return None
+
+    line_texts = ("".join(span.get("text", "") for span in line_spans).strip() for line_spans in lines)
+    text = " ".join(line_text for line_text in line_texts if line_text)
+
+    chars = [len(span["text"].strip()) for span in spans]
+    total_chars = sum(chars)
+    dominant = spans[chars.index(max(chars))]
+    font_names = [span.get("font", "").lower() for span in spans]
+    bold_fraction = sum(c for c, name in zip(chars, font_names) if "bold" in name) / total_chars
+    italic_fraction = sum(c for c, name in zip(chars, font_names) if "italic" in name or "oblique" in name) / total_chars
+
+    bbox = (
+        min(span["bbox"][0] for span in spans),
+        min(span["bbox"][1] for span in spans),
+        max(span["bbox"][2] for span in spans),
+        max(span["bbox"][3] for span in spans),
+    )
+    return text, dominant.get("size"), dominant.get("font", ""), bbox, bold_fraction, italic_fraction
+
+def extract_page_blocks(page, page_num, granularity="span"):
+    """
+    Extracts the text blocks of one page: one per PyMuPDF span (default), or one per
+    line / layout block with spans merged (see _merge_spans). line_spacing_after is
+    resolved within the page, so pages can be processed independently.
+    """
+    text_blocks = []
+    prev_y1 = None
+    blocks = page.get_text("dict")["blocks"]
+
+    for block_id, lines in _span_units(blocks, granularity):
+        merged = _merge_spans(lines)
+        if merged is None:
+            continue
+
+        text, font_size, font_name, (x0, y0, x1, y1), bold_fraction, italic_fraction = merged
+
+        is_bold = bold_fraction >= 0.5
+        is_italic = italic_fraction >= 0.5
+        alignment = "indented" if x0 > 100 else "left"
+        if abs((x1 - x0) - page.rect.width) < 50:
+            alignment = "center"
+
+        line_spacing_before = round(y0 - prev_y1, 2) if prev_y1 is not None else None
+        prev_y1 = y1
+
+        # Fractions are only informative when several spans were merged
+        merged_spans = granularity != "span"
+        text_blocks.append(TextBlock(
+            text=text,
+            font_size=font_size,
+            font_name=font_name,
+            x0=x0,
+            y0=y0,
+            x1=x1,
+            y1=y1,
+            is_bold=is_bold,
+            is_italic=is_italic,
+            alignment=alignment,
+            line_spacing_before=line_spacing_before,
+            line_spacing_after=None,
+            page_number=page_num + 1,
+            block_id=block_id,
+            bold_fraction=round(bold_fraction, 3) if merged_spans else None,
+            italic_fraction=round(italic_fraction, 3) if merged_spans else None,
+        ))
 
     # Add line_spacing_after
     for i in range(len(text_blocks) - 1):
-        if text_blocks[i]["page_number"] == text_blocks[i + 1]["page_number"]:
-            text_blocks[i]["line_spacing_after"] = round(text_blocks[i + 1]["y0"] - text_blocks[i]["y1"], 2)
+        text_blocks[i].line_spacing_after = round(text_blocks[i + 1].y0 - text_blocks[i].y1, 2)
+
+    return text_blocks
+
+def _extract_page_range(pdf_path, page_indices, granularity):
+    # Runs in a worker process: each worker opens its own document
+    doc = fitz.open(pdf_path)
+    try:
+        return [extract_page_blocks(doc[page_num], page_num, granularity) for page_num in page_indices]
+    finally:
+        doc.close()
+
+def _iter_text_blocks_parallel(pdf_path, page_indices, workers, granularity, max_pending=None):
+    # Several chunks per worker keeps the pool balanced when some pages are much heavier
+    chunk_size = max(1, -(-len(page_indices) // (workers * 4)))
+    chunks = [page_indices[i:i + chunk_size] for i in range(0, len(page_indices), chunk_size)]
+    max_pending = max_pending or workers * 2
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in chunks:
+            # Backpressure: at most max_pending chunks are in flight or buffered, as in iter_ocr_text_blocks
+            while len(pending) >= max_pending:
+                yield from pending.popleft().result()
+            pending.append(executor.submit(_extract_page_range, pdf_path, chunk, granularity))
+
+        # Futures are consumed in submission order, so pages are merged in page order
+        while pending:
+            yield from pending.popleft().result()
+
+def iter_text_blocks(pdf_path, workers=1, pages=None, granularity="span", doc=None):
+    """
+    Yields the text blocks of a structured PDF one page at a time (a list per page),
+    so callers only hold a single page of blocks in memory.
+    pages restricts extraction to the given 1-based page numbers (in ascending order).
+    With workers > 1 (or None for all cores) the page range is split across a process pool.
+    granularity is "span", "line" or "block" (see extract_page_blocks).
+    doc is an already open fitz.Document of pdf_path (e.g. from page classification); it is
+    used instead of reopening the file and left open for the caller.
+    """
+    return instrumentation.iter_span("pdf_parser", _iter_text_blocks(pdf_path, workers, pages, granularity, doc))
+
+def _iter_text_blocks(pdf_path, workers, pages, granularity, doc):
+    owns_doc = doc is None
+    if owns_doc:
+        doc = fitz.open(pdf_path)
+    page_indices = [page - 1 for page in pages] if pages is not None else list(range(len(doc)))
+    workers = workers or os.cpu_count() or 1
+
+    if workers > 1 and len(page_indices) >= MIN_PAGES_FOR_PARALLEL:
+        if owns_doc:
+            doc.close()
+        yield from _iter_text_blocks_parallel(pdf_path, page_indices, min(workers, len(page_indices)), granularity)
+        return
+
+    try:
+        for page_num in page_indices:
+            yield extract_page_blocks(doc[page_num], page_num, granularity)
+    finally:
+        if owns_doc:
+            doc.close()
+
+def extract_text_blocks(pdf_path, workers=1, granularity="span", doc=None):
+    text_blocks = []
+    for page_blocks in iter_text_blocks(pdf_path, workers=workers, granularity=granularity, doc=doc):
+        text_blocks.extend(page_blocks)
 
     return {
         "pdf_name": os.path.basename(pdf_path),
@@ -67,14 +181,23 @@ def extract_text_blocks(pdf_path):
     }
 
 if __name__ == "__main__":
-    import sys
-    pdf_path = sys.argv[1]
-    result = extract_text_blocks(pdf_path)
+    import argparse
+    from scripts.block_store import save_extracted
+    parser = argparse.ArgumentParser(description="Extract text blocks from a structured PDF")
+    parser.add_argument("pdf_path")
+    parser.add_argument("--workers", type=int, default=1, help="Processes to split the page range across (0 = all cores)")
+    parser.add_argument("--granularity", choices=["span", "line", "block"], default="span",
+                        help="One block per PyMuPDF span (default), per line or per layout block")
+    parser.add_argument("--format", choices=["npz", "json"], default="json",
+                        help="npz: compact columnar block file, json: indented JSON")
+    args = parser.parse_args()
+
+    pdf_path = args.pdf_path
+    result = extract_text_blocks(pdf_path, workers=args.workers, granularity=args.granularity)
 
     filename = os.path.splitext(os.path.basename(pdf_path))[0]
-    output_path = os.path.join("extracted_json", f"{filename}_structured.json")
+    output_path = os.path.join("extracted_json", f"{filename}_structured.{args.format}")
 
     os.makedirs("extracted_json", exist_ok=True)
-    with open(output_path, "w") as f:
-        json.dump(result, f, indent=2)
+    save_extracted(result, output_path)
     print(f"[✓] Structured text saved to: {output_path}")
@@ -0,0 +1,83 @@
+# scripts/text_block.py
+
+# Memory-lean representation of one extracted text block
+# The parsers used to build one dict per span/word; TextBlock stores the same
+# fields in __slots__ (no per-instance dict) and interns font names so every block
+# of a font shares one string. It also behaves like a dict (b["text"], b.get(...),
+# b["line_spacing_after"] = ..., iteration) so existing callers keep working.
+
+import sys
+from collections.abc import MutableMapping
+
+BLOCK_FIELDS = (
+    "text", "font_size", "font_name", "x0", "y0", "x1", "y1", "is_bold", "is_italic",
+    "alignment", "line_spacing_before", "line_spacing_after", "page_number", "block_id",
+    # Only set when spans were merged into lines/blocks (pdf_parser granularity)
+    "bold_fraction", "italic_fraction",
+)
+_FIELD_SET = frozenset(BLOCK_FIELDS)
+
+class TextBlock(MutableMapping):
+    __slots__ = BLOCK_FIELDS
+
+    def __init__(self, text, font_size, font_name, x0, y0, x1, y1, is_bold, is_italic, alignment,
+                 line_spacing_before, line_spacing_after, page_number, block_id,
+                 bold_fraction=None, italic_fraction=None):
+        self.text = text
+        self.font_size = font_size
+        self.font_name = sys.intern(font_name)
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+        self.is_bold = is_bold
+        self.is_italic = is_italic
+        self.alignment = alignment
+        self.line_spacing_before = line_spacing_before
+        self.line_spacing_after = line_spacing_after
+        self.page_number = page_number
+        self.block_id = block_id
+        self.bold_fraction = bold_fraction
+        self.italic_fraction = italic_fraction
+
+    # Dict-view adapter
+    def __getitem__(self, key):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in _FIELD_SET:
+            raise KeyError(f"TextBlock has no field {key!r}")
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        raise TypeError("TextBlock fields cannot be deleted")
+
+    def __iter__(self):
+        return iter(BLOCK_FIELDS)
+
+    def __len__(self):
+        return len(BLOCK_FIELDS)
+
+    def get(self, key, default=None):
+        # Faster than the MutableMapping default, which goes through __getitem__ and KeyError
+        return getattr(self, key) if key in _FIELD_SET else default
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in BLOCK_FIELDS}
+
+    def __reduce__(self):
+        # Pickle as a plain tuple of values (extraction cache, process pools)
+        return (TextBlock, tuple(getattr(self, field) for field in BLOCK_FIELDS))
+
+    def __repr__(self):
+        return f"TextBlock({self.to_dict()!r})"
+
+def json_default(obj):
+    """
+    json.dump(..., default=json_default) serializes TextBlocks as plain dicts.
+    """
+    if isinstance(obj, TextBlock):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
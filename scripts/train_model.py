@@ -1,76 +1,175 @@
 # scripts/train_model.py
 
-# Trains Gradient Boost model on training_data/
+# Trains the heading model (HistGradientBoosting by default) on training_data/
 # This is the script to train the heading detection model
 # It reads the input CSV, prepares features, trains a model,
 # and saves the trained model and label encoder
 # scripts/train_model.py
 
 import pandas as pd
+import numpy as np
 import joblib
 import os
-from sklearn.ensemble import GradientBoostingClassifier
+import time
+import hashlib
+from joblib import Parallel, delayed
 from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
-
-def load_and_merge_data(input_csv, output_csv):
-    input_df = pd.read_csv(input_csv)
+from sklearn.model_selection import train_test_split, GroupKFold, KFold, ParameterGrid
+from sklearn.metrics import classification_report, f1_score, accuracy_score
+from scripts.generate_csv import read_input_rows
+from scripts.model_backends import BACKENDS, DEFAULT_BACKEND, PARAM_GRIDS, make_model, export_predictor
+from scripts.feature_pipeline import FeaturePipeline, labelled_features, pipeline_path
+from scripts.candidate_filter import fit_candidate_filter, prefilter_path, print_report, split_documents
+
+def load_input_table(input_path):
+    # Accepts the input CSV or extracted block files (.npz / .json, or a directory of them)
+    if input_path.endswith(".csv"):
+        return pd.read_csv(input_path)
+    return pd.DataFrame(read_input_rows(input_path))
+
+def load_training_frame(input_csv, output_csv, pipeline=None):
+    """
+    Joins the block rows with their labels and builds features through the shared FeaturePipeline.
+    Returns (merged rows, X).
+    """
+    input_df = load_input_table(input_csv)
     output_df = pd.read_csv(output_csv)
+    return labelled_features(input_df, output_df, pipeline)
+
+INPUT_CSV = "training_data/v1/input.csv"
+OUTPUT_CSV = "training_data/v1/output.csv"
+MODEL_PATH = "models/heading_model.pkl"
+LABEL_ENCODER_PATH = "models/label_encoder.pkl"
+COMPILED_MODEL_PATH = "models/heading_model.npz"
+LEADERBOARD_PATH = "models/search_leaderboard.csv"
+FOLD_CACHE_DIR = ".cache/folds"
+
+def load_training_set(input_path=INPUT_CSV, output_path=OUTPUT_CSV, return_groups=False, pipeline=None):
+    """
+    Loads and merges the training CSVs and returns (X, y, label_encoder),
+    plus the file_name of every row with return_groups.
+    """
+    df, X = load_training_frame(input_path, output_path, pipeline)
+    label_encoder = LabelEncoder()
+    y = pd.Series(label_encoder.fit_transform(df["level"]), index=X.index, name="label")
+    if return_groups:
+        return X, y, label_encoder, df["file_name"]
+    return X, y, label_encoder
+
+def make_folds(y, groups, n_splits=5):
+    """
+    Grouped K-fold by file_name so no PDF is split across train and test.
+    With fewer than 2 documents grouping is impossible: falls back to shuffled KFold.
+    """
+    n_groups = groups.nunique()
+    if n_groups >= 2:
+        splitter = GroupKFold(n_splits=min(n_splits, n_groups))
+        return list(splitter.split(np.zeros(len(y)), y, groups))
+
+    print(f"[!] Only {n_groups} document(s) in the training data → falling back to row-level KFold "
+          "(scores will be optimistic)")
+    splitter = KFold(n_splits=n_splits, shuffle=True, random_state=42)
+    return list(splitter.split(np.zeros(len(y))))
+
+def cache_folds(X, y, folds, cache_dir=FOLD_CACHE_DIR):
+    """
+    Writes each fold's train/test matrices once (keyed by the data and the split) and returns their paths;
+    workers memory-map them instead of receiving a pickled copy per task.
+    """
+    X_values = np.ascontiguousarray(X.to_numpy(dtype=np.float64))
+    y_values = np.asarray(y)
+    digest = hashlib.sha256(X_values.tobytes())
+    digest.update(y_values.tobytes())
+    for train_idx, test_idx in folds:
+        digest.update(train_idx.tobytes())
+        digest.update(test_idx.tobytes())
+    fold_dir = os.path.join(cache_dir, digest.hexdigest()[:16])
+    os.makedirs(fold_dir, exist_ok=True)
+
+    paths = []
+    for i, (train_idx, test_idx) in enumerate(folds):
+        path = os.path.join(fold_dir, f"fold_{i}.joblib")
+        if not os.path.exists(path):
+            fold = (X_values[train_idx], y_values[train_idx], X_values[test_idx], y_values[test_idx])
+            joblib.dump(fold, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        paths.append(path)
+    return paths
+
+def _evaluate_fold(backend, params, fold_path):
+    X_train, y_train, X_test, y_test = joblib.load(fold_path, mmap_mode="r")
+    model = make_model(backend, **params)
+
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
 
-    # Ensure page_number is int for consistent merge
-    input_df["page_number"] = input_df["page_number"].astype(int)
-    output_df["page_number"] = output_df["page_number"].astype(int)
-
-    # Merge on keys
-    merged_df = pd.merge(input_df, output_df, on=["file_name", "page_number", "text"], how="inner")
-    return merged_df
-
-def prepare_features(df):
-    df["alignment"] = df.get("alignment", "left").fillna("left")
-    df = pd.get_dummies(df, columns=["alignment"], drop_first=True)
-
-    # Fill missing with 0 or appropriate value
-    df["is_bold"] = df.get("is_bold", 0)
-    df["is_italic"] = df.get("is_italic", 0)
-    df["line_spacing_before"] = df.get("line_spacing_before", 0)
-    df["line_spacing_after"] = df.get("line_spacing_after", 0)
-
-    # Encode labels
-    le = LabelEncoder()
-    df["label"] = le.fit_transform(df["level"])
-
-    # Base features
-    features = [
-        "font_size", "relative_to_max", "relative_to_mean", "above_std",
-        "is_bold", "is_italic", "line_spacing_before", "line_spacing_after",
-        "text_len", "y0", "page_number"
-    ] + [col for col in df.columns if col.startswith("alignment_")]
-
-    return df[features], df["label"], le
-
-def main():
-    INPUT_CSV = "training_data/v1/input.csv"
-    OUTPUT_CSV = "training_data/v1/output.csv"
-    MODEL_PATH = "models/heading_model.pkl"
-    LABEL_ENCODER_PATH = "models/label_encoder.pkl"
-
+    start = time.perf_counter()
+    y_pred = model.predict(X_test)
+    predict_time = time.perf_counter() - start
+
+    return {
+        "f1_macro": f1_score(y_test, y_pred, average="macro", zero_division=0),
+        "accuracy": accuracy_score(y_test, y_pred),
+        "fit_s": fit_time,
+        "predict_s": predict_time,
+        "predict_rows": len(y_test),
+    }
+
+def search(input_path=INPUT_CSV, output_path=OUTPUT_CSV, backends=BACKENDS, n_splits=5, n_jobs=-1,
+           leaderboard_path=LEADERBOARD_PATH):
+    """
+    Cross-validates every configuration of PARAM_GRIDS[backend] on grouped folds, one
+    (configuration, fold) fit per task across all cores, and writes a leaderboard CSV
+    sorted by mean macro F1. Returns the leaderboard DataFrame.
+    """
+    print("[INFO] Loading training data...")
+    X, y, _, groups = load_training_set(input_path, output_path, return_groups=True)
+    folds = make_folds(y, groups, n_splits)
+    fold_paths = cache_folds(X, y, folds)
+
+    configs = [(backend, params) for backend in backends for params in ParameterGrid(PARAM_GRIDS[backend])]
+    print(f"[INFO] {len(configs)} configurations x {len(folds)} folds on {len(X)} rows")
+
+    start = time.perf_counter()
+    scores = Parallel(n_jobs=n_jobs)(
+        delayed(_evaluate_fold)(backend, params, fold_path) for backend, params in configs for fold_path in fold_paths
+    )
+    print(f"[INFO] Search finished in {time.perf_counter() - start:.1f}s")
+
+    rows = []
+    for i, (backend, params) in enumerate(configs):
+        fold_scores = pd.DataFrame(scores[i * len(fold_paths):(i + 1) * len(fold_paths)])
+        rows.append({
+            "backend": backend,
+            "params": str(params),
+            "f1_macro_mean": fold_scores["f1_macro"].mean(),
+            "f1_macro_std": fold_scores["f1_macro"].std(ddof=0),
+            "accuracy_mean": fold_scores["accuracy"].mean(),
+            "fit_s_mean": fold_scores["fit_s"].mean(),
+            "predict_s_mean": fold_scores["predict_s"].mean(),
+            "predict_rows_per_s": fold_scores["predict_rows"].sum() / fold_scores["predict_s"].sum(),
+        })
+
+    leaderboard = pd.DataFrame(rows).sort_values(["f1_macro_mean", "fit_s_mean"], ascending=[False, True])
+    os.makedirs(os.path.dirname(leaderboard_path) or ".", exist_ok=True)
+    leaderboard.to_csv(leaderboard_path, index=False)
+
+    print(leaderboard.head(5).to_string(index=False))
+    print(f"[✓] Leaderboard saved to: {leaderboard_path}")
+    return leaderboard
+
+def main(input_path=INPUT_CSV, output_path=OUTPUT_CSV, backend=DEFAULT_BACKEND, export=False):
     print("[INFO] Loading training data...")
-    df = load_and_merge_data(INPUT_CSV, OUTPUT_CSV)
-
     print("[INFO] Preparing features...")
-    df["relative_to_max"] = df["font_size"] / df["font_size"].max()
-    df["relative_to_mean"] = df["font_size"] / df["font_size"].mean()
-    df["above_std"] = (df["font_size"] - df["font_size"].mean()) / df["font_size"].std()
-    df["text_len"] = df["text"].apply(len)
-
-    X, y, label_encoder = prepare_features(df)
+    pipeline = FeaturePipeline()
+    X, y, label_encoder = load_training_set(input_path, output_path, pipeline=pipeline)
 
     print("[INFO] Splitting train/test set...")
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    print("[INFO] Training Gradient Boosting Classifier...")
-    model = GradientBoostingClassifier(n_estimators=200, learning_rate=0.1, max_depth=5, random_state=42)
+    print(f"[INFO] Training {backend} classifier...")
+    model = make_model(backend)
     model.fit(X_train, y_train)
 
     print("[INFO] Evaluating model...")
@@ -80,9 +179,48 @@ def main():
     os.makedirs("models", exist_ok=True)
     joblib.dump(model, MODEL_PATH)
     joblib.dump(label_encoder, LABEL_ENCODER_PATH)
+    pipeline.save(pipeline_path(MODEL_PATH))
 
     print(f"[✓] Model saved to: {MODEL_PATH}")
     print(f"[✓] Label encoder saved to: {LABEL_ENCODER_PATH}")
+    print(f"[✓] Feature schema saved to: {pipeline_path(MODEL_PATH)}")
+
+    print("[INFO] Fitting candidate pre-filter...")
+    # Fitted on the training documents only; `candidate_filter measure` scores the held-out ones
+    fit_input, fit_output, _, _ = split_documents(load_input_table(input_path), pd.read_csv(output_path))
+    try:
+        candidate_filter, report = fit_candidate_filter(fit_input, fit_output, pipeline=pipeline)
+    except ValueError as e:
+        # The model is already saved; without a filter every block goes to the model
+        print(f"[!] Candidate filter not fitted ({e}) → skipped")
+    else:
+        print_report(report)
+        candidate_filter.save(prefilter_path(MODEL_PATH))
+        print(f"[✓] Candidate filter saved to: {prefilter_path(MODEL_PATH)}")
+
+    if export:
+        export_predictor(model, label_encoder, COMPILED_MODEL_PATH)
+        print(f"[✓] Compiled predictor saved to: {COMPILED_MODEL_PATH}")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the heading detection model")
+    parser.add_argument("--input", default=INPUT_CSV,
+                        help="Input features: CSV, or .npz/.json block files (file or directory)")
+    parser.add_argument("--output", default=OUTPUT_CSV, help="Heading labels CSV")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="hist_gb: HistGradientBoostingClassifier (default), gb: GradientBoostingClassifier")
+    parser.add_argument("--export", action="store_true",
+                        help=f"Also export a NumPy-only predictor to {COMPILED_MODEL_PATH}")
+    parser.add_argument("--search", action="store_true",
+                        help=f"Grouped K-fold hyperparameter search instead of training; writes {LEADERBOARD_PATH}")
+    parser.add_argument("--search-backends", nargs="+", choices=BACKENDS, default=BACKENDS,
+                        help="Backends included in --search")
+    parser.add_argument("--folds", type=int, default=5, help="Number of cross-validation folds for --search")
+    parser.add_argument("--jobs", type=int, default=-1, help="Parallel fits for --search (-1 = all cores)")
+    args = parser.parse_args()
+
+    if args.search:
+        search(args.input, args.output, args.search_backends, args.folds, args.jobs)
+    else:
+        main(args.input, args.output, args.backend, args.export)
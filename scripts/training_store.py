@@ -0,0 +1,126 @@
+# scripts/training_store.py
+
+# Deduplicated training store on top of training_data/v1/{input,output}.csv
+# Every labelled row gets a key over (file_name, page_number, text, content hash of its
+# feature values); the label is not part of the key. Keys and their current level live in a
+# sidecar index (input.csv.keys, "key<TAB>level" per line)
+# Promoting rows appends only unseen keys to both CSVs and to the index, instead of
+# re-reading and rewriting the whole training set, so repeated promotions never duplicate rows;
+# a known key promoted with a different level is an upsert: the newest label replaces the old one
+
+import os
+import csv
+import hashlib
+import pandas as pd
+
+KEY_INDEX_SUFFIX = ".keys"
+MERGE_KEYS = ["file_name", "page_number", "text"]
+
+def _cell(value) -> str:
+    return "" if pd.isna(value) else str(value)
+
+def row_keys(df: pd.DataFrame, content_columns) -> list:
+    """
+    One key per row: sha1 of file_name, page_number, text and a sha256 of the row content.
+    content_columns are the input columns; the level is left out so a relabelled row keeps its key.
+    """
+    keys = []
+    for row in df[list(content_columns)].itertuples(index=False):
+        values = dict(zip(content_columns, row))
+        content = hashlib.sha256("\x1f".join(_cell(v) for v in row).encode("utf-8")).hexdigest()
+        identity = "\x1f".join([_cell(values["file_name"]), _cell(values["page_number"]), _cell(values["text"]), content])
+        keys.append(hashlib.sha1(identity.encode("utf-8")).hexdigest())
+    return keys
+
+def _csv_header(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+def _index_is_fresh(index_path, input_csv, output_csv):
+    # The index is written after the CSVs; a CSV edited since then makes it stale
+    if not os.path.exists(index_path):
+        return False
+    index_mtime = os.stat(index_path).st_mtime_ns
+    return all(os.stat(path).st_mtime_ns <= index_mtime for path in (input_csv, output_csv))
+
+def _write_key_index(index_path, index, mode="w"):
+    with open(index_path, mode, encoding="utf-8") as f:
+        f.writelines(f"{key}\t{level}\n" for key, level in index.items())
+
+def load_key_index(input_csv, output_csv) -> dict:
+    """
+    Returns {key: level} for the rows already in the store, rebuilding the sidecar index from the CSVs
+    if it is missing, stale or in the older keys-only format.
+    """
+    index_path = input_csv + KEY_INDEX_SUFFIX
+    if not os.path.exists(input_csv) or not os.path.exists(output_csv):
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        return {}
+    if _index_is_fresh(index_path, input_csv, output_csv):
+        with open(index_path, encoding="utf-8") as f:
+            entries = [line.rstrip("\n").split("\t", 1) for line in f if line.strip()]
+        if all(len(entry) == 2 for entry in entries):
+            # Later lines are newer labels
+            return dict(entries)
+
+    print(f"[INFO] Rebuilding training key index: {index_path}")
+    input_df = pd.read_csv(input_csv)
+    output_df = pd.read_csv(output_csv)
+    merged = pd.merge(input_df, output_df, on=MERGE_KEYS, how="inner")
+    index = dict(zip(row_keys(merged, list(input_df.columns)), merged["level"].map(_cell)))
+    _write_key_index(index_path, index)
+    return index
+
+def _append_rows(path, df):
+    if os.path.exists(path):
+        # Keep the existing column order; columns the store does not have are dropped
+        header = _csv_header(path)
+        df.reindex(columns=header).to_csv(path, mode="a", header=False, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+def _relabel_rows(output_csv, output_rows):
+    # output.csv labels blocks by (file_name, page_number, text): every stored label of these
+    # blocks is replaced by the newest one, so the merge in labelled_features yields one row each
+    output_df = pd.read_csv(output_csv)
+    stale = output_df.set_index(MERGE_KEYS).index.isin(output_rows.set_index(MERGE_KEYS).index)
+    relabelled = pd.concat([output_df[~stale], output_rows.reindex(columns=output_df.columns)], ignore_index=True)
+    relabelled.to_csv(output_csv, index=False)
+
+def append_rows(input_rows: pd.DataFrame, output_rows: pd.DataFrame, input_csv, output_csv) -> pd.DataFrame:
+    """
+    Upserts labelled rows; rows must be aligned (input_rows[i] is labelled by output_rows[i]).
+    Unseen keys are appended to both CSVs; a known key with a different level replaces its stored
+    label (output.csv is rewritten only then). Within one call the last row of a key wins.
+    Returns the added and relabelled rows (input columns + level).
+    """
+    os.makedirs(os.path.dirname(input_csv) or ".", exist_ok=True)
+    known = load_key_index(input_csv, output_csv)
+
+    labelled = input_rows.reset_index(drop=True).assign(level=output_rows["level"].reset_index(drop=True))
+    keys = pd.Series(row_keys(labelled, list(input_rows.columns)))
+    levels = labelled["level"].map(_cell)
+    latest = ~keys.duplicated(keep="last")
+    new = latest & ~keys.isin(known)
+    relabelled = latest & keys.isin(known) & (levels != keys.map(known))
+    changed = new | relabelled
+    if not changed.any():
+        return labelled.iloc[:0]
+
+    output_rows = output_rows.reset_index(drop=True)
+    if relabelled.any():
+        _relabel_rows(output_csv, output_rows[relabelled])
+    if new.any():
+        _append_rows(input_csv, input_rows.reset_index(drop=True)[new])
+        _append_rows(output_csv, output_rows[new])
+
+    # Written last, so the index is never newer than rows it does not list
+    index_path = input_csv + KEY_INDEX_SUFFIX
+    updates = dict(zip(keys[changed], levels[changed]))
+    if relabelled.any():
+        known.update(updates)
+        _write_key_index(index_path, known)
+    else:
+        _write_key_index(index_path, updates, mode="a")
+    return labelled[changed.to_numpy()]
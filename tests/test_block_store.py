@@ -0,0 +1,60 @@
+# tests/test_block_store.py
+
+# An .npz round trip must give the same blocks, input.csv bytes and features as a JSON round trip
+
+import numpy as np
+import pandas as pd
+from scripts.block_store import load_block_columns, load_extracted, save_extracted
+from scripts.generate_csv import generate_input_csv
+from scripts.heading_detector import BLOCK_FIELDS, prepare_columns, prepare_document
+from scripts.text_block import TextBlock
+
+def f32(value):
+    # PyMuPDF reports positions and sizes as C floats widened to Python floats
+    return np.float32(value).item()
+
+BLOCKS = [
+    TextBlock("Annual Report", f32(24.0), "Helvetica-Bold", f32(72.0), f32(78.5), f32(176.5), f32(105.98),
+              True, False, "center", None, 22.19, 1, 0),
+    TextBlock("1. Introduction", f32(11.04), "Helvetica-Bold", f32(72.0), f32(128.17), f32(234.04), f32(143.29),
+              True, False, "left", 22.19, 4.5, 1, 1, bold_fraction=1.0, italic_fraction=0.0),
+    # OCR blocks are rounded to 2 decimals in points
+    TextBlock("Body text scanned from an image", 11.04, "OCR", 72.0, 147.79, 183.84, 158.83,
+              False, False, "indented", 4.5, None, 2, 3),
+    TextBlock("2. Methods", f32(13.7), "Times-Italic", f32(90.3), f32(200.1), f32(250.9), f32(214.3),
+              False, True, "indented", 0.33, None, 2, 4, bold_fraction=0.25, italic_fraction=0.75),
+]
+
+def write_both(tmp_path):
+    result = {"pdf_name": "report.pdf", "text_blocks": BLOCKS}
+    json_dir, npz_dir = tmp_path / "json", tmp_path / "npz"
+    json_dir.mkdir()
+    npz_dir.mkdir()
+    save_extracted(result, str(json_dir / "report.json"))
+    save_extracted(result, str(npz_dir / "report.npz"))
+    return json_dir, npz_dir
+
+def test_npz_round_trip_equals_json_round_trip(tmp_path):
+    json_dir, npz_dir = write_both(tmp_path)
+    from_json = load_extracted(str(json_dir / "report.json"))
+    from_npz = load_extracted(str(npz_dir / "report.npz"))
+    assert from_npz == from_json
+    assert from_json["text_blocks"] == [b.to_dict() for b in BLOCKS]
+
+def test_npz_and_json_give_the_same_input_csv(tmp_path):
+    json_dir, npz_dir = write_both(tmp_path)
+    generate_input_csv(str(json_dir), str(tmp_path / "out" / "from_json.csv"))
+    generate_input_csv(str(npz_dir), str(tmp_path / "out" / "from_npz.csv"))
+    assert (tmp_path / "out" / "from_npz.csv").read_bytes() == (tmp_path / "out" / "from_json.csv").read_bytes()
+
+def test_npz_columns_give_the_same_features_as_json_blocks(tmp_path):
+    json_dir, npz_dir = write_both(tmp_path)
+    store = load_block_columns(str(npz_dir / "report.npz"))
+    columns = pd.DataFrame({field: store[field] for field in BLOCK_FIELDS})
+    title, kept_positions, X_npz = prepare_columns(columns)
+
+    json_blocks = load_extracted(str(json_dir / "report.json"))["text_blocks"]
+    json_title, blocks_filtered, X_json = prepare_document(json_blocks)
+    assert title == json_title
+    assert [store["text"][i] for i in kept_positions] == [b["text"] for b in blocks_filtered]
+    pd.testing.assert_frame_equal(X_npz, X_json, check_exact=True)
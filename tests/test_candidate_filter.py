@@ -0,0 +1,43 @@
+# tests/test_candidate_filter.py
+
+# The candidate filter is fitted on whole training documents and records them,
+# so measure can score it on documents it has not seen
+
+import pandas as pd
+from scripts.candidate_filter import CandidateFilter, fit_candidate_filter, split_documents
+
+def document(name):
+    rows = [{"file_name": name, "page_number": 1, "text": f"{i}. Heading {name}", "font_size": 16.0,
+             "font_name": "Arial-Bold", "is_bold": True, "is_italic": False, "alignment": "left",
+             "line_spacing_before": 10.0, "line_spacing_after": 4.0, "y0": 100.0 + 50 * i} for i in range(1, 3)]
+    rows += [{"file_name": name, "page_number": 1, "text": f"Body sentence number {i} of {name}.", "font_size": 10.0,
+              "font_name": "Arial", "is_bold": False, "is_italic": False, "alignment": "left",
+              "line_spacing_before": 2.0, "line_spacing_after": 2.0, "y0": 300.0 + 12 * i} for i in range(6)]
+    return rows
+
+INPUT = pd.DataFrame([row for name in ("a.pdf", "b.pdf", "c.pdf", "d.pdf", "e.pdf") for row in document(name)])
+OUTPUT = INPUT[INPUT["is_bold"]][["file_name", "page_number", "text"]].assign(level="H1")
+
+def test_split_holds_out_whole_documents():
+    fit_input, fit_output, holdout_input, holdout_output = split_documents(INPUT, OUTPUT)
+    held = set(holdout_input["file_name"])
+    assert len(held) == 1
+    assert not held & set(fit_input["file_name"])
+    assert set(holdout_output["file_name"]) == held and not held & set(fit_output["file_name"])
+    assert len(fit_input) + len(holdout_input) == len(INPUT)
+
+def test_fitted_filter_records_its_documents(tmp_path):
+    fit_input, fit_output, holdout_input, _ = split_documents(INPUT, OUTPUT)
+    candidate, report = fit_candidate_filter(fit_input, fit_output)
+    assert candidate.fitted_documents == sorted(set(fit_input["file_name"]))
+    assert report["documents"] == 4
+
+    candidate.save(str(tmp_path / "model.prefilter.json"))
+    loaded = CandidateFilter.load(str(tmp_path / "model.prefilter.json"))
+    assert loaded.to_dict() == candidate.to_dict()
+    assert not set(holdout_input["file_name"]) & set(loaded.fitted_documents)
+
+def test_single_document_holds_nothing_out():
+    one = INPUT[INPUT["file_name"] == "a.pdf"]
+    fit_input, _, holdout_input, _ = split_documents(one, OUTPUT)
+    assert len(fit_input) == len(one) and holdout_input.empty
@@ -0,0 +1,55 @@
+# tests/test_extraction_cache.py
+
+# Batch workers share one cache directory and evict concurrently: an entry deleted by another
+# worker between lookup and LRU touch is a miss, and deleting an already deleted entry is a no-op
+
+import os
+from scripts import extraction_cache
+from scripts.extraction_cache import evict, load_cached_pages, store_cached_pages
+
+PAGES = [[{"text": "Heading", "page_number": 1}], [{"text": "Body", "page_number": 2}]]
+
+def store(key, cache_dir, max_bytes=extraction_cache.MAX_CACHE_BYTES):
+    return list(store_cached_pages(key, "structured", PAGES, str(cache_dir), max_bytes))
+
+def test_round_trip(tmp_path):
+    assert store("k", tmp_path) == PAGES
+    kind, pages = load_cached_pages("k", str(tmp_path))
+    assert (kind, list(pages)) == ("structured", PAGES)
+
+def test_entry_evicted_before_touch_is_a_miss(tmp_path, monkeypatch):
+    store("k", tmp_path)
+    utime = os.utime
+
+    def evicted_by_other_worker(path, *args, **kwargs):
+        os.remove(path)
+        return utime(path, *args, **kwargs)
+
+    monkeypatch.setattr(extraction_cache.os, "utime", evicted_by_other_worker)
+    assert load_cached_pages("k", str(tmp_path)) is None
+
+def test_corrupt_entry_already_removed_is_a_miss(tmp_path, monkeypatch):
+    (tmp_path / "k.bin").write_bytes(b"not a cache entry")
+    remove = os.remove
+
+    def removed_by_other_worker(path):
+        remove(path)
+        remove(path)
+
+    monkeypatch.setattr(extraction_cache.os, "remove", removed_by_other_worker)
+    assert load_cached_pages("k", str(tmp_path)) is None
+    assert not (tmp_path / "k.bin").exists()
+
+def test_eviction_skips_entries_removed_concurrently(tmp_path, monkeypatch):
+    for key in ("a", "b", "c"):
+        store(key, tmp_path)
+    remove = os.remove
+
+    def raced(path):
+        # Another worker deletes each entry first
+        remove(path)
+        remove(path)
+
+    monkeypatch.setattr(extraction_cache.os, "remove", raced)
+    evict(str(tmp_path), max_bytes=0)
+    assert not list(tmp_path.glob("*.bin"))
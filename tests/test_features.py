@@ -0,0 +1,140 @@
+# tests/test_features.py
+
+# The vectorized feature path (heading_detector.prepare_document → FeaturePipeline) must build
+# the same matrix as a per-block extract_features loop, reproduced below as reference:
+# same columns in the same order, same dtypes, same values
+# The reference spells out the rules of the vectorized path: the extractor's is_bold / is_italic
+# flags win, blocks without them fall back to the lowercased font name, missing or None line
+# spacings are 0.0, and the alignment dummies are fixed (center is the dropped baseline)
+
+import numpy as np
+import pandas as pd
+from scripts.heading_detector import prepare_document
+from scripts.text_block import TextBlock
+
+IGNORE_TEXTS = ["author", "date", "page", "footer", "header", "contact", "copyright", "www.", "@", ".com"]
+EXPECTED_DTYPES = {
+    "font_size": "float64", "relative_to_max": "float64", "relative_to_mean": "float64", "above_std": "float64",
+    "is_bold": "int64", "is_italic": "int64", "line_spacing_before": "float64", "line_spacing_after": "float64",
+    "text_len": "int64", "y0": "float64", "page_number": "int64", "alignment_indented": "bool",
+    "alignment_left": "bool",
+}
+
+def is_noise(text):
+    text_lower = text.lower()
+    return any(keyword in text_lower for keyword in IGNORE_TEXTS) or text.strip().isdigit() or len(text.strip()) < 3
+
+def reference_flag(block, field, markers):
+    if block.get(field) is not None:
+        return int(bool(block[field]))
+    return int(any(marker in block.get("font_name", "").lower() for marker in markers))
+
+def reference_features(blocks):
+    # Per-block implementation: font stats, page-1 title, per-row features, fixed alignment dummies
+    font_sizes = [b["font_size"] for b in blocks if not is_noise(b["text"])]
+    mean_font, std_font = np.mean(font_sizes), np.std(font_sizes)
+    font_stats = {"max_font": max(font_sizes), "mean_font": mean_font, "std_font": std_font if std_font > 0 else 1.0}
+
+    page1_blocks = [b for b in blocks if b.get("page_number") == 1 and not is_noise(b.get("text", ""))]
+    title_block = max(page1_blocks, key=lambda b: b.get("font_size", 0), default=None)
+    title_text = title_block.get("text") if title_block else None
+
+    rows = []
+    for block in blocks:
+        text = block.get("text", "")
+        if is_noise(text) or (title_text and text.strip() == title_text.strip()):
+            continue
+        alignment = block.get("alignment") or "left"
+        rows.append({
+            "font_size": float(block["font_size"]),
+            "relative_to_max": block["font_size"] / font_stats["max_font"],
+            "relative_to_mean": block["font_size"] / font_stats["mean_font"],
+            "above_std": (block["font_size"] - font_stats["mean_font"]) / font_stats["std_font"],
+            "is_bold": reference_flag(block, "is_bold", ["bold"]),
+            "is_italic": reference_flag(block, "is_italic", ["italic", "oblique"]),
+            "line_spacing_before": float(block.get("line_spacing_before") or 0.0),
+            "line_spacing_after": float(block.get("line_spacing_after") or 0.0),
+            "text_len": len(text),
+            "y0": float(block.get("y0", 0.0)),
+            "page_number": block.get("page_number", 1),
+            "alignment_indented": alignment == "indented",
+            "alignment_left": alignment == "left",
+        })
+    return title_text, pd.DataFrame(rows).astype(EXPECTED_DTYPES)
+
+def parsed(text, font_size, font_name="Arial", is_bold=False, is_italic=False, alignment="left", y0=100.0,
+           before=None, after=None, page=1):
+    # Shaped like pdf_parser / ocr_pdf_parser output: every field present, None spacings at page edges
+    return TextBlock(text, font_size, font_name, 72.0, y0, 400.0, y0 + font_size, is_bold, is_italic, alignment,
+                     before, after, page, 0)
+
+def legacy(text, font_size, font_name="Arial", alignment="left", y0=100.0, **spacing):
+    # Older JSON block files: no is_bold / is_italic keys, spacing keys may be missing
+    return dict({"text": text, "font_size": font_size, "font_name": font_name, "alignment": alignment,
+                 "y0": y0, "page_number": spacing.pop("page", 1)}, **spacing)
+
+BLOCKS = [
+    parsed("Annual Report 2024", 24.0, "Arial-Bold", is_bold=True, alignment="center", y0=40.0, after=12.0),
+    # Tie for the largest page-1 font: the first block wins the title
+    parsed("Second big line", 24.0, alignment="center", y0=80.0, before=8.0, after=6.0),
+    # Lowercase style names, flagged by the parser
+    parsed("1. Introduction", 16.0, "Helvetica-bold", is_bold=True, y0=120.0, before=10.0, after=4.0),
+    parsed("1.1 Scope of the study", 13.5, "Times-oblique", is_italic=True, alignment="indented", y0=135.0,
+           before=3.5, after=2.25),
+    # Merged line: the font name says bold but most characters are regular, so the flag wins
+    parsed("Mostly regular merged line", 10.0, "Arial-Bold", y0=150.0, before=2.0, after=None),
+    # Legacy blocks: flags from the font name, case-insensitively; missing spacing keys
+    legacy("Legacy lowercase bold heading", 14.0, "ArialBD,bold", y0=170.0, line_spacing_before=None),
+    legacy("Another paragraph of body text", 10.0, y0=190.0),
+    legacy("Legacy italic caption", 9.5, "Georgia-Italic", alignment="indented", y0=210.0,
+           line_spacing_before=4.0, line_spacing_after=1.5),
+    # Noise rows: keywords, digits, too short
+    parsed("Page 3 of 10", 9.0, y0=800.0),
+    parsed("contact@example.org", 9.0, y0=810.0),
+    parsed("42", 9.0, y0=820.0),
+    parsed("ab", 9.0, y0=830.0),
+    parsed("2. Background", 14.0, "Times-BoldOblique", is_bold=True, is_italic=True, alignment="indented", y0=60.0,
+           before=None, after=5.5, page=2),
+    parsed("Closing remarks and funding", 11.0, alignment="center", y0=90.0, before=3.0, page=2),
+    # Repeats the title text on a later page: removed like the title itself
+    parsed("  Annual Report 2024 ", 12.0, y0=30.0, after=1.0, page=3),
+]
+
+def test_vectorized_features_match_per_block_reference():
+    expected_title, expected = reference_features(BLOCKS)
+    title, blocks_filtered, X = prepare_document(BLOCKS)
+
+    assert title == expected_title
+    assert [b["text"] for b in blocks_filtered] == [
+        b["text"] for b in BLOCKS
+        if not is_noise(b["text"]) and b["text"].strip() != expected_title.strip()
+    ]
+    assert list(X.columns) == list(EXPECTED_DTYPES)
+    assert X.dtypes.astype(str).to_dict() == EXPECTED_DTYPES
+    pd.testing.assert_frame_equal(X.reset_index(drop=True), expected, check_dtype=True)
+
+def test_style_flags_prefer_parser_flags_and_fall_back_to_lowercased_names():
+    _, blocks_filtered, X = prepare_document(BLOCKS)
+    flags = dict(zip((b["text"] for b in blocks_filtered), zip(X["is_bold"], X["is_italic"])))
+    assert flags["1. Introduction"] == (1, 0)
+    assert flags["1.1 Scope of the study"] == (0, 1)
+    assert flags["Mostly regular merged line"] == (0, 0)
+    assert flags["Legacy lowercase bold heading"] == (1, 0)
+    assert flags["Legacy italic caption"] == (0, 1)
+    assert flags["2. Background"] == (1, 1)
+
+def test_missing_and_none_spacings_are_zero():
+    _, blocks_filtered, X = prepare_document(BLOCKS)
+    spacings = dict(zip((b["text"] for b in blocks_filtered),
+                        zip(X["line_spacing_before"], X["line_spacing_after"])))
+    assert spacings["Mostly regular merged line"] == (2.0, 0.0)
+    assert spacings["Legacy lowercase bold heading"] == (0.0, 0.0)
+    assert spacings["2. Background"] == (0.0, 5.5)
+
+def test_alignment_dummies_are_fixed_when_values_are_missing():
+    # A document without "center" blocks still gets the full dummy set, all-False where absent
+    blocks = [b for b in BLOCKS if b["alignment"] != "center"]
+    _, _, X = prepare_document(blocks)
+    assert list(X.columns[-2:]) == ["alignment_indented", "alignment_left"]
+    assert X["alignment_left"].tolist() == [b["alignment"] == "left" for b in blocks
+                                            if not is_noise(b["text"])][1:]
@@ -0,0 +1,86 @@
+# tests/test_generate_csv.py
+
+# input.csv rows must carry the same style flags the inference path derives from the blocks,
+# and incremental rebuilds must write the same bytes as a full rebuild
+
+import os
+import numpy as np
+import pandas as pd
+from scripts.block_store import save_extracted
+from scripts.feature_pipeline import style_flags
+from scripts.generate_csv import generate_input_csv
+from scripts.heading_detector import block_columns
+
+def block(text, font_name, **flags):
+    return dict({"text": text, "font_size": 12.0, "font_name": font_name, "x0": 72.0, "y0": 100.0, "x1": 300.0,
+                 "y1": 112.0, "alignment": "left", "line_spacing_before": None, "line_spacing_after": None,
+                 "page_number": 1, "block_id": 0}, **flags)
+
+BLOCKS = [
+    # Parser flags, as pdf_parser sets them from the lowercased font name
+    block("Lowercase bold heading", "Helvetica-bold", is_bold=True, is_italic=False),
+    block("Lowercase oblique line", "Times-oblique", is_bold=False, is_italic=True),
+    # Parser flags win over the font name
+    block("Merged mostly regular line", "Arial-Bold", is_bold=False, is_italic=False),
+    # Legacy blocks without flags fall back to the font name, case-insensitively
+    block("Legacy bold heading", "ArialBD,bold"),
+    block("Legacy body text", "Arial"),
+]
+
+def test_input_csv_style_flags_match_inference(tmp_path):
+    save_extracted({"pdf_name": "doc.pdf", "text_blocks": BLOCKS}, str(tmp_path / "doc.json"))
+    output_csv = str(tmp_path / "csv" / "input.csv")
+    generate_input_csv(str(tmp_path), output_csv)
+
+    training = style_flags(pd.read_csv(output_csv))
+    inference = style_flags(block_columns(BLOCKS))
+    np.testing.assert_array_equal(training[0], inference[0])
+    np.testing.assert_array_equal(training[1], inference[1])
+    assert training[0].tolist() == [1, 0, 0, 1, 0]
+    assert training[1].tolist() == [0, 1, 0, 0, 0]
+
+def doc_blocks(name, n, variant=""):
+    return [block(f"{name} block {i}{variant}", "Arial-Bold" if i == 0 else "Arial", is_bold=i == 0, is_italic=False)
+            for i in range(n)]
+
+def write_doc(json_dir, name, n, variant=""):
+    path = json_dir / f"{name}.json"
+    save_extracted({"pdf_name": f"{name}.pdf", "text_blocks": doc_blocks(name, n, variant)}, str(path))
+    return path
+
+def assert_incremental_matches_full(tmp_path, json_dir):
+    incremental_csv = tmp_path / "incremental" / "input.csv"
+    full_csv = tmp_path / "full" / "input.csv"
+    generate_input_csv(str(json_dir), str(incremental_csv), incremental=True)
+    generate_input_csv(str(json_dir), str(full_csv))
+    assert incremental_csv.read_bytes() == full_csv.read_bytes()
+
+def test_incremental_rebuild_matches_full_rebuild(tmp_path):
+    json_dir = tmp_path / "input_json"
+    json_dir.mkdir()
+    for name, n in (("b", 3), ("c", 2), ("d", 4)):
+        write_doc(json_dir, name, n)
+    assert_incremental_matches_full(tmp_path, json_dir)
+
+    # Added after every known file: appended
+    write_doc(json_dir, "e", 2)
+    assert_incremental_matches_full(tmp_path, json_dir)
+
+    # Added before known files: rebuilt in sorted order
+    write_doc(json_dir, "a", 1)
+    assert_incremental_matches_full(tmp_path, json_dir)
+
+    # Known file modified in the middle of the sorted list
+    write_doc(json_dir, "c", 2, variant="*")
+    assert_incremental_matches_full(tmp_path, json_dir)
+
+    # Last known file modified (the trailing-file append case must not duplicate its rows)
+    write_doc(json_dir, "e", 3)
+    assert_incremental_matches_full(tmp_path, json_dir)
+
+    # Known file deleted
+    os.remove(json_dir / "b.json")
+    assert_incremental_matches_full(tmp_path, json_dir)
+
+    # Nothing changed
+    assert_incremental_matches_full(tmp_path, json_dir)
@@ -0,0 +1,73 @@
+# tests/test_heading_detector.py
+
+# Batched detection (detect_headings_batch) predicts every document's rows in one model call;
+# split back per document, its outlines must equal per-document detection, in input order,
+# with None for documents without usable blocks
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import LabelEncoder
+from scripts.candidate_filter import CandidateFilter
+from scripts.feature_pipeline import FeaturePipeline
+from scripts.heading_detector import (Preprocessing, block_columns, detect_headings_batch,
+                                      detect_headings_from_blocks, detect_headings_from_columns)
+from scripts.model_backends import make_model
+
+LEVELS = {20.0: "H1", 16.0: "H2", 13.0: "H3"}
+
+def synthetic_doc(name, n_pages, seed):
+    rng = np.random.default_rng(seed)
+    blocks = [{"text": f"{name} main title", "font_size": 26.0, "font_name": "Arial-Bold", "is_bold": True,
+               "is_italic": False, "alignment": "center", "line_spacing_before": None, "line_spacing_after": 14.0,
+               "y0": 40.0, "page_number": 1}]
+    for page in range(1, n_pages + 1):
+        y0 = 80.0
+        for i in range(int(rng.integers(4, 9))):
+            heading = rng.random() < 0.35
+            font_size = float(rng.choice(list(LEVELS))) if heading else 10.0
+            text = f"Section {page}.{i} of {name}" if heading else f"Body paragraph {i} of {name} goes on and on."
+            blocks.append({"text": text, "font_size": font_size, "font_name": "Arial-Bold" if heading else "Arial",
+                           "is_bold": heading, "is_italic": False,
+                           "alignment": str(rng.choice(["left", "indented", "center"])),
+                           "line_spacing_before": float(rng.uniform(2, 12)), "line_spacing_after": None,
+                           "y0": y0, "page_number": page})
+            y0 += 24.0
+    return {"pdf_name": f"{name}.pdf", "text_blocks": blocks}
+
+def levels(blocks):
+    return [LEVELS.get(b["font_size"], "None") for b in blocks]
+
+@pytest.fixture(scope="module")
+def trained():
+    pipeline = FeaturePipeline()
+    docs = [synthetic_doc(f"train{i}", 3, seed=i) for i in range(6)]
+    X = pd.concat([pipeline.transform(block_columns(doc["text_blocks"])) for doc in docs], ignore_index=True)
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform([level for doc in docs for level in levels(doc["text_blocks"])])
+    model = make_model("hist_gb", max_iter=30, max_depth=3).fit(X, y)
+    return model, label_encoder
+
+@pytest.mark.parametrize("candidate_filter", [None, CandidateFilter(max_text_len=40)])
+def test_batch_outlines_match_per_document_detection(trained, candidate_filter):
+    model, label_encoder = trained
+    preprocessing = Preprocessing(candidate_filter=candidate_filter)
+    docs = [
+        synthetic_doc("alpha", 2, seed=10),
+        {"pdf_name": "empty.pdf", "text_blocks": []},
+        synthetic_doc("beta", 4, seed=11),
+        # Only noise and the title: nothing left to predict
+        {"pdf_name": "noise.pdf", "text_blocks": [dict(synthetic_doc("gamma", 1, seed=12)["text_blocks"][0]),
+                                                  {"text": "Page 1 of 2", "font_size": 9.0, "page_number": 1}]},
+        block_columns(synthetic_doc("delta", 3, seed=13)["text_blocks"]),
+        synthetic_doc("epsilon", 1, seed=14),
+    ]
+
+    batched = detect_headings_batch(docs, model, label_encoder, preprocessing)
+
+    expected = [detect_headings_from_columns(doc, model, label_encoder, preprocessing=preprocessing)
+                if not isinstance(doc, dict) else detect_headings_from_blocks(doc, model, label_encoder, preprocessing)
+                for doc in docs]
+    assert batched == expected
+    assert batched[1] is None and batched[3] is None
+    assert sum(len(outline["outline"]) for outline in batched if outline is not None) > 5
@@ -0,0 +1,85 @@
+# tests/test_mixed_pdf.py
+
+# A mixed PDF (text-layer page + image-only page) must come out of auto_detector in one unit:
+# OCR pixels are converted to points, so font stats are not skewed by the OCR pages
+# Rasterization and tesseract are replaced by fixtures that describe the scan in pixels
+
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+from scripts import ocr_pdf_parser
+from scripts.auto_detector import extract_pages
+from scripts.heading_detector import prepare_document
+
+DPI = 300
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+
+def px(points):
+    return round(points * DPI / 72)
+
+def make_mixed_pdf(path):
+    doc = fitz.open()
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_text((72, 100), "Introduction", fontsize=20)
+    page.insert_text((72, 140), "Body text of the structured section.", fontsize=11)
+    # Image-only page: no fonts, so it is routed to OCR
+    scan = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 8, 8), False)
+    pixmap.clear_with(255)
+    scan.insert_image(scan.rect, pixmap=pixmap)
+    doc.save(path)
+    doc.close()
+
+# Tesseract output for the scanned page, in pixels at DPI: a 20pt heading and an 11pt body line
+WORDS = [
+    # text, left, top, height (points), line key
+    ("Methods", 72, 80, 20, 1),
+    ("Body", 72, 120, 11, 2),
+    ("text", 110, 120, 11, 2),
+    ("scanned.", 140, 120, 11, 2),
+]
+
+def fake_image_to_data(image, output_type=None, timeout=0):
+    data = {key: [] for key in ("text", "left", "top", "width", "height", "block_num", "par_num", "line_num",
+                                "word_num")}
+    for word_num, (text, left, top, height, line) in enumerate(WORDS):
+        data["text"].append(text)
+        data["left"].append(px(left))
+        data["top"].append(px(top))
+        data["width"].append(px(len(text) * height * 0.5))
+        data["height"].append(px(height))
+        data["block_num"].append(line)
+        data["par_num"].append(1)
+        data["line_num"].append(1)
+        data["word_num"].append(word_num)
+    return data
+
+def test_ocr_pages_of_a_mixed_pdf_are_in_points(tmp_path, monkeypatch):
+    pdf_path = str(tmp_path / "mixed.pdf")
+    make_mixed_pdf(pdf_path)
+    monkeypatch.setattr(ocr_pdf_parser, "pdfinfo_from_path", lambda path: {"Pages": 2})
+    monkeypatch.setattr(ocr_pdf_parser, "convert_from_path",
+                        lambda path, dpi, first_page, last_page, timeout: [Image.new("L", (px(PAGE_WIDTH),
+                                                                                          px(PAGE_HEIGHT)), 255)])
+    monkeypatch.setattr(pytesseract, "image_to_data", fake_image_to_data)
+
+    kind, pages = extract_pages(pdf_path, ocr_dpi=DPI)
+    structured_page, ocr_page = list(pages)
+    assert kind == "mixed"
+    assert [b["page_number"] for b in ocr_page] == [2, 2]
+
+    heading, body = ocr_page
+    assert heading["text"] == "Methods"
+    assert abs(heading["font_size"] - 20) < 0.5
+    assert abs(body["font_size"] - 11) < 0.5
+    assert abs(heading["x0"] - 72) < 0.5 and abs(heading["y0"] - 80) < 0.5
+    assert abs(heading["line_spacing_after"] - (120 - 100)) < 0.5
+    assert all(b["x1"] <= PAGE_WIDTH and b["y1"] <= PAGE_HEIGHT for b in ocr_page)
+
+    # Same point size on both kinds of page, so neither page dominates the document font stats
+    structured_heading = next(b for b in structured_page if b["text"] == "Introduction")
+    assert abs(heading["font_size"] - structured_heading["font_size"]) < 0.5
+    title, blocks_filtered, X = prepare_document(structured_page + ocr_page)
+    assert title == "Introduction"
+    methods = X.iloc[[b["text"] for b in blocks_filtered].index("Methods")]
+    assert abs(methods["relative_to_max"] - 1.0) < 0.05
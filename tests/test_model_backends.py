@@ -0,0 +1,52 @@
+# tests/test_model_backends.py
+
+# The exported NumPy predictor must predict exactly what the sklearn model it was exported from
+# predicts, for every backend, including rows with missing values
+
+import numpy as np
+import pandas as pd
+import pytest
+import sklearn
+from sklearn.preprocessing import LabelEncoder
+from scripts.model_backends import BACKENDS, export_predictor, load_predictor, make_model
+
+def training_data(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        "font_size": rng.uniform(8, 24, n),
+        "is_bold": rng.integers(0, 2, n),
+        "y0": rng.uniform(0, 800, n),
+        "text_len": rng.integers(3, 120, n),
+    })
+    levels = np.select([X["font_size"] > 18, (X["font_size"] > 13) & (X["is_bold"] == 1), X["text_len"] < 20],
+                       ["H1", "H2", "H3"], "None")
+    label_encoder = LabelEncoder()
+    return X, label_encoder.fit_transform(levels), label_encoder
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_exported_predictor_matches_sklearn(tmp_path, backend):
+    X, y, label_encoder = training_data()
+    size = {"n_estimators": 20} if backend == "gb" else {"max_iter": 20}
+    model = make_model(backend, max_depth=3, **size)
+    model.fit(X, y)
+
+    path = str(tmp_path / f"{backend}.npz")
+    export_predictor(model, label_encoder, path)
+    predictor, encoder = load_predictor(path)
+
+    X_new, _, _ = training_data(n=400, seed=1)
+    np.testing.assert_array_equal(predictor.predict(X_new), model.predict(X_new))
+    np.testing.assert_array_equal(encoder.inverse_transform(predictor.predict(X_new)),
+                                  label_encoder.inverse_transform(model.predict(X_new)))
+    assert list(predictor.feature_names_in_) == list(X.columns)
+
+    if backend == "hist_gb":
+        X_new.loc[::7, "font_size"] = np.nan
+        np.testing.assert_array_equal(predictor.predict(X_new), model.predict(X_new))
+
+def test_export_refuses_untested_sklearn_versions(tmp_path, monkeypatch):
+    X, y, label_encoder = training_data(n=100)
+    model = make_model("hist_gb", max_iter=5).fit(X, y)
+    monkeypatch.setattr(sklearn, "__version__", "9.9.0")
+    with pytest.raises(ValueError, match="not tested with scikit-learn 9.9.0"):
+        export_predictor(model, label_encoder, str(tmp_path / "model.npz"))
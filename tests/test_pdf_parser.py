@@ -0,0 +1,53 @@
+# tests/test_pdf_parser.py
+
+# Parallel page extraction must match the sequential path and keep a bounded number of page chunks in flight
+
+from concurrent.futures import ThreadPoolExecutor
+import fitz  # PyMuPDF
+from scripts import pdf_parser
+
+PAGES = 40
+
+def make_pdf(path):
+    doc = fitz.open()
+    for i in range(PAGES):
+        page = doc.new_page()
+        page.insert_text((72, 80), f"Section {i + 1}", fontsize=16)
+        page.insert_text((72, 110), f"Body text of section {i + 1}.", fontsize=10)
+    doc.save(path)
+    doc.close()
+
+class CountingExecutor(ThreadPoolExecutor):
+    # Threads instead of processes, so the test can count submissions
+    submitted = 0
+
+    def submit(self, *args, **kwargs):
+        CountingExecutor.submitted += 1
+        return super().submit(*args, **kwargs)
+
+def texts(pages):
+    return [[block["text"] for block in page_blocks] for page_blocks in pages]
+
+def test_parallel_extraction_matches_sequential(tmp_path):
+    pdf_path = str(tmp_path / "long.pdf")
+    make_pdf(pdf_path)
+    sequential = list(pdf_parser.iter_text_blocks(pdf_path, workers=1))
+    parallel = list(pdf_parser.iter_text_blocks(pdf_path, workers=2))
+    assert len(parallel) == PAGES
+    assert texts(parallel) == texts(sequential)
+    assert [b.to_dict() for page in parallel for b in page] == [b.to_dict() for page in sequential for b in page]
+
+def test_parallel_extraction_bounds_pending_chunks(tmp_path, monkeypatch):
+    pdf_path = str(tmp_path / "long.pdf")
+    make_pdf(pdf_path)
+    monkeypatch.setattr(pdf_parser, "ProcessPoolExecutor", CountingExecutor)
+    CountingExecutor.submitted = 0
+
+    workers = 2
+    pages = pdf_parser._iter_text_blocks_parallel(pdf_path, list(range(PAGES)), workers, "span")
+    first = next(pages)
+    # 8 chunks of 5 pages: only the window of workers * 2 chunks is submitted before the first page
+    assert first[0]["text"] == "Section 1"
+    assert CountingExecutor.submitted == workers * 2
+    assert len(list(pages)) == PAGES - 1
+    assert CountingExecutor.submitted == workers * 4
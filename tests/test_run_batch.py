@@ -0,0 +1,29 @@
+# tests/test_run_batch.py
+
+# run_batch must report a model that cannot be loaded, or a worker pool that breaks, once
+# and return per-document failures instead of dying with a traceback
+
+import main
+
+def broken_initializer(*args):
+    raise RuntimeError("model failed to load in the worker")
+
+def pdf_dir(tmp_path, n=3):
+    for i in range(n):
+        (tmp_path / f"doc{i}.pdf").write_bytes(b"%PDF-1.4\n")
+    return str(tmp_path)
+
+def test_missing_model_is_reported_once(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(main, "MODEL_PATH", str(tmp_path / "missing_model.pkl"))
+    assert main.run_batch(pdf_dir(tmp_path), workers=2) == []
+    assert capsys.readouterr().out.count("[ERROR] Cannot load model") == 1
+
+def test_broken_pool_fails_every_document(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(main, "load_model", lambda *args: (None, None))
+    monkeypatch.setattr(main, "load_preprocessing", lambda *args: None)
+    monkeypatch.setattr(main, "_init_worker", broken_initializer)
+    results = main.run_batch(pdf_dir(tmp_path), workers=2)
+
+    assert sorted(pdf for pdf, _, _ in results) == [str(tmp_path / f"doc{i}.pdf") for i in range(3)]
+    assert all(error.startswith("BrokenProcessPool") for _, error, _ in results)
+    assert capsys.readouterr().out.count("[ERROR] Worker pool stopped") == 1
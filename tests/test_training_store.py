@@ -0,0 +1,45 @@
+# tests/test_training_store.py
+
+# Promoting the same block twice must never add rows; a corrected level replaces the stored label
+
+import pandas as pd
+from scripts.feature_pipeline import labelled_features
+from scripts.training_store import append_rows, load_key_index
+
+INPUT_ROW = {"file_name": "doc.pdf", "page_number": 1, "text": "1. Introduction", "font_size": 16.0,
+             "font_name": "Arial-Bold", "x0": 72.0, "y0": 120.0, "x1": 300.0, "y1": 136.0, "is_bold": True,
+             "is_italic": False, "alignment": "left", "line_spacing_before": 10.0, "line_spacing_after": 4.0}
+BODY_ROW = dict(INPUT_ROW, text="Body text of the introduction", font_size=10.0, font_name="Arial",
+                is_bold=False, y0=140.0, y1=150.0)
+
+def promote(tmp_path, rows, levels):
+    input_rows = pd.DataFrame(rows)
+    output_rows = input_rows[["file_name", "page_number", "text"]].assign(level=levels)
+    return append_rows(input_rows, output_rows, str(tmp_path / "input.csv"), str(tmp_path / "output.csv"))
+
+def test_relabelled_block_replaces_its_label(tmp_path):
+    assert len(promote(tmp_path, [INPUT_ROW, BODY_ROW], ["H2", "BODY"])) == 2
+    # Same blocks again: nothing to do
+    assert len(promote(tmp_path, [INPUT_ROW, BODY_ROW], ["H2", "BODY"])) == 0
+    # Corrected level for the heading: upsert, not a second conflicting row
+    relabelled = promote(tmp_path, [INPUT_ROW, BODY_ROW], ["H1", "BODY"])
+    assert relabelled["text"].tolist() == ["1. Introduction"]
+    assert relabelled["level"].tolist() == ["H1"]
+
+    input_df = pd.read_csv(tmp_path / "input.csv")
+    output_df = pd.read_csv(tmp_path / "output.csv")
+    assert len(input_df) == 2
+    assert sorted(output_df["level"]) == ["BODY", "H1"]
+    df, X = labelled_features(input_df, output_df)
+    assert len(df) == len(X) == 2
+    assert df.set_index("text")["level"].to_dict() == {"1. Introduction": "H1", "Body text of the introduction": "BODY"}
+
+def test_key_index_rebuilt_from_csvs_keeps_the_newest_label(tmp_path):
+    promote(tmp_path, [INPUT_ROW], ["H2"])
+    promote(tmp_path, [INPUT_ROW], ["H3"])
+    index_path = tmp_path / "input.csv.keys"
+    from_sidecar = load_key_index(str(tmp_path / "input.csv"), str(tmp_path / "output.csv"))
+    index_path.unlink()
+    rebuilt = load_key_index(str(tmp_path / "input.csv"), str(tmp_path / "output.csv"))
+    assert from_sidecar == rebuilt
+    assert list(rebuilt.values()) == ["H3"]